@@ -0,0 +1,74 @@
+"""add escrow transactions, data versions and widget result cache
+
+Revision ID: 0a7c9e1f3b5d
+Revises: f3c5e7a9b1d2
+Create Date: 2026-10-19 14:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0a7c9e1f3b5d'
+down_revision: Union[str, None] = 'f3c5e7a9b1d2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'escrow_files',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('filename', sa.String(length=255), nullable=False),
+        sa.Column('sha256', sa.String(length=64), nullable=False),
+        sa.Column('rows', sa.Integer(), nullable=False),
+        sa.Column('uploaded_by', sa.Integer(), nullable=True),
+        sa.Column('ingested_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['uploaded_by'], ['users.id'], ondelete='SET NULL'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('sha256'),
+    )
+    op.create_table(
+        'escrow_transactions',
+        sa.Column('id', sa.BigInteger(), nullable=False),
+        sa.Column('file_id', sa.Integer(), nullable=False),
+        sa.Column('object_name', sa.String(length=255), nullable=False),
+        sa.Column('permit', sa.String(length=64), nullable=True),
+        sa.Column('paid_at', sa.Date(), nullable=True),
+        sa.Column('amount', sa.Numeric(precision=18, scale=2), nullable=False),
+        sa.Column('sheet', sa.String(length=100), nullable=True),
+        sa.ForeignKeyConstraint(['file_id'], ['escrow_files.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index(op.f('ix_escrow_transactions_file_id'), 'escrow_transactions', ['file_id'], unique=False)
+    op.create_index('ix_escrow_tx_object_paid', 'escrow_transactions', ['object_name', 'paid_at'], unique=False)
+    op.create_index('ix_escrow_tx_paid', 'escrow_transactions', ['paid_at'], unique=False)
+    op.create_table(
+        'data_versions',
+        sa.Column('name', sa.String(length=50), nullable=False),
+        sa.Column('version', sa.BigInteger(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('name'),
+    )
+    op.create_table(
+        'widget_results',
+        sa.Column('cache_key', sa.String(length=64), nullable=False),
+        sa.Column('data_version', sa.BigInteger(), nullable=False),
+        sa.Column('result', postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+        sa.Column('computed_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('cache_key'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('widget_results')
+    op.drop_table('data_versions')
+    op.drop_index('ix_escrow_tx_paid', table_name='escrow_transactions')
+    op.drop_index('ix_escrow_tx_object_paid', table_name='escrow_transactions')
+    op.drop_index(op.f('ix_escrow_transactions_file_id'), table_name='escrow_transactions')
+    op.drop_table('escrow_transactions')
+    op.drop_table('escrow_files')
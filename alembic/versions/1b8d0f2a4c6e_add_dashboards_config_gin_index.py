@@ -0,0 +1,45 @@
+"""dashboards config GIN index (jsonb_path_ops) for content search
+
+Revision ID: 1b8d0f2a4c6e
+Revises: 0a7c9e1f3b5d
+Create Date: 2026-10-19 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '1b8d0f2a4c6e'
+down_revision: Union[str, None] = '0a7c9e1f3b5d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _has_table(name: str) -> bool:
+    # dashboards создаётся через create_all при старте приложения и может ещё отсутствовать
+    return name in sa.inspect(op.get_bind()).get_table_names()
+
+
+def upgrade() -> None:
+    if not _has_table('dashboards'):
+        return
+    # CONCURRENTLY нельзя внутри транзакции — выходим в autocommit
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_dashboards_config_path', 'dashboards', ['config'],
+            postgresql_using='gin', postgresql_ops={'config': 'jsonb_path_ops'},
+            postgresql_concurrently=True, if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    if not _has_table('dashboards'):
+        return
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_dashboards_config_path', table_name='dashboards',
+            postgresql_concurrently=True, if_exists=True,
+        )
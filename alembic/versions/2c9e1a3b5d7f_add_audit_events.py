@@ -0,0 +1,44 @@
+"""add audit_events partitioned by month
+
+Revision ID: 2c9e1a3b5d7f
+Revises: 1b8d0f2a4c6e
+Create Date: 2026-10-19 18:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2c9e1a3b5d7f'
+down_revision: Union[str, None] = '1b8d0f2a4c6e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Секции audit_events_YYYY_MM создаёт приложение (app/services/audit.py)
+    op.create_table(
+        'audit_events',
+        sa.Column('id', sa.BigInteger(), autoincrement=True, nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.Column('username', sa.String(length=150), nullable=True),
+        sa.Column('event_type', sa.String(length=50), nullable=False),
+        sa.Column('target', sa.String(length=255), nullable=True),
+        sa.Column('ip', sa.String(length=45), nullable=True),
+        sa.Column('details', postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+        sa.PrimaryKeyConstraint('id', 'created_at'),
+        postgresql_partition_by='RANGE (created_at)',
+    )
+    op.create_index('ix_audit_events_time', 'audit_events', ['created_at', 'id'], unique=False)
+    op.create_index('ix_audit_events_user_time', 'audit_events', ['user_id', 'created_at'], unique=False)
+    op.create_index('ix_audit_events_type_time', 'audit_events', ['event_type', 'created_at'], unique=False)
+
+
+def downgrade() -> None:
+    # Секции удаляются вместе с родительской таблицей
+    op.drop_table('audit_events')
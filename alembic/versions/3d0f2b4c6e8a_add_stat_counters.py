@@ -0,0 +1,187 @@
+"""add stat_counters / daily_counters maintained by triggers for /admin/stats
+
+Revision ID: 3d0f2b4c6e8a
+Revises: 2c9e1a3b5d7f
+Create Date: 2026-10-19 19:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3d0f2b4c6e8a'
+down_revision: Union[str, None] = '2c9e1a3b5d7f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _has_table(name: str) -> bool:
+    # dashboards создаётся через create_all при старте приложения и может ещё отсутствовать
+    return name in sa.inspect(op.get_bind()).get_table_names()
+
+
+# Снимок app/services/stats.py на момент миграции
+STAT_COUNTER_FUNCTIONS = r"""
+CREATE OR REPLACE FUNCTION stat_user_key(role userrole, is_active boolean) RETURNS text
+LANGUAGE sql IMMUTABLE AS $$
+    SELECT 'users.' || role::text || CASE WHEN is_active THEN '.active' ELSE '.inactive' END
+$$;
+
+CREATE OR REPLACE FUNCTION stat_dashboard_key(is_public boolean) RETURNS text
+LANGUAGE sql IMMUTABLE AS $$
+    SELECT CASE WHEN is_public THEN 'dashboards.public' ELSE 'dashboards.private' END
+$$;
+
+-- Перенос строки из одного счётчика в другой; ключи — по порядку, чтобы
+-- встречные изменения (admin -> viewer и viewer -> admin) не ловили deadlock
+CREATE OR REPLACE FUNCTION stat_counter_move(old_key text, new_key text) RETURNS void
+LANGUAGE sql AS $$
+    INSERT INTO stat_counters (name, value)
+    SELECT k, d FROM (VALUES (old_key, -1::bigint), (new_key, 1::bigint)) AS v(k, d) ORDER BY k
+    ON CONFLICT (name) DO UPDATE SET value = stat_counters.value + EXCLUDED.value
+$$;
+"""
+
+USERS_TRIGGERS = r"""
+CREATE OR REPLACE FUNCTION stat_users_rows() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO stat_counters (name, value)
+        SELECT stat_user_key(role, is_active), count(*) FROM new_rows GROUP BY 1 ORDER BY 1
+        ON CONFLICT (name) DO UPDATE SET value = stat_counters.value + EXCLUDED.value;
+
+        INSERT INTO daily_counters (day, name, value)
+        SELECT current_date, 'users.created', count(*) FROM new_rows HAVING count(*) > 0
+        ON CONFLICT (day, name) DO UPDATE SET value = daily_counters.value + EXCLUDED.value;
+    ELSE
+        INSERT INTO stat_counters (name, value)
+        SELECT stat_user_key(role, is_active), -count(*) FROM old_rows GROUP BY 1 ORDER BY 1
+        ON CONFLICT (name) DO UPDATE SET value = stat_counters.value + EXCLUDED.value;
+    END IF;
+    RETURN NULL;
+END
+$$;
+
+CREATE OR REPLACE FUNCTION stat_users_update() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    PERFORM stat_counter_move(stat_user_key(OLD.role, OLD.is_active), stat_user_key(NEW.role, NEW.is_active));
+    RETURN NULL;
+END
+$$;
+
+DROP TRIGGER IF EXISTS stat_users_insert ON users;
+CREATE TRIGGER stat_users_insert AFTER INSERT ON users
+    REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION stat_users_rows();
+
+DROP TRIGGER IF EXISTS stat_users_delete ON users;
+CREATE TRIGGER stat_users_delete AFTER DELETE ON users
+    REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION stat_users_rows();
+
+DROP TRIGGER IF EXISTS stat_users_update ON users;
+CREATE TRIGGER stat_users_update AFTER UPDATE OF role, is_active ON users
+    FOR EACH ROW WHEN (OLD.role IS DISTINCT FROM NEW.role OR OLD.is_active IS DISTINCT FROM NEW.is_active)
+    EXECUTE FUNCTION stat_users_update();
+"""
+
+DASHBOARDS_TRIGGERS = r"""
+CREATE OR REPLACE FUNCTION stat_dashboards_rows() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO stat_counters (name, value)
+        SELECT stat_dashboard_key(is_public), count(*) FROM new_rows GROUP BY 1 ORDER BY 1
+        ON CONFLICT (name) DO UPDATE SET value = stat_counters.value + EXCLUDED.value;
+    ELSE
+        INSERT INTO stat_counters (name, value)
+        SELECT stat_dashboard_key(is_public), -count(*) FROM old_rows GROUP BY 1 ORDER BY 1
+        ON CONFLICT (name) DO UPDATE SET value = stat_counters.value + EXCLUDED.value;
+    END IF;
+    RETURN NULL;
+END
+$$;
+
+CREATE OR REPLACE FUNCTION stat_dashboards_update() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    PERFORM stat_counter_move(stat_dashboard_key(OLD.is_public), stat_dashboard_key(NEW.is_public));
+    RETURN NULL;
+END
+$$;
+
+DROP TRIGGER IF EXISTS stat_dashboards_insert ON dashboards;
+CREATE TRIGGER stat_dashboards_insert AFTER INSERT ON dashboards
+    REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION stat_dashboards_rows();
+
+DROP TRIGGER IF EXISTS stat_dashboards_delete ON dashboards;
+CREATE TRIGGER stat_dashboards_delete AFTER DELETE ON dashboards
+    REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION stat_dashboards_rows();
+
+DROP TRIGGER IF EXISTS stat_dashboards_update ON dashboards;
+CREATE TRIGGER stat_dashboards_update AFTER UPDATE OF is_public ON dashboards
+    FOR EACH ROW WHEN (OLD.is_public IS DISTINCT FROM NEW.is_public)
+    EXECUTE FUNCTION stat_dashboards_update();
+"""
+
+USERS_BACKFILL = r"""
+INSERT INTO stat_counters (name, value)
+SELECT stat_user_key(role, is_active), count(*) FROM users GROUP BY 1;
+"""
+
+DASHBOARDS_BACKFILL = r"""
+INSERT INTO stat_counters (name, value)
+SELECT stat_dashboard_key(is_public), count(*) FROM dashboards GROUP BY 1;
+"""
+
+
+def upgrade() -> None:
+    op.create_table(
+        'stat_counters',
+        sa.Column('name', sa.String(length=100), nullable=False),
+        sa.Column('value', sa.BigInteger(), nullable=False),
+        sa.PrimaryKeyConstraint('name'),
+    )
+    op.create_table(
+        'daily_counters',
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('name', sa.String(length=100), nullable=False),
+        sa.Column('value', sa.BigInteger(), nullable=False),
+        sa.PrimaryKeyConstraint('day', 'name'),
+    )
+    # Триггеры ставятся в той же транзакции, что и начальные значения:
+    # изменения между подсчётом и установкой триггера не теряются
+    bind = op.get_bind()
+    bind.exec_driver_sql("LOCK TABLE users IN SHARE ROW EXCLUSIVE MODE")
+    bind.exec_driver_sql(STAT_COUNTER_FUNCTIONS)
+    bind.exec_driver_sql(USERS_TRIGGERS)
+    bind.exec_driver_sql(USERS_BACKFILL)
+    if _has_table('dashboards'):
+        bind.exec_driver_sql("LOCK TABLE dashboards IN SHARE ROW EXCLUSIVE MODE")
+        bind.exec_driver_sql(DASHBOARDS_TRIGGERS)
+        bind.exec_driver_sql(DASHBOARDS_BACKFILL)
+
+    # CONCURRENTLY нельзя внутри транзакции — выходим в autocommit
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_users_last_activity', 'users', ['last_activity'],
+            postgresql_concurrently=True, if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_users_last_activity', table_name='users', postgresql_concurrently=True, if_exists=True)
+    for table in ('users', 'dashboards'):
+        if _has_table(table):
+            for action in ('insert', 'delete', 'update'):
+                op.execute(f"DROP TRIGGER IF EXISTS stat_{table}_{action} ON {table}")
+    op.execute("DROP FUNCTION IF EXISTS stat_users_rows(), stat_users_update(), "
+               "stat_dashboards_rows(), stat_dashboards_update()")
+    op.execute("DROP FUNCTION IF EXISTS stat_counter_move(text, text), "
+               "stat_user_key(userrole, boolean), stat_dashboard_key(boolean)")
+    op.drop_table('daily_counters')
+    op.drop_table('stat_counters')
@@ -0,0 +1,55 @@
+"""add escrow_rollup_daily / escrow_rollup_monthly
+
+Revision ID: 4e1a3c5d7f9b
+Revises: 3d0f2b4c6e8a
+Create Date: 2026-10-19 20:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4e1a3c5d7f9b'
+down_revision: Union[str, None] = '3d0f2b4c6e8a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _rollup_table(name: str) -> None:
+    op.create_table(
+        name,
+        sa.Column('period', sa.Date(), nullable=False),
+        sa.Column('object_name', sa.String(length=255), nullable=False),
+        sa.Column('permit', sa.String(length=64), server_default='', nullable=False),
+        sa.Column('inflow', sa.Boolean(), nullable=False),
+        sa.Column('total', sa.Numeric(precision=18, scale=2), nullable=False),
+        sa.Column('count', sa.BigInteger(), nullable=False),
+        sa.Column('min_amount', sa.Numeric(precision=18, scale=2), nullable=False),
+        sa.Column('max_amount', sa.Numeric(precision=18, scale=2), nullable=False),
+        sa.PrimaryKeyConstraint('period', 'object_name', 'permit', 'inflow'),
+    )
+
+
+def _backfill(name: str, period_sql: str) -> None:
+    op.execute(
+        f"INSERT INTO {name} (period, object_name, permit, inflow, total, count, min_amount, max_amount) "
+        f"SELECT {period_sql}, object_name, coalesce(permit, ''), amount >= 0, "
+        f"sum(amount), count(*), min(amount), max(amount) "
+        f"FROM escrow_transactions WHERE paid_at IS NOT NULL GROUP BY 1, 2, 3, 4"
+    )
+
+
+def upgrade() -> None:
+    _rollup_table('escrow_rollup_daily')
+    _rollup_table('escrow_rollup_monthly')
+    # Уже загруженные выписки (дальше свёртки обновляет ingest_file)
+    _backfill('escrow_rollup_daily', 'paid_at')
+    _backfill('escrow_rollup_monthly', "date_trunc('month', paid_at)::date")
+
+
+def downgrade() -> None:
+    op.drop_table('escrow_rollup_monthly')
+    op.drop_table('escrow_rollup_daily')
@@ -0,0 +1,164 @@
+"""add pg_notify triggers for live events (/api/events)
+
+Revision ID: 5f2b4d6e8a0c
+Revises: 4e1a3c5d7f9b
+Create Date: 2026-10-19 21:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5f2b4d6e8a0c'
+down_revision: Union[str, None] = '4e1a3c5d7f9b'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _has_table(name: str) -> bool:
+    # dashboards и escrow_files создаются через create_all при старте приложения
+    return name in sa.inspect(op.get_bind()).get_table_names()
+
+
+# Снимок app/services/live_events.py на момент миграции
+LIVE_EVENT_FUNCTIONS = r"""
+CREATE OR REPLACE FUNCTION live_notify(event jsonb) RETURNS void
+LANGUAGE sql AS $$
+    SELECT pg_notify('live_events', event::text)
+$$;
+
+CREATE OR REPLACE FUNCTION live_user_event(kind text, u users) RETURNS jsonb
+LANGUAGE sql STABLE AS $$
+    SELECT jsonb_build_object(
+        'type', kind, 'id', u.id, 'username', u.username, 'email', u.email,
+        'role', u.role, 'is_active', u.is_active
+    )
+$$;
+"""
+
+USERS_TRIGGERS = r"""
+CREATE OR REPLACE FUNCTION live_users_rows() RETURNS trigger
+LANGUAGE plpgsql AS $$
+DECLARE
+    n bigint;
+BEGIN
+    -- Больше 20 строк за оператор (импорт) — одно событие users.bulk вместо потока
+    IF TG_OP = 'INSERT' THEN
+        SELECT count(*) INTO n FROM new_rows;
+        IF n > 20 THEN
+            PERFORM live_notify(jsonb_build_object('type', 'users.bulk', 'count', n));
+        ELSE
+            PERFORM live_notify(live_user_event('user.created', r)) FROM new_rows AS r;
+        END IF;
+    ELSE
+        SELECT count(*) INTO n FROM old_rows;
+        IF n > 20 THEN
+            PERFORM live_notify(jsonb_build_object('type', 'users.bulk', 'count', -n));
+        ELSE
+            PERFORM live_notify(live_user_event('user.deleted', r)) FROM old_rows AS r;
+        END IF;
+    END IF;
+    RETURN NULL;
+END
+$$;
+
+CREATE OR REPLACE FUNCTION live_users_update() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    PERFORM live_notify(live_user_event('user.updated', NEW));
+    RETURN NULL;
+END
+$$;
+
+DROP TRIGGER IF EXISTS live_users_insert ON users;
+CREATE TRIGGER live_users_insert AFTER INSERT ON users
+    REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION live_users_rows();
+
+DROP TRIGGER IF EXISTS live_users_delete ON users;
+CREATE TRIGGER live_users_delete AFTER DELETE ON users
+    REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION live_users_rows();
+
+-- last_login / last_activity меняются постоянно — о них не сообщаем
+DROP TRIGGER IF EXISTS live_users_update ON users;
+CREATE TRIGGER live_users_update AFTER UPDATE OF username, email, role, is_active ON users
+    FOR EACH ROW WHEN (
+        (OLD.username, OLD.email, OLD.role, OLD.is_active) IS DISTINCT FROM
+        (NEW.username, NEW.email, NEW.role, NEW.is_active)
+    )
+    EXECUTE FUNCTION live_users_update();
+"""
+
+DASHBOARDS_TRIGGERS = r"""
+CREATE OR REPLACE FUNCTION live_dashboards_row() RETURNS trigger
+LANGUAGE plpgsql AS $$
+DECLARE
+    d dashboards;
+    was_public boolean;
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        d := OLD;
+        was_public := OLD.is_public;
+    ELSIF TG_OP = 'UPDATE' THEN
+        d := NEW;
+        was_public := OLD.is_public;
+    ELSE
+        d := NEW;
+        was_public := NEW.is_public;
+    END IF;
+    PERFORM live_notify(jsonb_build_object(
+        'type', 'dashboard.' || CASE TG_OP WHEN 'INSERT' THEN 'created' WHEN 'UPDATE' THEN 'updated' ELSE 'deleted' END,
+        'id', d.id, 'title', d.title, 'owner_id', d.owner_id,
+        'is_public', d.is_public, 'was_public', was_public, 'version', d.version
+    ));
+    RETURN NULL;
+END
+$$;
+
+DROP TRIGGER IF EXISTS live_dashboards_change ON dashboards;
+CREATE TRIGGER live_dashboards_change AFTER INSERT OR UPDATE OR DELETE ON dashboards
+    FOR EACH ROW EXECUTE FUNCTION live_dashboards_row();
+"""
+
+ESCROW_TRIGGERS = r"""
+CREATE OR REPLACE FUNCTION live_escrow_files_insert() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    PERFORM live_notify(jsonb_build_object(
+        'type', 'escrow.ingested', 'id', NEW.id, 'filename', NEW.filename,
+        'rows', NEW.rows, 'uploaded_by', NEW.uploaded_by
+    ));
+    RETURN NULL;
+END
+$$;
+
+DROP TRIGGER IF EXISTS live_escrow_files_insert ON escrow_files;
+CREATE TRIGGER live_escrow_files_insert AFTER INSERT ON escrow_files
+    FOR EACH ROW EXECUTE FUNCTION live_escrow_files_insert();
+"""
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    bind.exec_driver_sql(LIVE_EVENT_FUNCTIONS)
+    bind.exec_driver_sql(USERS_TRIGGERS)
+    if _has_table('dashboards'):
+        bind.exec_driver_sql(DASHBOARDS_TRIGGERS)
+    if _has_table('escrow_files'):
+        bind.exec_driver_sql(ESCROW_TRIGGERS)
+
+
+def downgrade() -> None:
+    for table, triggers in (
+        ('users', ('live_users_insert', 'live_users_delete', 'live_users_update')),
+        ('dashboards', ('live_dashboards_change',)),
+        ('escrow_files', ('live_escrow_files_insert',)),
+    ):
+        if _has_table(table):
+            for trigger in triggers:
+                op.execute(f"DROP TRIGGER IF EXISTS {trigger} ON {table}")
+    op.execute("DROP FUNCTION IF EXISTS live_users_rows(), live_users_update(), "
+               "live_dashboards_row(), live_escrow_files_insert()")
+    op.execute("DROP FUNCTION IF EXISTS live_user_event(text, users), live_notify(jsonb)")
@@ -0,0 +1,41 @@
+"""add pg_trgm indexes for users search
+
+Revision ID: c4d8e2f6a1b3
+Revises: b7e3f1a9c2d4
+Create Date: 2026-10-19 12:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4d8e2f6a1b3'
+down_revision: Union[str, None] = 'b7e3f1a9c2d4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    # CONCURRENTLY нельзя внутри транзакции — выходим в autocommit
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_users_username_trgm', 'users', ['username'],
+            postgresql_using='gin', postgresql_ops={'username': 'gin_trgm_ops'},
+            postgresql_concurrently=True, if_not_exists=True,
+        )
+        op.create_index(
+            'ix_users_email_trgm', 'users', ['email'],
+            postgresql_using='gin', postgresql_ops={'email': 'gin_trgm_ops'},
+            postgresql_concurrently=True, if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_users_email_trgm', table_name='users', postgresql_concurrently=True, if_exists=True)
+        op.drop_index('ix_users_username_trgm', table_name='users', postgresql_concurrently=True, if_exists=True)
+    # Расширение pg_trgm оставляем: им могут пользоваться другие объекты
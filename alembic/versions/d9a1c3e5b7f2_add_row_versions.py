@@ -0,0 +1,35 @@
+"""add version columns to users and dashboards
+
+Revision ID: d9a1c3e5b7f2
+Revises: c4d8e2f6a1b3
+Create Date: 2026-10-19 13:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd9a1c3e5b7f2'
+down_revision: Union[str, None] = 'c4d8e2f6a1b3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _has_table(name: str) -> bool:
+    # dashboards создаётся через create_all при старте приложения и может ещё отсутствовать
+    return name in sa.inspect(op.get_bind()).get_table_names()
+
+
+def upgrade() -> None:
+    op.add_column('users', sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+    if _has_table('dashboards'):
+        op.add_column('dashboards', sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade() -> None:
+    if _has_table('dashboards'):
+        op.drop_column('dashboards', 'version')
+    op.drop_column('users', 'version')
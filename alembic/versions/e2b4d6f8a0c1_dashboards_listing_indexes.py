@@ -0,0 +1,47 @@
+"""dashboards listing indexes (owner/public + id, title trigram)
+
+Revision ID: e2b4d6f8a0c1
+Revises: d9a1c3e5b7f2
+Create Date: 2026-10-19 13:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e2b4d6f8a0c1'
+down_revision: Union[str, None] = 'd9a1c3e5b7f2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _has_table(name: str) -> bool:
+    # dashboards создаётся через create_all при старте приложения и может ещё отсутствовать
+    return name in sa.inspect(op.get_bind()).get_table_names()
+
+
+def upgrade() -> None:
+    if not _has_table('dashboards'):
+        return
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.drop_index('ix_dashboards_owner', table_name='dashboards', if_exists=True)
+    op.drop_index('ix_dashboards_public', table_name='dashboards', if_exists=True)
+    op.create_index('ix_dashboards_owner', 'dashboards', ['owner_id', 'id'])
+    op.create_index('ix_dashboards_public', 'dashboards', ['is_public', 'id'])
+    op.create_index(
+        'ix_dashboards_title_trgm', 'dashboards', ['title'],
+        postgresql_using='gin', postgresql_ops={'title': 'gin_trgm_ops'},
+    )
+
+
+def downgrade() -> None:
+    if not _has_table('dashboards'):
+        return
+    op.drop_index('ix_dashboards_title_trgm', table_name='dashboards')
+    op.drop_index('ix_dashboards_public', table_name='dashboards')
+    op.drop_index('ix_dashboards_owner', table_name='dashboards')
+    op.create_index('ix_dashboards_public', 'dashboards', ['is_public'])
+    op.create_index('ix_dashboards_owner', 'dashboards', ['owner_id'])
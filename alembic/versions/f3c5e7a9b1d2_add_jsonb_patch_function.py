@@ -0,0 +1,105 @@
+"""add jsonb_patch_apply() for RFC 6902 patches on dashboards.config
+
+Revision ID: f3c5e7a9b1d2
+Revises: e2b4d6f8a0c1
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3c5e7a9b1d2'
+down_revision: Union[str, None] = 'e2b4d6f8a0c1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Снимок app/services/json_patch.py:JSONB_PATCH_FUNCTION на момент миграции
+JSONB_PATCH_FUNCTION = r"""
+CREATE OR REPLACE FUNCTION jsonb_patch_apply(doc jsonb, ops jsonb) RETURNS jsonb
+LANGUAGE plpgsql IMMUTABLE AS $$
+DECLARE
+    op jsonb;
+    path text[];
+    parent text[];
+    src text[];
+    val jsonb;
+    n int;
+BEGIN
+    FOR op IN SELECT * FROM jsonb_array_elements(ops) LOOP
+        path := ARRAY(SELECT jsonb_array_elements_text(op->'path'));
+        n := cardinality(path);
+        parent := path[1:n - 1];
+
+        CASE op->>'op'
+        WHEN 'test' THEN
+            IF doc #> path IS DISTINCT FROM op->'value' THEN
+                RAISE EXCEPTION 'json patch: test failed at /%', array_to_string(path, '/')
+                    USING ERRCODE = '22023';
+            END IF;
+            CONTINUE;
+        WHEN 'remove' THEN
+            IF n = 0 OR doc #> path IS NULL THEN
+                RAISE EXCEPTION 'json patch: path not found /%', array_to_string(path, '/')
+                    USING ERRCODE = '22023';
+            END IF;
+            doc := doc #- path;
+            CONTINUE;
+        WHEN 'replace' THEN
+            IF doc #> path IS NULL THEN
+                RAISE EXCEPTION 'json patch: path not found /%', array_to_string(path, '/')
+                    USING ERRCODE = '22023';
+            END IF;
+            doc := CASE WHEN n = 0 THEN op->'value' ELSE jsonb_set(doc, path, op->'value', false) END;
+            CONTINUE;
+        WHEN 'move', 'copy' THEN
+            src := ARRAY(SELECT jsonb_array_elements_text(op->'from'));
+            val := doc #> src;
+            IF val IS NULL THEN
+                RAISE EXCEPTION 'json patch: path not found /%', array_to_string(src, '/')
+                    USING ERRCODE = '22023';
+            END IF;
+            IF op->>'op' = 'move' THEN
+                doc := doc #- src;
+            END IF;
+        ELSE
+            val := op->'value';
+        END CASE;
+
+        -- add (а также вторая половина move/copy)
+        IF n = 0 THEN
+            doc := val;
+        ELSIF doc #> parent IS NULL THEN
+            RAISE EXCEPTION 'json patch: path not found /%', array_to_string(parent, '/')
+                USING ERRCODE = '22023';
+        ELSIF jsonb_typeof(doc #> parent) = 'array' THEN
+            IF path[n] = '-' THEN
+                doc := CASE WHEN n = 1 THEN doc || jsonb_build_array(val)
+                            ELSE jsonb_set(doc, parent, (doc #> parent) || jsonb_build_array(val)) END;
+            ELSIF path[n] ~ '^(0|[1-9][0-9]*)$'
+                  AND path[n]::int <= jsonb_array_length(doc #> parent) THEN
+                doc := jsonb_insert(doc, path, val);
+            ELSE
+                RAISE EXCEPTION 'json patch: bad array index /%', array_to_string(path, '/')
+                    USING ERRCODE = '22023';
+            END IF;
+        ELSE
+            doc := jsonb_set(doc, path, val, true);
+        END IF;
+    END LOOP;
+    RETURN doc;
+END
+$$;
+"""
+
+
+def upgrade() -> None:
+    # exec_driver_sql: без разбора :name / % — тело plpgsql уходит как есть
+    op.get_bind().exec_driver_sql(JSONB_PATCH_FUNCTION)
+
+
+def downgrade() -> None:
+    op.execute("DROP FUNCTION IF EXISTS jsonb_patch_apply(jsonb, jsonb)")
@@ -1,29 +1,44 @@
-from typing import Optional
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+import os
+from datetime import datetime
+from typing import Literal, Optional
+from fastapi import APIRouter, Depends, HTTPException, status, Query, UploadFile, File, Request
+from fastapi.responses import FileResponse, StreamingResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import or_
+from sqlalchemy import or_, tuple_
+from sqlalchemy.exc import IntegrityError
 
 from app import models, schemas
-from app.db import get_db
+from app.db import get_db, get_read_db, estimate_count, escape_like
+from app.core.serialization import rows_response
+from app.core.etag import rows_etag, etag_matches, not_modified, set_etag
 from app.auth import get_password_hash, get_current_admin
+from app.token_revocation import revoke_user_tokens
+from app.services import stats, user_import
+from app.services.audit import record as audit
+from app.core import profiling
 from app.models import UserRole
 
 router = APIRouter(prefix="/admin", tags=["admin"])
 
 
+TotalMode = Literal["exact", "estimate", "none"]
+
+
 # 🔹 Универсальная функция выборки пользователей
 def get_users_query(
     db: Session,
     search: Optional[str] = None,
     role: Optional[UserRole] = None,
     limit: int = 20,
-    offset: int = 0
+    offset: int = 0,
+    cursor: Optional[int] = None,
+    total_mode: TotalMode = "exact",
 ) -> schemas.UserListOut:
     query = db.query(models.User)
 
-    # Поиск по username/email
+    # Поиск по username/email (GIN pg_trgm индексы ix_users_*_trgm)
     if search:
-        like_pattern = f"%{search}%"
+        like_pattern = f"%{escape_like(search)}%"
         query = query.filter(
             or_(
                 models.User.username.ilike(like_pattern),
@@ -35,35 +50,68 @@ def get_users_query(
     if isinstance(role, UserRole):
         query = query.filter(models.User.role == role)
 
-    total = query.count()
-    users = (
-        query.order_by(models.User.id.desc())
-        .offset(offset)
-        .limit(limit)
-        .all()
+    if total_mode == "exact":
+        total = query.count()
+    elif total_mode == "estimate":
+        total = estimate_count(db, query)
+    else:
+        total = None
+
+    # Keyset-пагинация по id: cursor — id последнего пользователя предыдущей страницы
+    page = query.order_by(models.User.id.desc())
+    if cursor is not None:
+        page = page.filter(models.User.id < cursor)
+    elif offset:
+        page = page.offset(offset)
+
+    users = page.limit(limit + 1).all()
+    next_cursor = users[limit - 1].id if len(users) > limit else None
+
+    # model_construct: ORM-строки не валидируются повторно (см. list_users)
+    return schemas.UserListOut.model_construct(
+        users=users[:limit],
+        total=total,
+        total_estimated=total_mode == "estimate",
+        next_cursor=next_cursor,
     )
-    return schemas.UserListOut(users=users, total=total)
 
 
 # 🔹 Получение списка пользователей
 @router.get("/users", response_model=schemas.UserListOut)
 def list_users(
-    db: Session = Depends(get_db),
+    request: Request,
+    db: Session = Depends(get_read_db),
     _: models.User = Depends(get_current_admin),
     search: Optional[str] = Query(None, description="Поиск по username или email"),
     role: Optional[UserRole] = Query(None, description="Фильтр по роли"),
     limit: int = Query(20, ge=1, le=100),
-    offset: int = Query(0, ge=0)
+    offset: int = Query(0, ge=0),
+    cursor: Optional[int] = Query(None, description="next_cursor из предыдущего ответа (вместо offset)"),
+    total: TotalMode = Query("exact", description="exact — COUNT(*), estimate — оценка планировщика, none — без total"),
 ):
-    return get_users_query(db, search, role, limit, offset)
+    page = get_users_query(db, search, role, limit, offset, cursor, total)
+
+    # Список не менялся — отвечаем 304, тело не сериализуем
+    etag = rows_etag(page.users, page.total, search, role, limit, offset, cursor, total)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
+    response = rows_response(
+        page.users, schemas.UserOut, key="users",
+        total=page.total,
+        total_estimated=page.total_estimated,
+        next_cursor=page.next_cursor,
+    )
+    return set_etag(response, etag)
 
 
 # 🔹 Создание пользователя
 @router.post("/users", response_model=schemas.UserOut, status_code=status.HTTP_201_CREATED)
 def create_user(
     user_in: schemas.UserCreate,
+    request: Request,
     db: Session = Depends(get_db),
-    _: models.User = Depends(get_current_admin)
+    admin: models.User = Depends(get_current_admin)
 ):
     if db.query(models.User).filter(models.User.username == user_in.username).first():
         raise HTTPException(status_code=400, detail="Пользователь уже существует")
@@ -78,23 +126,71 @@ def create_user(
     db.add(user)
     db.commit()
     db.refresh(user)
+    audit("user_create", user=admin, request=request, target=f"user:{user.id}", role=user.role.value)
 
     return user
 
 
+# 🔹 Массовый импорт пользователей из CSV/XLSX/XLS
+@router.post("/users/import", response_model=schemas.UserImportResult)
+def import_users(
+    request: Request,
+    file: UploadFile = File(..., description="CSV, XLSX или XLS с колонками username, email, password[, role]"),
+    dry_run: bool = Query(False, description="Только проверить файл, ничего не создавать"),
+    db: Session = Depends(get_db),
+    admin: models.User = Depends(get_current_admin)
+):
+    try:
+        df = user_import.read_users_file(file.filename or "", file.file.read())
+        valid, errors = user_import.validate_users(db, df)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if dry_run:
+        return schemas.UserImportResult(created=0, errors=errors)
+
+    try:
+        created = user_import.import_users(db, valid)
+    except IntegrityError:
+        # Кто-то успел создать тех же пользователей между проверкой и вставкой
+        raise HTTPException(status_code=409, detail="Конфликт при вставке, повторите импорт")
+
+    audit("users_import", user=admin, request=request, target=file.filename, created=created, errors=len(errors))
+    return schemas.UserImportResult(created=created, errors=errors)
+
+
+# 🔹 Потоковая выгрузка пользователей в CSV
+@router.get("/users/export")
+def export_users(
+    _: models.User = Depends(get_current_admin)
+):
+    return StreamingResponse(
+        user_import.stream_users_csv(),
+        media_type="text/csv; charset=utf-8",
+        headers={"Content-Disposition": 'attachment; filename="users.csv"'},
+    )
+
+
 # 🔹 Обновление пользователя
 @router.put("/users/{user_id}", response_model=schemas.UserOut, status_code=status.HTTP_200_OK)
 def update_user(
     user_id: int,
     user_in: schemas.UserUpdate,
+    request: Request,
     db: Session = Depends(get_db),
-    _: models.User = Depends(get_current_admin)
+    admin: models.User = Depends(get_current_admin)
 ):
     db_user = db.query(models.User).filter(models.User.id == user_id).first()
     if not db_user:
         raise HTTPException(status_code=404, detail="Пользователь не найден")
 
     update_data = user_in.dict(exclude_unset=True)
+    # В журнал — какие поля менялись; пароль не пишем
+    changes = {k: (v.value if isinstance(v, UserRole) else v) for k, v in update_data.items() if k != "password"}
+    # Смена пароля или блокировка — выданные ранее токены больше не действуют
+    if "password" in update_data or update_data.get("is_active") is False:
+        revoke_user_tokens(db, db_user.id, reason="admin_update", commit=False)
+
     if "password" in update_data:
         db_user.hashed_password = get_password_hash(update_data.pop("password"))
 
@@ -103,6 +199,10 @@ def update_user(
 
     db.commit()
     db.refresh(db_user)
+    audit(
+        "user_update", user=admin, request=request, target=f"user:{db_user.id}",
+        changes=changes, password_changed="password" in user_in.model_fields_set,
+    )
 
     return db_user
 
@@ -111,15 +211,18 @@ def update_user(
 @router.delete("/users/{user_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_user(
     user_id: int,
+    request: Request,
     db: Session = Depends(get_db),
-    _: models.User = Depends(get_current_admin)
+    admin: models.User = Depends(get_current_admin)
 ):
     user = db.query(models.User).filter(models.User.id == user_id).first()
     if not user:
         raise HTTPException(status_code=404, detail="Пользователь не найден")
 
+    username = user.username
     db.delete(user)
     db.commit()
+    audit("user_delete", user=admin, request=request, target=f"user:{user_id}", username=username)
     return  # 204 No Content
 
 
@@ -128,19 +231,86 @@ def delete_user(
 def update_user_status(
     user_id: int,
     is_active: bool,
+    request: Request,
     db: Session = Depends(get_db),
-    _: models.User = Depends(get_current_admin)
+    admin: models.User = Depends(get_current_admin)
 ):
     user = db.query(models.User).filter(models.User.id == user_id).first()
     if not user:
         raise HTTPException(status_code=404, detail="Пользователь не найден")
 
     user.is_active = is_active
+    if not is_active:
+        revoke_user_tokens(db, user.id, reason="blocked", commit=False)
     db.commit()
     db.refresh(user)
+    audit("user_status", user=admin, request=request, target=f"user:{user.id}", is_active=is_active)
     return user
 
 
+# 🔹 Статистика: счётчики из stat_counters / daily_counters, без COUNT(*) по таблицам
+@router.get("/stats", response_model=schemas.StatsOut)
+def get_stats(
+    db: Session = Depends(get_read_db),
+    _: models.User = Depends(get_current_admin),
+):
+    return stats.collect_stats(db)
+
+
+# 🔹 Журнал аудита: новые события первыми, keyset-пагинация по (created_at, id)
+@router.get("/audit", response_model=schemas.AuditEventListOut)
+def list_audit_events(
+    db: Session = Depends(get_read_db),
+    _: models.User = Depends(get_current_admin),
+    user_id: Optional[int] = Query(None, description="Кто совершил действие"),
+    event_type: Optional[str] = Query(None, description="Тип события, например login_failed"),
+    since: Optional[datetime] = Query(None, description="Не раньше (UTC)"),
+    until: Optional[datetime] = Query(None, description="Раньше (UTC)"),
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = Query(None, description="next_cursor из предыдущего ответа"),
+):
+    AuditEvent = models.AuditEvent
+    query = db.query(AuditEvent)
+    if user_id is not None:
+        query = query.filter(AuditEvent.user_id == user_id)
+    if event_type:
+        query = query.filter(AuditEvent.event_type == event_type)
+    # Условия по created_at отсекают лишние месячные секции
+    if since is not None:
+        query = query.filter(AuditEvent.created_at >= since)
+    if until is not None:
+        query = query.filter(AuditEvent.created_at < until)
+    if cursor:
+        try:
+            ts, _, last_id = cursor.rpartition("_")
+            key = (datetime.fromisoformat(ts), int(last_id))
+        except ValueError:
+            raise HTTPException(status_code=422, detail="Некорректный cursor")
+        query = query.filter(tuple_(AuditEvent.created_at, AuditEvent.id) < key)
+
+    events = query.order_by(AuditEvent.created_at.desc(), AuditEvent.id.desc()).limit(limit + 1).all()
+    next_cursor = None
+    if len(events) > limit:
+        last = events[limit - 1]
+        next_cursor = f"{last.created_at.isoformat()}_{last.id}"
+
+    return rows_response(events[:limit], schemas.AuditEventOut, key="events", next_cursor=next_cursor)
+
+
+# 🔹 Профили запросов (X-Profile: 1), файлы speedscope
+@router.get("/profiles", response_model=list[str])
+def list_profiles(admin: models.User = Depends(get_current_admin)):
+    return profiling.list_profiles()
+
+
+@router.get("/profiles/{profile_id}")
+def get_profile(profile_id: str, admin: models.User = Depends(get_current_admin)):
+    path = profiling.profile_path(profile_id)
+    if path is None or not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="Профиль не найден")
+    return FileResponse(path, media_type="application/json", filename=os.path.basename(path))
+
+
 # 🔹 Получение списка доступных ролей
 @router.get("/roles", response_model=list[str])
 def list_roles(
@@ -1,13 +1,57 @@
 from typing import List, Optional, Tuple
-from fastapi import APIRouter, UploadFile, File, Form, HTTPException
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Request
+from fastapi.responses import ORJSONResponse
+from starlette.concurrency import run_in_threadpool
+import hashlib
 import io
 import logging
 
+from app.core import config
+from app.core.admission import AdmissionController, AdmissionRejected
+from app.core.singleflight import SingleFlight
+from app.db import engine
+from app.services.audit import record as audit
 from app.services.excel_utils import analyze_excel_files
+from app.token_utils import decode_token
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
+# Анализ грузит CPU: ограничиваем параллельность, остальным — очередь или 429
+analyze_admission = AdmissionController(
+    "analyze_excel",
+    limit=config.ANALYZE_MAX_CONCURRENT,
+    max_queue=config.ANALYZE_MAX_QUEUE,
+    per_user=config.ANALYZE_PER_USER,
+    timeout=config.ANALYZE_QUEUE_TIMEOUT,
+    global_slots=config.ANALYZE_GLOBAL_SLOTS,
+    lock_namespace=0x45584C,  # "EXL"
+    engine=engine,
+)
+
+# Одинаковые файлы с одинаковыми параметрами, пришедшие одновременно, считаются один раз
+analyze_flights = SingleFlight(
+    "analyze_excel", config.ANALYZE_SINGLEFLIGHT_DIR, config.ANALYZE_SINGLEFLIGHT_GRACE
+)
+
+
+def analysis_key(files: List[Tuple[str, bytes]], **params) -> str:
+    """Ключ анализа: имена и содержимое файлов по порядку + параметры."""
+    h = hashlib.sha256(repr(sorted(params.items())).encode())
+    for filename, content in files:
+        h.update(f"\0{filename}\0{len(content)}\0".encode())
+        h.update(hashlib.sha256(content).digest())
+    return h.hexdigest()
+
+
+def requester_key(request: Request) -> str:
+    """Кому принадлежит запрос — для честной очереди: пользователь из токена или IP."""
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    payload = decode_token(token) if scheme.lower() == "bearer" and token else None
+    if payload and payload.get("sub"):
+        return f"user:{payload['sub']}"
+    return f"ip:{request.client.host if request.client else 'unknown'}"
+
 
 @router.get("/ping-excel")
 async def ping_excel():
@@ -28,6 +72,7 @@ async def ping_excel():
     )
 )
 async def analyze_excel(
+    request: Request,
     files: List[UploadFile] = File(...),
     filter_by_period: str = Form("false"),
     exclude_negative: str = Form("true"),
@@ -48,21 +93,41 @@ async def analyze_excel(
         month,
     )
 
-    # 3) Читаем UploadFile в BytesIO и сохраняем имя
-    excel_buffers: List[Tuple[str, io.BytesIO]] = []
-    for f in files:
-        content = await f.read()
-        buf = io.BytesIO(content)
-        excel_buffers.append((f.filename, buf))
+    # 3) Читаем содержимое файлов
+    contents: List[Tuple[str, bytes]] = [(f.filename, await f.read()) for f in files]
+    params = dict(
+        year=year,
+        month=month,
+        filter_by_period=filter_by_period_bool,
+        exclude_negative=exclude_negative_bool,
+    )
+
+    # 4) Ждём слот и запускаем анализ в threadpool (не блокируя event loop).
+    #    Слот берёт только тот запрос, который считает; дубликаты ждут его результат.
+    who = requester_key(request)
+    waited = 0.0
+
+    async def compute() -> dict:
+        nonlocal waited
+        async with analyze_admission.slot(who) as waited:
+            result_df, error_df = await run_in_threadpool(
+                analyze_excel_files,
+                excel_files=[(name, io.BytesIO(content)) for name, content in contents],
+                **params,
+            )
+        return {
+            "results": result_df.to_dict(orient="records"),
+            "errors": error_df.to_dict(orient="records"),
+        }
 
-    # 4) Запускаем анализ и ловим исключения
     try:
-        result_df, error_df = analyze_excel_files(
-            excel_files=excel_buffers,       # теперь список (filename, buffer)
-            year=year,
-            month=month,
-            filter_by_period=filter_by_period_bool,
-            exclude_negative=exclude_negative_bool,
+        payload, shared = await analyze_flights.do(analysis_key(contents, **params), compute)
+    except AdmissionRejected as e:
+        logger.warning("⏳ Анализ отклонён (%s), Retry-After=%s", e.reason, e.retry_after)
+        raise HTTPException(
+            status_code=429,
+            detail="Сервер занят анализом других файлов, повторите позже",
+            headers={"Retry-After": str(e.retry_after)},
         )
     except Exception:
         logger.error("❌ Ошибка при анализе Excel", exc_info=True)
@@ -70,9 +135,27 @@ async def analyze_excel(
             status_code=500,
             detail="Внутренняя ошибка при обработке Excel-файлов. Смотрите логи сервера."
         )
+    if shared:
+        logger.info("🔁 Результат анализа взят у одновременного такого же запроса")
+
+    audit(
+        "excel_analyze",
+        user_id=int(who[5:]) if who.startswith("user:") else None,
+        request=request,
+        files=[f.filename for f in files],
+        objects=len(payload["results"]),
+        errors=len(payload["errors"]),
+        queue_wait_ms=round(waited * 1000),
+        shared=shared,
+    )
+
+    # 5) Возвращаем JSON с результатами и ошибками (сразу orjson, без jsonable_encoder)
+    return ORJSONResponse(
+        payload,
+        headers={"X-Queue-Wait-Ms": f"{waited * 1000:.0f}", "X-Analysis-Shared": "1" if shared else "0"},
+    )
+
 
-    # 5) Возвращаем JSON с результатами и ошибками
-    return {
-        "results": result_df.to_dict(orient="records"),
-        "errors": error_df.to_dict(orient="records"),
-    }
+@router.get("/analyze-excel/status", summary="Загрузка анализатора Excel (этот воркер)")
+async def analyze_excel_status():
+    return {**analyze_admission.stats(), "singleflight": analyze_flights.stats()}
@@ -1,22 +1,24 @@
 import logging
-from datetime import datetime
-from fastapi import APIRouter, Depends, HTTPException, status, Response, Cookie
+from datetime import datetime, timedelta
+from fastapi import APIRouter, Depends, HTTPException, status, Response, Cookie, Request
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
 
 from app import models
 from app.models import UserRole
 from app.db import get_db
-from app.core.config import ACCESS_TOKEN_EXPIRE_MINUTES
+from app.core.config import ACCESS_TOKEN_EXPIRE_MINUTES, REFRESH_TOKEN_EXPIRE_DAYS, ACTIVITY_TOUCH_SECONDS
 from app.token_utils import create_access_token, create_refresh_token, decode_token
+from app.token_revocation import revocation_cache, revoke_token, revoke_user_tokens
 from app.security import get_password_hash, safe_verify_password
+from app.services.audit import record as audit
 
 router = APIRouter(tags=["auth"])
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/login")
 
 REFRESH_COOKIE_NAME = "refresh_token"
-REFRESH_COOKIE_MAX_AGE = 7 * 24 * 3600  # 7 дней
+REFRESH_COOKIE_MAX_AGE = REFRESH_TOKEN_EXPIRE_DAYS * 24 * 3600
 
 
 def get_current_user(
@@ -29,7 +31,11 @@ def get_current_user(
         headers={"WWW-Authenticate": "Bearer"},
     )
     payload = decode_token(token)
-    if not payload:
+    if not payload or payload.get("type") == "refresh":
+        raise credentials_exception
+
+    # Проверка отзыва — только по памяти воркера, без запроса в БД
+    if revocation_cache.is_revoked(payload):
         raise credentials_exception
 
     user_id: str | None = payload.get("sub")
@@ -46,6 +52,12 @@ def get_current_user(
             detail="Аккаунт заблокирован"
         )
 
+    # last_activity — не чаще раза в ACTIVITY_TOUCH_SECONDS, а не на каждый запрос
+    now = datetime.utcnow()
+    if user.last_activity is None or now - user.last_activity >= timedelta(seconds=ACTIVITY_TOUCH_SECONDS):
+        user.touch_activity()
+        db.commit()
+
     return user
 
 
@@ -78,8 +90,20 @@ def require_roles(allowed: list[UserRole]):
     return wrapper
 
 
+def _set_refresh_cookie(response: Response, refresh_token: str):
+    response.set_cookie(
+        key=REFRESH_COOKIE_NAME,
+        value=refresh_token,
+        httponly=True,
+        secure=False,  # ⚠️ в проде True
+        samesite="lax",
+        max_age=REFRESH_COOKIE_MAX_AGE,
+    )
+
+
 @router.post("/login")
 async def login(
+    request: Request,
     response: Response,
     form_data: OAuth2PasswordRequestForm = Depends(),
     db: Session = Depends(get_db)
@@ -87,9 +111,11 @@ async def login(
     user = db.query(models.User).filter_by(username=form_data.username).first()
     if not user:
         logging.info(f"❌ Попытка входа с несуществующим пользователем: {form_data.username}")
+        audit("login_failed", username=form_data.username, request=request, reason="unknown_user")
         raise HTTPException(status_code=401, detail="Неверное имя пользователя или пароль")
 
     if not user.is_active:
+        audit("login_failed", user=user, request=request, reason="blocked")
         raise HTTPException(status_code=403, detail="Аккаунт заблокирован")
 
     # Автофикс битого хэша
@@ -105,6 +131,7 @@ async def login(
 
     if not safe_verify_password(form_data.password, user.hashed_password):
         logging.info(f"❌ Неверный пароль для пользователя {form_data.username}")
+        audit("login_failed", user=user, request=request, reason="bad_password")
         raise HTTPException(status_code=401, detail="Неверное имя пользователя или пароль")
 
     role = user.role.value
@@ -119,16 +146,10 @@ async def login(
     access_token = create_access_token({"sub": str(user.id), "role": role}, expires_minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     refresh_token = create_refresh_token({"sub": str(user.id), "role": role})
 
-    response.set_cookie(
-        key=REFRESH_COOKIE_NAME,
-        value=refresh_token,
-        httponly=True,
-        secure=False,  # ⚠️ в проде True
-        samesite="lax",
-        max_age=REFRESH_COOKIE_MAX_AGE,
-    )
+    _set_refresh_cookie(response, refresh_token)
 
     logging.info(f"✅ Пользователь {user.username} вошёл в систему с ролью {role}")
+    audit("login", user=user, request=request, role=role)
 
     return {"access_token": access_token, "token_type": "bearer", "role": role, "username": user.username}
 
@@ -143,7 +164,7 @@ async def refresh_token_endpoint(
         raise HTTPException(status_code=401, detail="Refresh token отсутствует")
 
     payload = decode_token(refresh_token)
-    if not payload:
+    if not payload or payload.get("type") != "refresh" or not payload.get("jti"):
         raise HTTPException(status_code=401, detail="Неверный refresh token")
 
     user_id: str | None = payload.get("sub")
@@ -157,21 +178,49 @@ async def refresh_token_endpoint(
     if not user.is_active:
         raise HTTPException(status_code=403, detail="Аккаунт заблокирован")
 
+    # Все токены пользователя отозваны (блокировка, смена пароля) — нужен новый логин
+    if revocation_cache.issued_before_cutoff(payload):
+        response.delete_cookie(REFRESH_COOKIE_NAME)
+        raise HTTPException(status_code=401, detail="Refresh token отозван")
+
+    # Ротация: старый refresh отзывается атомарно (INSERT ... ON CONFLICT DO NOTHING).
+    # Если он уже был отозван — токен предъявлен повторно, отзываем всю цепочку.
+    if not revoke_token(db, payload, reason="rotated"):
+        revoke_user_tokens(db, user.id, reason="refresh_reuse")
+        response.delete_cookie(REFRESH_COOKIE_NAME)
+        logging.warning(f"🚨 Повторное использование refresh токена пользователя {user.username}")
+        raise HTTPException(status_code=401, detail="Refresh token отозван")
+
     # Берём роль из БД (актуально), а не из payload
     role = user.role.value
 
     new_access = create_access_token({"sub": str(user.id), "role": role}, expires_minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     new_refresh = create_refresh_token({"sub": str(user.id), "role": role})
 
-    response.set_cookie(
-        key=REFRESH_COOKIE_NAME,
-        value=new_refresh,
-        httponly=True,
-        secure=False,  # ⚠️ в проде True
-        samesite="lax",
-        max_age=REFRESH_COOKIE_MAX_AGE,
-    )
+    _set_refresh_cookie(response, new_refresh)
 
     logging.info(f"♻ Refresh токен обновлён для пользователя {user.username}")
 
     return {"access_token": new_access, "token_type": "bearer", "role": role, "username": user.username}
+
+
+@router.post("/logout")
+async def logout(
+    request: Request,
+    response: Response,
+    refresh_token: str | None = Cookie(default=None),
+    db: Session = Depends(get_db)
+):
+    # Отзываем и refresh из cookie, и access из заголовка (если они ещё валидны)
+    tokens = [refresh_token, request.headers.get("authorization", "").replace("Bearer ", "").strip()]
+    user_id = None
+    for token in filter(None, tokens):
+        payload = decode_token(token)
+        if payload and payload.get("jti") and payload.get("sub"):
+            revoke_token(db, payload, reason="logout")
+            user_id = int(payload["sub"])
+    if user_id is not None:
+        audit("logout", user_id=user_id, request=request)
+
+    response.delete_cookie(REFRESH_COOKIE_NAME)
+    return {"status": "ok"}
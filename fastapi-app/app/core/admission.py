@@ -0,0 +1,224 @@
+"""
+Допуск к тяжёлым (CPU) операциям: ограничение параллельности с очередью.
+
+AdmissionController на воркер пропускает не больше limit операций
+одновременно. Остальные ждут в ограниченной очереди: очередь общая, но
+слоты раздаются по кругу между пользователями, поэтому один пользователь
+с пачкой файлов не оттесняет остальных. Кроме того, у пользователя не
+больше per_user операций в работе и в очереди вместе.
+
+Если очередь полна, лимит пользователя исчерпан или ожидание дольше
+timeout — AdmissionRejected; обработчик отвечает 429 с Retry-After.
+
+Опционально (global_slots > 0) поверх локального слота берётся один из
+global_slots advisory-локов Postgres: так лимит действует на все воркеры
+и контейнеры сразу. Лок сессионный и держится на отдельном соединении,
+пока идёт операция.
+"""
+import asyncio
+import math
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Optional
+
+from prometheus_client import Counter, Gauge, Histogram
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+from starlette.concurrency import run_in_threadpool
+
+QUEUE_DEPTH = Gauge(
+    "admission_queue_depth", "Операции в очереди на выполнение", ["name"], multiprocess_mode="livesum"
+)
+IN_PROGRESS = Gauge(
+    "admission_in_progress", "Выполняющиеся операции", ["name"], multiprocess_mode="livesum"
+)
+WAIT_SECONDS = Histogram(
+    "admission_wait_seconds", "Ожидание в очереди перед выполнением", ["name"],
+    buckets=(0.01, 0.05, 0.1, 0.5, 1, 2.5, 5, 10, 30, 60),
+)
+REJECTED = Counter("admission_rejected", "Отказы (429)", ["name", "reason"])
+
+GLOBAL_LOCK_POLL_SECONDS = 0.25
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    def __init__(
+        self,
+        name: str,
+        limit: int,
+        max_queue: int,
+        per_user: int,
+        timeout: float,
+        global_slots: int = 0,
+        lock_namespace: int = 0,
+        engine=None,
+    ):
+        self.name = name
+        self.limit = limit
+        self.max_queue = max_queue
+        self.per_user = per_user
+        self.timeout = timeout
+        self.global_slots = global_slots
+        self.lock_namespace = lock_namespace
+        self.engine = engine
+
+        self.active = 0
+        self.queued = 0
+        self._per_user: dict[str, int] = {}
+        # user → очередь ожидающих; порядок ключей — порядок обхода по кругу
+        self._waiting: OrderedDict[str, deque[asyncio.Future]] = OrderedDict()
+        self._avg_seconds = 5.0  # скользящее среднее длительности — для Retry-After
+
+    # --- Retry-After ---------------------------------------------------------
+
+    def retry_after(self) -> int:
+        return max(1, math.ceil(self._avg_seconds * (self.queued + 1) / max(self.limit, 1)))
+
+    def _reject(self, reason: str):
+        REJECTED.labels(self.name, reason).inc()
+        raise AdmissionRejected(reason, self.retry_after())
+
+    # --- локальные слоты -----------------------------------------------------
+
+    def _update_gauges(self):
+        QUEUE_DEPTH.labels(self.name).set(self.queued)
+        IN_PROGRESS.labels(self.name).set(self.active)
+
+    def _forget_user(self, user: str):
+        left = self._per_user.get(user, 0) - 1
+        if left > 0:
+            self._per_user[user] = left
+        else:
+            self._per_user.pop(user, None)
+
+    def _grant_next(self) -> bool:
+        """Передаёт освободившийся слот следующему пользователю по кругу."""
+        while self._waiting:
+            user, futures = next(iter(self._waiting.items()))
+            future = futures.popleft()
+            if futures:
+                self._waiting.move_to_end(user)
+            else:
+                del self._waiting[user]
+            if future.done():  # ожидание уже отменено по таймауту
+                continue
+            self.queued -= 1
+            future.set_result(None)
+            return True
+        return False
+
+    async def _acquire_local(self, user: str):
+        if self._per_user.get(user, 0) >= self.per_user:
+            self._reject("per_user")
+        if self.active < self.limit and not self._waiting:
+            self.active += 1
+            self._per_user[user] = self._per_user.get(user, 0) + 1
+            self._update_gauges()
+            return
+        if self.queued >= self.max_queue:
+            self._reject("queue_full")
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiting.setdefault(user, deque()).append(future)
+        self.queued += 1
+        self._per_user[user] = self._per_user.get(user, 0) + 1
+        self._update_gauges()
+        try:
+            await asyncio.wait_for(future, self.timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if future.done() and not future.cancelled():
+                # Слот выдали в тот же момент — отдаём его дальше
+                self._release_local(user)
+            else:
+                futures = self._waiting.get(user)
+                if futures is not None and future in futures:
+                    futures.remove(future)
+                    if not futures:
+                        del self._waiting[user]
+                self.queued -= 1
+                self._forget_user(user)
+                self._update_gauges()
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            self._reject("timeout")
+        # Слот перешёл от завершившейся операции: active не меняется
+        self._update_gauges()
+
+    def _release_local(self, user: str):
+        self._forget_user(user)
+        if not self._grant_next():
+            self.active -= 1
+        self._update_gauges()
+
+    # --- глобальные слоты (advisory locks) -----------------------------------
+
+    def _acquire_global(self, deadline: float) -> Optional[Connection]:
+        conn = self.engine.connect()
+        try:
+            while True:
+                for slot in range(self.global_slots):
+                    got = conn.execute(
+                        text("SELECT pg_try_advisory_lock(:ns, :slot)"),
+                        {"ns": self.lock_namespace, "slot": slot},
+                    ).scalar()
+                    if got:
+                        conn.info["admission_slot"] = slot
+                        return conn
+                if time.monotonic() >= deadline:
+                    conn.close()
+                    return None
+                time.sleep(GLOBAL_LOCK_POLL_SECONDS)
+        except Exception:
+            conn.close()
+            raise
+
+    def _release_global(self, conn: Connection):
+        try:
+            conn.execute(
+                text("SELECT pg_advisory_unlock(:ns, :slot)"),
+                {"ns": self.lock_namespace, "slot": conn.info.pop("admission_slot")},
+            )
+        finally:
+            conn.close()
+
+    # --- публичный интерфейс -------------------------------------------------
+
+    @asynccontextmanager
+    async def slot(self, user: str):
+        """async with controller.slot(user) as waited: ... — waited в секундах."""
+        deadline = time.monotonic() + self.timeout
+        await self._acquire_local(user)
+        conn = None
+        try:
+            if self.global_slots > 0:
+                conn = await run_in_threadpool(self._acquire_global, deadline)
+                if conn is None:
+                    self._reject("global_busy")
+            waited = self.timeout - (deadline - time.monotonic())
+            WAIT_SECONDS.labels(self.name).observe(waited)
+
+            start = time.perf_counter()
+            yield waited
+            self._avg_seconds = 0.8 * self._avg_seconds + 0.2 * (time.perf_counter() - start)
+        finally:
+            if conn is not None:
+                await run_in_threadpool(self._release_global, conn)
+            self._release_local(user)
+
+    def stats(self) -> dict:
+        return {
+            "limit": self.limit,
+            "active": self.active,
+            "queued": self.queued,
+            "max_queue": self.max_queue,
+            "users_waiting": len(self._waiting),
+            "avg_seconds": round(self._avg_seconds, 2),
+        }
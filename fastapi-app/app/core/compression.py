@@ -0,0 +1,178 @@
+"""
+Сжатие ответов (brotli / gzip) — чистый ASGI-middleware.
+
+Кодировка — с наибольшим q из Accept-Encoding, при равных brotli.
+Сжимаются только текстовые типы (JSON, CSV, text/*) от COMPRESSION_MIN_SIZE байт.
+Уже сжатые ответы (есть Content-Encoding), 204/304, частичные ответы и
+text/event-stream пропускаются без изменений.
+
+Потоковые ответы (StreamingResponse) сжимаются по частям: тело копится,
+пока не наберётся порог, дальше каждая часть сжимается с flush, чтобы
+клиент получал данные сразу, а не в конце потока.
+"""
+import zlib
+from typing import Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core import config
+
+try:
+    import brotli
+except ImportError:  # brotli — необязательная зависимость, без неё только gzip
+    brotli = None
+
+COMPRESSIBLE_TYPES = (
+    "application/json",
+    "application/javascript",
+    "application/xml",
+    "text/csv",
+    "text/html",
+    "text/plain",
+    "text/css",
+    "text/javascript",
+    "text/xml",
+    "image/svg+xml",
+)
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """Лучшая поддерживаемая кодировка из Accept-Encoding или None."""
+    weights = {}
+    for item in accept_encoding.lower().split(","):
+        name, _, params = item.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[name.strip()] = q
+
+    # Наибольший q; при равных brotli (он первый в списке, max берёт первый)
+    supported = ("br", "gzip") if brotli is not None else ("gzip",)
+    best = max(supported, key=lambda name: weights.get(name, weights.get("*", 0.0)))
+    return best if weights.get(best, weights.get("*", 0.0)) > 0 else None
+
+
+class _Compressor:
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == "br":
+            self._br = brotli.Compressor(quality=config.BROTLI_QUALITY)
+        else:
+            # wbits=31 — формат gzip (заголовок + crc), а не «сырой» deflate
+            self._gz = zlib.compressobj(config.GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes, flush: bool = False) -> bytes:
+        if self.encoding == "br":
+            out = self._br.process(data)
+            return out + self._br.flush() if flush else out
+        out = self._gz.compress(data)
+        return out + self._gz.flush(zlib.Z_SYNC_FLUSH) if flush else out
+
+    def finish(self, data: bytes = b"") -> bytes:
+        if self.encoding == "br":
+            return self._br.process(data) + self._br.finish()
+        return self._gz.compress(data) + self._gz.flush(zlib.Z_FINISH)
+
+
+def is_compressible(headers: Headers) -> bool:
+    if "content-encoding" in headers or "content-range" in headers:
+        return False
+    content_type = headers.get("content-type", "").split(";")[0].strip().lower()
+    return content_type in COMPRESSIBLE_TYPES
+
+
+class CompressionMiddleware:
+    def __init__(self, app: ASGIApp, minimum_size: Optional[int] = None):
+        self.app = app
+        self.minimum_size = config.COMPRESSION_MIN_SIZE if minimum_size is None else minimum_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["method"] == "HEAD":
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        await _CompressedResponder(self.app, encoding, self.minimum_size)(scope, receive, send)
+
+
+class _CompressedResponder:
+    """Состояние одного ответа: ждём первые части тела и решаем, сжимать ли."""
+
+    def __init__(self, app: ASGIApp, encoding: str, minimum_size: int):
+        self.app = app
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        self.send: Send = None
+        self.start: Optional[Message] = None
+        self.pending: list[bytes] = []
+        self.pending_size = 0
+        self.compressor: Optional[_Compressor] = None
+        self.passthrough = False
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        self.send = send
+        await self.app(scope, receive, self.send_wrapper)
+
+    async def send_wrapper(self, message: Message):
+        if message["type"] == "http.response.start":
+            headers = Headers(raw=message["headers"])
+            if message["status"] in (204, 304) or not is_compressible(headers):
+                self.passthrough = True
+                if message["status"] == 304:
+                    # Тот же Vary, что был бы у 200, иначе кэш смешает варианты
+                    MutableHeaders(raw=message["headers"]).add_vary_header("Accept-Encoding")
+                await self.send(message)
+            else:
+                self.start = message
+            return
+
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.compressor is not None:
+            chunk = self.compressor.compress(body, flush=True) if more_body else self.compressor.finish(body)
+            await self.send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+            return
+
+        self.pending.append(body)
+        self.pending_size += len(body)
+        if more_body and self.pending_size < self.minimum_size:
+            return  # копим начало потока, пока не станет ясно, стоит ли сжимать
+
+        data = b"".join(self.pending)
+        self.pending.clear()
+        headers = MutableHeaders(raw=self.start["headers"])
+        headers.add_vary_header("Accept-Encoding")
+
+        if self.pending_size < self.minimum_size:
+            # Маленький ответ целиком: сжатие не окупается
+            await self.send(self.start)
+            await self.send({"type": "http.response.body", "body": data, "more_body": False})
+            return
+
+        self.compressor = _Compressor(self.encoding)
+        headers["Content-Encoding"] = self.encoding
+        etag = headers.get("etag")
+        if etag and not etag.startswith("W/"):
+            # Сжатое тело побайтно отличается — сильный ETag становится слабым
+            headers["ETag"] = f"W/{etag}"
+
+        if more_body:
+            del headers["Content-Length"]
+            chunk = self.compressor.compress(data, flush=True)
+        else:
+            chunk = self.compressor.finish(data)
+            headers["Content-Length"] = str(len(chunk))
+        await self.send(self.start)
+        await self.send({"type": "http.response.body", "body": chunk, "more_body": more_body})
@@ -4,6 +4,10 @@ import os
 SECRET_KEY = os.getenv("SECRET_KEY", "supersecretkey")
 ALGORITHM = os.getenv("ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 30))
+REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", 7))
+
+# Как часто воркер подтягивает новые отзывы токенов из БД (сек)
+REVOCATION_SYNC_SECONDS = int(os.getenv("REVOCATION_SYNC_SECONDS", 5))
 
 POSTGRES_USER = os.getenv("POSTGRES_USER", "postgres")
 POSTGRES_PASSWORD = os.getenv("POSTGRES_PASSWORD", "postgres")
@@ -15,3 +19,73 @@ DATABASE_URL = (
     f"postgresql://{POSTGRES_USER}:{POSTGRES_PASSWORD}"
     f"@{POSTGRES_HOST}:{POSTGRES_PORT}/{POSTGRES_DB}"
 )
+
+# Реплики только для чтения (URL через запятую; пусто — всё читается с основного сервера),
+# допустимое отставание и период проверки (сек), сколько секунд после своего
+# изменения клиент читает с основного сервера (read-your-writes)
+DATABASE_REPLICA_URLS = [u.strip() for u in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if u.strip()]
+REPLICA_MAX_LAG_SECONDS = float(os.getenv("REPLICA_MAX_LAG_SECONDS", 5))
+REPLICA_CHECK_SECONDS = float(os.getenv("REPLICA_CHECK_SECONDS", 5))
+READ_YOUR_WRITES_SECONDS = float(os.getenv("READ_YOUR_WRITES_SECONDS", 15))
+
+# Число процессов для хэширования паролей при массовом импорте (0 — по числу CPU)
+BULK_HASH_WORKERS = int(os.getenv("BULK_HASH_WORKERS", 0))
+
+# Сжатие ответов: порог в байтах и уровни gzip (1–9) / brotli (0–11)
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", 1024))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", 6))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", 4))
+
+# Логи: уровень, доля записываемых успешных запросов (0–1) и порог «медленного» запроса (мс)
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+ACCESS_LOG_SAMPLE_RATE = float(os.getenv("ACCESS_LOG_SAMPLE_RATE", 1.0))
+ACCESS_LOG_SLOW_MS = float(os.getenv("ACCESS_LOG_SLOW_MS", 1000))
+
+# last_activity пишется в БД не чаще раза в столько секунд на пользователя
+ACTIVITY_TOUCH_SECONDS = int(os.getenv("ACTIVITY_TOUCH_SECONDS", 60))
+
+# Режим отладки: счётчики SQL в заголовках ответа X-DB-*
+DEBUG = os.getenv("DEBUG", "False").lower() == "true"
+# Запросы дольше порога (мс) пишутся в лог медленных запросов
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", 200))
+# Столько одинаковых по форме запросов за один HTTP-запрос — признак N+1
+N_PLUS_ONE_THRESHOLD = int(os.getenv("N_PLUS_ONE_THRESHOLD", 5))
+
+# Профилирование запросов по заголовку X-Profile (только admin)
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(os.getenv("TMPDIR", "/tmp"), "profiles"))
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", 5))
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", 120))
+PROFILE_RATE_LIMIT = int(os.getenv("PROFILE_RATE_LIMIT", 5))   # профилей в минуту на воркер
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", 50))
+
+# Допуск к /api/analyze-excel: одновременно на воркер, длина очереди,
+# операций на пользователя (в работе + в очереди), максимум ожидания (сек)
+ANALYZE_MAX_CONCURRENT = int(os.getenv("ANALYZE_MAX_CONCURRENT", 2))
+ANALYZE_MAX_QUEUE = int(os.getenv("ANALYZE_MAX_QUEUE", 8))
+ANALYZE_PER_USER = int(os.getenv("ANALYZE_PER_USER", 2))
+ANALYZE_QUEUE_TIMEOUT = float(os.getenv("ANALYZE_QUEUE_TIMEOUT", 30))
+# Общий лимит на все воркеры через advisory-локи Postgres (0 — выключен)
+ANALYZE_GLOBAL_SLOTS = int(os.getenv("ANALYZE_GLOBAL_SLOTS", 0))
+# Одинаковые одновременные анализы считаются один раз: каталог lock-файлов,
+# общий для воркеров хоста (пусто — объединение только внутри воркера), и
+# сколько секунд готовый результат отдаётся опоздавшим дубликатам
+ANALYZE_SINGLEFLIGHT_DIR = os.getenv(
+    "ANALYZE_SINGLEFLIGHT_DIR", os.path.join(os.getenv("TMPDIR", "/tmp"), "analyze-singleflight")
+)
+ANALYZE_SINGLEFLIGHT_GRACE = float(os.getenv("ANALYZE_SINGLEFLIGHT_GRACE", 5))
+
+# Журнал аудита: размер пачки записи, период сброса буфера (сек), предел буфера
+# (сверх него события отбрасываются), сколько месяцев хранить секции (0 — всегда)
+AUDIT_BATCH_SIZE = int(os.getenv("AUDIT_BATCH_SIZE", 500))
+AUDIT_FLUSH_SECONDS = float(os.getenv("AUDIT_FLUSH_SECONDS", 1))
+AUDIT_MAX_BUFFER = int(os.getenv("AUDIT_MAX_BUFFER", 10000))
+AUDIT_RETENTION_MONTHS = int(os.getenv("AUDIT_RETENTION_MONTHS", 0))
+
+# /admin/stats: окно «активны сейчас» (мин) и глубина ряда анализов по дням
+STATS_ACTIVE_MINUTES = int(os.getenv("STATS_ACTIVE_MINUTES", 15))
+STATS_DAYS = int(os.getenv("STATS_DAYS", 30))
+
+# /api/events (SSE): очередь событий на подписчика (при переполнении — resync)
+# и период пустых сообщений, чтобы прокси не закрывали простаивающий поток (сек)
+LIVE_EVENTS_QUEUE_SIZE = int(os.getenv("LIVE_EVENTS_QUEUE_SIZE", 100))
+LIVE_EVENTS_HEARTBEAT_SECONDS = float(os.getenv("LIVE_EVENTS_HEARTBEAT_SECONDS", 15))
@@ -0,0 +1,49 @@
+"""
+Слабые ETag и условные GET (If-None-Match → 304).
+
+ETag строится из версий строк, попавших в ответ (id + version), и
+параметров запроса. Любое изменение строки увеличивает её version,
+вставка/удаление меняет набор id — значит меняется и ETag. Совпадение
+проверяется до сериализации тела, поэтому 304 почти ничего не стоит.
+"""
+import hashlib
+from typing import Any, Iterable, Optional
+
+from fastapi import Request, Response
+
+# Браузер хранит ответ, но перед использованием всегда переспрашивает сервер
+CACHE_CONTROL = "private, no-cache"
+
+
+def make_etag(*parts: Any) -> str:
+    digest = hashlib.blake2b(repr(parts).encode(), digest_size=12).hexdigest()
+    return f'W/"{digest}"'
+
+
+def rows_etag(rows: Iterable[Any], *params: Any) -> str:
+    return make_etag(tuple((row.id, row.version) for row in rows), *params)
+
+
+def etag_matches_value(header: Optional[str], etag: str) -> bool:
+    """Есть ли etag в значении If-None-Match / If-Match (список через запятую или *)."""
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # Слабое сравнение: W/ префикс не учитываем
+    wanted = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == wanted for tag in header.split(","))
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    return etag_matches_value(request.headers.get("if-none-match"), etag)
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL})
+
+
+def set_etag(response: Response, etag: str) -> Response:
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CACHE_CONTROL
+    return response
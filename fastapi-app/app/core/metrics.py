@@ -0,0 +1,96 @@
+"""
+Метрики Prometheus (/metrics).
+
+Под gunicorn каждый воркер — отдельный процесс со своими счётчиками.
+Если задан PROMETHEUS_MULTIPROC_DIR (его выставляет gunicorn.conf.py),
+prometheus_client пишет значения в mmap-файлы в этом каталоге, а /metrics
+в любом воркере собирает их через MultiProcessCollector — получается сумма
+по всем процессам, а не по тому, кому достался запрос.
+"""
+import os
+import time
+from contextlib import contextmanager
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds",
+    "Время обработки HTTP-запроса",
+    ["method", "route", "status"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+HTTP_IN_PROGRESS = Gauge(
+    "http_requests_in_progress",
+    "Запросы в обработке",
+    ["method"],
+    multiprocess_mode="livesum",
+)
+DB_POOL_CONNECTIONS = Gauge(
+    "db_pool_connections",
+    "Соединения пула SQLAlchemy по состоянию",
+    ["state"],
+    multiprocess_mode="livesum",
+)
+EXCEL_FILES = Counter(
+    "excel_files_processed",
+    "Обработанные Excel-файлы",
+    ["pipeline", "result"],
+)
+EXCEL_ROWS = Counter(
+    "excel_rows_processed",
+    "Строки, прочитанные из Excel-файлов",
+    ["pipeline"],
+)
+EXCEL_PHASE_SECONDS = Histogram(
+    "excel_phase_duration_seconds",
+    "Время фаз обработки Excel",
+    ["pipeline", "phase"],
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+)
+
+
+def observe_request(method: str, route: str, status: int, duration: float):
+    HTTP_REQUEST_SECONDS.labels(method, route, str(status)).observe(duration)
+
+
+@contextmanager
+def excel_phase(pipeline: str, phase: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        EXCEL_PHASE_SECONDS.labels(pipeline, phase).observe(time.perf_counter() - start)
+
+
+def instrument_pool(engine: Engine):
+    """Обновляет db_pool_connections при каждом checkout/checkin — без опроса при сборе."""
+    pool = engine.pool
+
+    def update(*_):
+        DB_POOL_CONNECTIONS.labels("checked_out").set(pool.checkedout())
+        DB_POOL_CONNECTIONS.labels("idle").set(pool.checkedin())
+        DB_POOL_CONNECTIONS.labels("overflow").set(max(pool.overflow(), 0))
+
+    for name in ("connect", "checkout", "checkin"):
+        event.listen(pool, name, update)
+
+
+def render() -> tuple[bytes, str]:
+    if MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
+
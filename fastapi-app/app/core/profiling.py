@@ -0,0 +1,230 @@
+"""
+Профилирование отдельного запроса по требованию администратора.
+
+Запрос с заголовком X-Profile: 1 и токеном администратора (проверка через
+get_current_admin) выполняется под сэмплирующим профилировщиком: отдельный
+поток каждые PROFILE_INTERVAL_MS снимает стеки через sys._current_frames().
+Код приложения не трассируется, поэтому накладные расходы малы и не
+зависят от числа вызовов функций.
+
+Снимаются event loop и занятые потоки threadpool (там выполняются
+синхронные обработчики); простаивающие потоки пропускаются. Под нагрузкой
+в профиль попадут и соседние запросы — профилируйте в спокойный момент.
+
+Результат — файл speedscope (https://www.speedscope.app) в PROFILE_DIR,
+его id возвращается в заголовке X-Profile-Id, скачать — GET /api/admin/profiles/{id}.
+Число профилей ограничено PROFILE_RATE_LIMIT в минуту на воркер.
+"""
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Optional
+
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core import config
+
+logger = logging.getLogger(__name__)
+
+PROFILE_ID = re.compile(r"^[0-9]{8}T[0-9]{6}-[0-9a-f]{8}$")
+# Верхний кадр простаивающего потока: ожидание очереди / события / select
+IDLE_FRAMES = {
+    ("threading.py", "wait"),
+    ("queue.py", "get"),
+    ("selectors.py", "select"),
+    ("handlers.py", "dequeue"),  # QueueListener логов: SimpleQueue.get() — C-вызов
+}
+
+
+def _is_idle(frame) -> bool:
+    return (os.path.basename(frame.f_code.co_filename), frame.f_code.co_name) in IDLE_FRAMES
+
+
+class StackSampler(threading.Thread):
+    """Снимает стеки всех занятых потоков, пока не вызван stop()."""
+
+    def __init__(self, interval: float, max_seconds: float):
+        super().__init__(name="request-profiler", daemon=True)
+        self.interval = interval
+        self.max_seconds = max_seconds
+        self.frames: dict[tuple, int] = {}
+        # thread name → (стеки как списки индексов кадров, веса в секундах)
+        self.samples: dict[str, tuple[list[list[int]], list[float]]] = {}
+        self.duration = 0.0
+        self._stop_event = threading.Event()
+
+    def _frame_index(self, code) -> int:
+        key = (code.co_name, code.co_filename, code.co_firstlineno)
+        index = self.frames.get(key)
+        if index is None:
+            index = self.frames[key] = len(self.frames)
+        return index
+
+    def run(self):
+        names = {t.ident: t.name for t in threading.enumerate()}
+        start = last = time.perf_counter()
+        while not self._stop_event.wait(self.interval):
+            now = time.perf_counter()
+            weight, last = now - last, now
+            for ident, frame in sys._current_frames().items():
+                if ident == self.ident or _is_idle(frame):
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(self._frame_index(frame.f_code))
+                    frame = frame.f_back
+                stack.reverse()
+                name = names.get(ident)
+                if name is None:
+                    names = {t.ident: t.name for t in threading.enumerate()}
+                    name = names.get(ident, str(ident))
+                stacks, weights = self.samples.setdefault(name, ([], []))
+                stacks.append(stack)
+                weights.append(weight)
+            if now - start >= self.max_seconds:
+                break
+        self.duration = time.perf_counter() - start
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+    def speedscope(self, name: str) -> dict:
+        frames = [{"name": n, "file": f, "line": line} for n, f, line in self.frames]
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": name,
+            "exporter": "app.core.profiling",
+            "shared": {"frames": frames},
+            "profiles": [
+                {
+                    "type": "sampled",
+                    "name": thread_name,
+                    "unit": "seconds",
+                    "startValue": 0,
+                    "endValue": sum(weights),
+                    "samples": stacks,
+                    "weights": weights,
+                }
+                for thread_name, (stacks, weights) in self.samples.items()
+            ],
+        }
+
+
+class RateLimiter:
+    """Не больше limit событий за скользящее окно (на процесс)."""
+
+    def __init__(self, limit: int, window: float = 60.0):
+        self.limit = limit
+        self.window = window
+        self._events: deque[float] = deque()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            while self._events and now - self._events[0] > self.window:
+                self._events.popleft()
+            if len(self._events) >= self.limit:
+                return False
+            self._events.append(now)
+            return True
+
+
+def profile_path(profile_id: str) -> Optional[str]:
+    if not PROFILE_ID.match(profile_id):
+        return None
+    return os.path.join(config.PROFILE_DIR, f"{profile_id}.speedscope.json")
+
+
+def list_profiles() -> list[str]:
+    if not os.path.isdir(config.PROFILE_DIR):
+        return []
+    suffix = ".speedscope.json"
+    return sorted((f[: -len(suffix)] for f in os.listdir(config.PROFILE_DIR) if f.endswith(suffix)), reverse=True)
+
+
+def _save(profile_id: str, data: dict):
+    os.makedirs(config.PROFILE_DIR, exist_ok=True)
+    with open(profile_path(profile_id), "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    # Храним только последние PROFILE_KEEP профилей
+    for old in list_profiles()[config.PROFILE_KEEP:]:
+        try:
+            os.remove(profile_path(old))
+        except OSError:
+            pass
+
+
+def _is_admin(authorization: str) -> bool:
+    from fastapi import HTTPException
+
+    from app.auth import get_current_admin, get_current_user
+    from app.db import SessionLocal
+
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return False
+    with SessionLocal() as db:
+        try:
+            get_current_admin(get_current_user(token=token, db=db))
+        except HTTPException:
+            return False
+    return True
+
+
+class ProfilerMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self.limiter = RateLimiter(config.PROFILE_RATE_LIMIT)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        headers = Headers(scope=scope)
+        if headers.get("x-profile", "").lower() not in ("1", "true", "yes"):
+            await self.app(scope, receive, send)
+            return
+
+        # Сначала права, потом лимит: чужие запросы не тратят квоту
+        if not await run_in_threadpool(_is_admin, headers.get("authorization", "")):
+            status = "denied"
+        elif not self.limiter.acquire():
+            status = "rate-limited"
+        else:
+            await self.profile(scope, receive, send)
+            return
+
+        async def send_with_status(message: Message):
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", []), (b"x-profile", status.encode())]
+            await send(message)
+
+        await self.app(scope, receive, send_with_status)
+
+    async def profile(self, scope: Scope, receive: Receive, send: Send):
+        profile_id = f"{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+
+        async def send_with_id(message: Message):
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", []), (b"x-profile-id", profile_id.encode())]
+            await send(message)
+
+        sampler = StackSampler(config.PROFILE_INTERVAL_MS / 1000, config.PROFILE_MAX_SECONDS)
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            sampler.stop()
+            name = f"{scope['method']} {scope['path']}"
+            await run_in_threadpool(_save, profile_id, sampler.speedscope(name))
+            logger.info(f"🔬 Профиль {profile_id}: {name}, {sampler.duration * 1000:.0f} ms")
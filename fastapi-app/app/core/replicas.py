@@ -0,0 +1,185 @@
+"""
+Чтение с реплик Postgres.
+
+DATABASE_REPLICA_URLS — список реплик через запятую. Для каждой держится
+свой движок; фоновый поток раз в REPLICA_CHECK_SECONDS проверяет, что
+реплика отвечает, и меряет отставание. Читающие эндпоинты получают сессию
+через get_read_db (app/db.py): случайная реплика из здоровых с отставанием
+не больше REPLICA_MAX_LAG_SECONDS, иначе — основной сервер.
+
+Read-your-writes: после успешного изменяющего запроса (POST/PUT/PATCH/DELETE)
+ReadYourWritesMiddleware ставит клиенту cookie на READ_YOUR_WRITES_SECONDS,
+и пока она жива, его чтения идут на основной сервер. Cookie, а не память
+процесса — следующий запрос может попасть в другой воркер.
+
+Заголовок X-Read-Primary: 1 — прочитать с основного сервера один запрос.
+Его ставит клиент, дочитывающий данные по событию из /api/events: событие
+приходит после коммита на основном сервере, а реплика может его ещё не видеть.
+
+Без DATABASE_REPLICA_URLS всё читается с основного сервера, как раньше.
+"""
+import logging
+import random
+import threading
+import time
+from typing import Optional
+
+from prometheus_client import Gauge
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session, sessionmaker
+from starlette.requests import HTTPConnection
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core import config
+
+logger = logging.getLogger(__name__)
+
+REPLICA_HEALTHY = Gauge(
+    "db_replica_healthy", "Реплика доступна и отстаёт не больше допустимого", ["replica"],
+    multiprocess_mode="min",
+)
+REPLICA_LAG_SECONDS = Gauge(
+    "db_replica_lag_seconds", "Отставание реплики", ["replica"], multiprocess_mode="max",
+)
+
+RYW_COOKIE = "db_primary_until"
+READ_PRIMARY_HEADER = "x-read-primary"
+SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+CONNECT_TIMEOUT_SECONDS = 2
+
+# Отставание: 0, если всё полученное уже применено (на простаивающем мастере
+# pg_last_xact_replay_timestamp() стареет, хотя реплика ничего не ждёт).
+# Не в режиме восстановления (например, отдельный локальный сервер) — тоже 0.
+LAG_SQL = text("""
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+""")
+
+
+class Replica:
+    def __init__(self, url: str):
+        self.url = make_url(url)
+        self.name = f"{self.url.host}:{self.url.port or 5432}"
+        self.engine = create_engine(
+            self.url,
+            pool_pre_ping=True,
+            connect_args={"connect_timeout": CONNECT_TIMEOUT_SECONDS},
+        )
+        self.session_factory = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
+        self.healthy = False  # до первой проверки читаем с основного сервера
+        self.lag: Optional[float] = None
+
+        @event.listens_for(self.engine, "handle_error")
+        def _error(context):
+            # Обрыв соединения — не ждём следующей проверки
+            if context.is_disconnect:
+                self._set_state(False, self.lag)
+
+    def _set_state(self, healthy: bool, lag: Optional[float]):
+        if healthy != self.healthy:
+            if healthy:
+                logger.info(f"✅ Реплика {self.name} доступна, отставание {lag:.1f} с")
+            else:
+                reason = "не отвечает" if lag is None else f"отставание {lag:.1f} с"
+                logger.warning(f"⚠ Реплика {self.name} исключена: {reason}")
+        self.healthy, self.lag = healthy, lag
+        REPLICA_HEALTHY.labels(self.name).set(1 if healthy else 0)
+        if lag is not None:
+            REPLICA_LAG_SECONDS.labels(self.name).set(lag)
+
+    def check(self, max_lag: float):
+        try:
+            with self.engine.connect() as conn:
+                lag = float(conn.execute(LAG_SQL).scalar())
+        except Exception as e:
+            logger.debug(f"Реплика {self.name} не отвечает: {e}")
+            self._set_state(False, None)
+            return
+        self._set_state(lag <= max_lag, lag)
+
+
+class ReplicaSet:
+    def __init__(self, urls: list[str], max_lag: float, interval: float):
+        self.replicas = [Replica(url) for url in urls]
+        self.max_lag = max_lag
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.replicas)
+
+    def choose(self) -> Optional[Replica]:
+        candidates = [r for r in self.replicas if r.healthy]
+        return random.choice(candidates) if candidates else None
+
+    def session(self) -> Optional[Session]:
+        replica = self.choose()
+        return replica.session_factory() if replica else None
+
+    # --- фоновый поток ---
+    def check_all(self):
+        for replica in self.replicas:
+            replica.check(self.max_lag)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.check_all()
+            self._stop.wait(self.interval)
+
+    def start(self):
+        if not self.enabled or (self._thread and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="replica-check", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def dispose(self, close: bool = True):
+        for replica in self.replicas:
+            replica.engine.dispose(close=close)
+
+    def stats(self) -> list[dict]:
+        return [{"replica": r.name, "healthy": r.healthy, "lag": r.lag} for r in self.replicas]
+
+
+def wrote_recently(conn: HTTPConnection) -> bool:
+    """Клиент недавно что-то менял — читать нужно с основного сервера."""
+    try:
+        return float(conn.cookies.get(RYW_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+def primary_requested(conn: HTTPConnection) -> bool:
+    """Клиент просит свежие данные (X-Read-Primary: 1) — например, дочитывает по событию."""
+    return conn.headers.get(READ_PRIMARY_HEADER) == "1"
+
+
+class ReadYourWritesMiddleware:
+    """После успешного изменяющего запроса ставит cookie RYW_COOKIE."""
+
+    def __init__(self, app: ASGIApp, seconds: float = config.READ_YOUR_WRITES_SECONDS):
+        self.app = app
+        self.seconds = seconds
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["method"] in SAFE_METHODS:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_cookie(message: Message):
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                until = int(time.time() + self.seconds) + 1
+                cookie = f"{RYW_COOKIE}={until}; Max-Age={int(self.seconds) + 1}; Path=/; HttpOnly; SameSite=Lax"
+                message["headers"] = [*message.get("headers", []), (b"set-cookie", cookie.encode())]
+            await send(message)
+
+        await self.app(scope, receive, send_with_cookie)
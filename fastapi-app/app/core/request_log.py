@@ -0,0 +1,163 @@
+"""
+Журнал запросов: чистый ASGI-middleware + неблокирующий вывод логов.
+
+setup_logging() вешает на корневой логгер QueueHandler: запись лога —
+это только put() в очередь, а форматирование и запись в stderr делает
+отдельный поток QueueListener. Event loop не ждёт вывода.
+
+RequestLogMiddleware пишет одну запись на запрос в логгер "app.access"
+с полями method / route (шаблон пути, а не конкретный URL) / status /
+duration_ms в extra. Успешные быстрые запросы сэмплируются
+(ACCESS_LOG_SAMPLE_RATE), ошибки и медленные запросы пишутся всегда.
+Тот же слой считает метрики запросов (app.core.metrics) — без сэмплирования —
+и открывает статистику SQL запроса (app.core.sql_stats).
+"""
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import time
+from typing import Optional
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core import config, metrics, sql_stats
+
+LOG_FORMAT = "%(asctime)s [%(levelname)s] %(message)s"
+
+access_logger = logging.getLogger("app.access")
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def setup_logging(level: str = config.LOG_LEVEL):
+    """Корневой логгер → очередь → поток, пишущий в stderr. Повторный вызов ничего не делает."""
+    global _listener
+    if _listener is not None:
+        return
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    stream = logging.StreamHandler()
+    stream.setFormatter(logging.Formatter(LOG_FORMAT))
+
+    root = logging.getLogger()
+    root.setLevel(level)
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+
+    _listener = logging.handlers.QueueListener(log_queue, stream, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+    # gunicorn --preload: логирование настроено в мастере, а поток вывода fork не переживает
+    os.register_at_fork(after_in_child=_restart_after_fork)
+
+
+def _restart_after_fork():
+    """В дочернем процессе — новая очередь и новый поток вывода с теми же обработчиками."""
+    global _listener
+    if _listener is None:
+        return
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    for handler in logging.getLogger().handlers:
+        if isinstance(handler, logging.handlers.QueueHandler):
+            handler.queue = log_queue
+    _listener = logging.handlers.QueueListener(log_queue, *_listener.handlers, respect_handler_level=True)
+    _listener.start()
+
+
+def stop_logging():
+    """Дописывает остаток очереди и останавливает поток вывода."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def route_template(scope: Scope) -> str:
+    # FastAPI кладёт найденный маршрут в scope["route"]; для 404 и mount — сырой путь
+    route = scope.get("route")
+    return getattr(route, "path", None) or scope.get("path", "")
+
+
+def route_label(scope: Scope) -> str:
+    """Метка маршрута для метрик: без сырых путей, чтобы не плодить временные ряды."""
+    route = scope.get("route")
+    if route is not None:
+        return route.path
+    # Внутри Mount (статика) root_path — префикс монтирования
+    return scope.get("root_path") or "unmatched"
+
+
+class RequestLogMiddleware:
+    def __init__(
+        self,
+        app: ASGIApp,
+        sample_rate: Optional[float] = None,
+        slow_ms: Optional[float] = None,
+    ):
+        self.app = app
+        self.sample_rate = config.ACCESS_LOG_SAMPLE_RATE if sample_rate is None else sample_rate
+        self.slow_ms = config.ACCESS_LOG_SLOW_MS if slow_ms is None else slow_ms
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = 500
+        stream = False  # text/event-stream живёт долго — это не «медленный» запрос
+        in_progress = metrics.HTTP_IN_PROGRESS.labels(scope["method"])
+        in_progress.inc()
+        stats_token = sql_stats.start_request()
+
+        async def send_wrapper(message: Message):
+            nonlocal status, stream
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                stream = dict(message.get("headers", [])).get(b"content-type", b"").startswith(b"text/event-stream")
+                if config.DEBUG:
+                    stats = sql_stats.current()
+                    message["headers"] = [*message.get("headers", []), *stats.headers()]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception:
+            # Ответ 500 и traceback — в обработчике исключений снаружи (main.py),
+            # здесь только строка доступа со статусом и длительностью
+            self.log(scope, 500, start)
+            raise
+        else:
+            self.log(scope, status, start, stream=stream)
+        finally:
+            in_progress.dec()
+            sql_stats.finish_request(stats_token, scope["method"], route_template(scope))
+
+    def log(self, scope: Scope, status: int, start: float, stream: bool = False):
+        duration = time.perf_counter() - start
+        # Метрики — по каждому запросу, сэмплируется только текстовый лог
+        metrics.observe_request(scope["method"], route_label(scope), status, duration)
+
+        duration_ms = duration * 1000
+        if status >= 500:
+            level = logging.ERROR
+        elif duration_ms >= self.slow_ms and not stream:
+            level = logging.WARNING
+        else:
+            if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+                return
+            level = logging.INFO
+        if not access_logger.isEnabledFor(level):
+            return
+
+        method = scope["method"]
+        route = route_template(scope)
+        access_logger.log(
+            level,
+            "⬅️ %s %s -> %s (%.1f ms)", method, route, status, duration_ms,
+            extra={"method": method, "route": route, "status": status, "duration_ms": round(duration_ms, 1)},
+        )
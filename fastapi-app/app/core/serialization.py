@@ -0,0 +1,40 @@
+"""
+Быстрая сериализация ответов через orjson.
+
+FastAPI для response_model заново валидирует каждый ORM-объект
+(включая EmailStr в UserOut) и только потом кодирует JSON. Для списков,
+которые мы сами только что прочитали из БД, это лишняя работа:
+rows_response() берёт нужные поля прямо из ORM-строк и сразу отдаёт байты.
+response_model у эндпоинта оставляем — он нужен для OpenAPI-схемы.
+"""
+from functools import lru_cache
+from typing import Any, Iterable, Optional
+
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel
+
+
+@lru_cache(maxsize=None)
+def schema_fields(schema: type[BaseModel]) -> tuple[str, ...]:
+    return tuple(schema.model_fields)
+
+
+def orm_rows(rows: Iterable[Any], schema: type[BaseModel]) -> list[dict[str, Any]]:
+    """ORM-строки → список dict с полями схемы, без валидации."""
+    fields = schema_fields(schema)
+    return [{name: getattr(row, name) for name in fields} for row in rows]
+
+
+def rows_response(
+    rows: Iterable[Any],
+    schema: type[BaseModel],
+    key: Optional[str] = None,
+    **extra: Any,
+) -> ORJSONResponse:
+    """
+    Ответ со списком доверенных ORM-строк.
+    key=None — тело это сам список; иначе {key: [...], **extra}.
+    """
+    items = orm_rows(rows, schema)
+    content = items if key is None else {key: items, **extra}
+    return ORJSONResponse(content)
@@ -0,0 +1,169 @@
+"""
+Объединение одинаковых одновременных операций (single-flight).
+
+Несколько запросов с одним ключом (хэш содержимого + параметры) ждут одно
+вычисление и получают один и тот же результат.
+
+Внутри воркера первый запрос запускает вычисление отдельной задачей, прочие
+ждут её же; отключение клиента, который её запустил, вычисление не прерывает.
+Если вычисление упало, ошибку получают все ждавшие.
+
+Между воркерами одного хоста — lock-файл <ключ>.lock в общем каталоге
+(flock): ведущий держит его, пока считает, и кладёт результат рядом
+(<ключ>.json, атомарно через rename). Воркер, не взявший lock, ждёт его
+освобождения и читает результат; если результата нет (ведущий упал —
+flock снимается ядром вместе с процессом), считает сам. Готовый результат
+отдаётся ещё grace секунд — дубликатам, пришедшим чуть позже.
+"""
+import asyncio
+import fcntl
+import logging
+import os
+import time
+from typing import Any, Awaitable, Callable, Optional
+
+import orjson
+from prometheus_client import Counter
+
+logger = logging.getLogger(__name__)
+
+FLIGHTS = Counter(
+    "singleflight_requests", "Запросы через single-flight", ["name", "role"]
+)  # role: leader — считал сам, waiter — ждал в своём воркере, shared — взял у другого воркера
+
+LOCK_POLL_SECONDS = 0.1
+SWEEP_INTERVAL_SECONDS = 60
+# lock-файлы живут дольше результатов: удаляем только давно не использованные
+STALE_LOCK_SECONDS = 3600
+
+
+class SingleFlight:
+    def __init__(self, name: str, directory: Optional[str], grace: float):
+        self.name = name
+        self.directory = directory or None
+        self.grace = grace
+        self._flights: dict[str, asyncio.Task] = {}
+        self._last_sweep = 0.0
+        if self.directory:
+            try:
+                os.makedirs(self.directory, mode=0o700, exist_ok=True)
+            except OSError as e:
+                logger.warning(f"⚠ Каталог {self.directory} недоступен, {name} объединяется только внутри воркера: {e}")
+                self.directory = None
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> tuple[Any, bool]:
+        """
+        Результат fn() для ключа и признак «посчитано не для этого запроса».
+        Результат должен сериализоваться orjson (его читают другие воркеры).
+        """
+        task = self._flights.get(key)
+        if task is not None:
+            FLIGHTS.labels(self.name, "waiter").inc()
+            result, _ = await asyncio.shield(task)
+            return result, True
+
+        task = asyncio.ensure_future(self._lead(key, fn))
+        self._flights[key] = task
+        task.add_done_callback(lambda _: self._flights.pop(key, None))
+        return await asyncio.shield(task)
+
+    # --- ведущий в воркере ---------------------------------------------------
+
+    async def _lead(self, key: str, fn: Callable[[], Awaitable[Any]]) -> tuple[Any, bool]:
+        fd = self._open_lock(key) if self.directory else None
+        if fd is None:
+            FLIGHTS.labels(self.name, "leader").inc()
+            return await fn(), False
+
+        try:
+            # Ждём без потока из пула: неблокирующий flock в цикле
+            while not self._try_lock(fd):
+                await asyncio.sleep(LOCK_POLL_SECONDS)
+            os.utime(fd)  # mtime — последнее использование, см. _sweep
+            result = self._read_result(key)
+            if result is not None:
+                FLIGHTS.labels(self.name, "shared").inc()
+                return result, True
+
+            FLIGHTS.labels(self.name, "leader").inc()
+            result = await fn()
+            self._write_result(key, result)
+            return result, False
+        finally:
+            os.close(fd)  # снимает flock
+            self._sweep()
+
+    def _open_lock(self, key: str) -> Optional[int]:
+        """fd lock-файла; None — каталог недоступен, считаем без объединения между воркерами."""
+        path = os.path.join(self.directory, f"{key}.lock")
+        try:
+            try:
+                return os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+            except FileNotFoundError:
+                # Каталог удалили на ходу (чистка /tmp) — создаём заново
+                os.makedirs(self.directory, mode=0o700, exist_ok=True)
+                return os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        except OSError as e:
+            logger.warning(f"⚠ Нет lock-файла {self.name}/{key}, считаем без объединения между воркерами: {e}")
+            return None
+
+    @staticmethod
+    def _try_lock(fd: int) -> bool:
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except BlockingIOError:
+            return False
+
+    # --- результат для других воркеров ---------------------------------------
+
+    def _result_path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def _read_result(self, key: str) -> Optional[Any]:
+        path = self._result_path(key)
+        try:
+            if time.time() - os.stat(path).st_mtime > self.grace:
+                return None
+            with open(path, "rb") as f:
+                return orjson.loads(f.read())
+        except (FileNotFoundError, orjson.JSONDecodeError):
+            return None
+
+    def _write_result(self, key: str, result: Any):
+        path = self._result_path(key)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        try:
+            # Результаты — данные выписок: читать их может только сам сервис
+            with open(os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), "wb") as f:
+                f.write(orjson.dumps(result, option=orjson.OPT_SERIALIZE_NUMPY))
+            os.replace(tmp, path)
+        except Exception as e:
+            # Ответ этому запросу всё равно отдадим; другие воркеры посчитают сами
+            logger.warning(f"⚠ Не удалось сохранить результат {self.name}/{key}: {e}")
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+    def _sweep(self):
+        """Удаляет просроченные результаты и давно не нужные lock-файлы."""
+        now = time.time()
+        if now - self._last_sweep < SWEEP_INTERVAL_SECONDS:
+            return
+        self._last_sweep = now
+        try:
+            entries = list(os.scandir(self.directory))
+        except OSError:
+            return
+        for entry in entries:
+            try:
+                age = now - entry.stat().st_mtime
+                if entry.name.endswith(".lock"):
+                    if age > STALE_LOCK_SECONDS:
+                        os.remove(entry.path)
+                elif age > max(self.grace, SWEEP_INTERVAL_SECONDS):
+                    os.remove(entry.path)
+            except FileNotFoundError:
+                continue
+
+    def stats(self) -> dict:
+        return {"in_flight": len(self._flights), "shared_dir": self.directory}
@@ -0,0 +1,116 @@
+"""
+Счётчик SQL-запросов на HTTP-запрос, лог медленных запросов и детектор N+1.
+
+Хуки before/after_cursor_execute на движке (см. app/db.py) замеряют каждый
+запрос к БД. Статистика текущего HTTP-запроса лежит в ContextVar: её
+создаёт RequestLogMiddleware, а синхронные обработчики в threadpool видят
+тот же объект (anyio копирует контекст в поток).
+
+"Форма" запроса — SQL без значений параметров. Если одна и та же форма
+выполнилась за запрос N_PLUS_ONE_THRESHOLD раз и больше, это почти
+наверняка ленивая загрузка в цикле (N+1) — пишем предупреждение.
+При DEBUG=True счётчики уходят клиенту в заголовках X-DB-*.
+"""
+import logging
+import re
+import time
+from collections import Counter
+from contextvars import ContextVar, Token
+from dataclasses import dataclass, field
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.core import config
+
+slow_logger = logging.getLogger("app.sql.slow")
+n_plus_one_logger = logging.getLogger("app.sql.n_plus_one")
+
+_PARAM = re.compile(r"%\(\w+\)s|%s|\$\d+|\?")
+_LITERAL = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_SPACES = re.compile(r"\s+")
+
+
+def normalize_sql(statement: str) -> str:
+    """SQL без значений: параметры и литералы → ?, списки IN (?, ?, ...) → (...)."""
+    sql = _PARAM.sub("?", statement)
+    sql = _LITERAL.sub("?", sql)
+    sql = _IN_LIST.sub("(...)", sql)
+    return _SPACES.sub(" ", sql).strip()
+
+
+@dataclass
+class QueryStats:
+    count: int = 0
+    total_ms: float = 0.0
+    shapes: Counter = field(default_factory=Counter)
+
+    def record(self, shape: str, duration_ms: float):
+        self.count += 1
+        self.total_ms += duration_ms
+        self.shapes[shape] += 1
+
+    def repeated(self, threshold: int = config.N_PLUS_ONE_THRESHOLD) -> list[tuple[str, int]]:
+        return [(shape, n) for shape, n in self.shapes.most_common() if n >= threshold]
+
+    def headers(self) -> list[tuple[bytes, bytes]]:
+        return [
+            (b"x-db-queries", str(self.count).encode()),
+            (b"x-db-time-ms", f"{self.total_ms:.1f}".encode()),
+            (b"x-db-repeated-queries", str(len(self.repeated())).encode()),
+        ]
+
+
+_current: ContextVar[Optional[QueryStats]] = ContextVar("sql_query_stats", default=None)
+
+
+def start_request() -> Token:
+    return _current.set(QueryStats())
+
+
+def current() -> Optional[QueryStats]:
+    return _current.get()
+
+
+def finish_request(token: Token, method: str, route: str) -> Optional[QueryStats]:
+    stats = _current.get()
+    _current.reset(token)
+    if stats is not None:
+        for shape, n in stats.repeated():
+            n_plus_one_logger.warning(
+                "🔁 Возможный N+1: %s %s — %d одинаковых запросов: %s", method, route, n, shape[:500],
+                extra={"method": method, "route": route, "repeats": n, "sql": shape},
+            )
+    return stats
+
+
+def instrument(engine: Engine):
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "handle_error")
+    def _error(context):
+        # Упавший запрос не доходит до after_cursor_execute — убираем его отметку времени
+        conn = context.connection
+        if conn is not None and conn.info.get("query_start"):
+            conn.info["query_start"].pop()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        duration_ms = (time.perf_counter() - conn.info["query_start"].pop()) * 1000
+        stats = _current.get()
+        slow = duration_ms >= config.SLOW_QUERY_MS
+        if stats is None and not slow:
+            return
+
+        shape = normalize_sql(statement)
+        if stats is not None:
+            stats.record(shape, duration_ms)
+        if slow:
+            slow_logger.warning(
+                "🐢 Медленный запрос %.1f ms: %s", duration_ms, shape[:2000],
+                extra={"duration_ms": round(duration_ms, 1), "sql": shape},
+            )
@@ -0,0 +1,186 @@
+"""
+Статика фронтенда из памяти.
+
+При старте сборка (frontend/build) читается один раз: для каждого файла
+хранятся тело, ETag и сжатые варианты (.br / .gz). Варианты берутся из
+файлов рядом, если сборка была обработана заранее:
+
+    python -m app.core.static_index frontend/build
+
+(корневой Dockerfile делает это при сборке образа), иначе сжимаются при
+загрузке индекса — с обычными уровнями GZIP_LEVEL / BROTLI_QUALITY, чтобы
+не затягивать старт воркера. После этого запросы статики не
+трогают файловую систему. Файлы с хэшем в имени (main.1a2b3c4d.js)
+отдаются с immutable-кэшем, остальные (index.html, manifest.json) —
+с ETag и обязательной перепроверкой.
+"""
+import gzip
+import hashlib
+import logging
+import mimetypes
+import os
+import re
+import sys
+from dataclasses import dataclass, field
+from typing import Optional
+
+from starlette.datastructures import Headers
+from starlette.responses import PlainTextResponse, Response
+from starlette.types import Receive, Scope, Send
+
+from app.core import config
+from app.core.compression import COMPRESSIBLE_TYPES, brotli, choose_encoding
+from app.core.etag import etag_matches_value
+
+logger = logging.getLogger(__name__)
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+# CRA/webpack: имя.<хэш>.ext или имя.<хэш>.chunk.ext
+HASHED_NAME = re.compile(r"\.[0-9a-f]{8,}\.(chunk\.)?[a-z0-9]+$")
+MIN_COMPRESS_SIZE = 512
+SKIP_SUFFIXES = (".br", ".gz")
+
+
+@dataclass
+class StaticFile:
+    body: bytes
+    media_type: str
+    etag: str
+    cache_control: str
+    variants: dict[str, bytes] = field(default_factory=dict)
+
+    def response(self, request_headers: Headers, method: str = "GET") -> Response:
+        headers = {"ETag": self.etag, "Cache-Control": self.cache_control}
+        if self.variants:
+            headers["Vary"] = "Accept-Encoding"
+        if etag_matches_value(request_headers.get("if-none-match"), self.etag):
+            return Response(status_code=304, headers=headers)
+
+        body = self.body
+        encoding = choose_encoding(request_headers.get("accept-encoding", "")) if self.variants else None
+        if encoding in self.variants:
+            body = self.variants[encoding]
+            headers["Content-Encoding"] = encoding
+        response = Response(body, media_type=self.media_type, headers=headers)
+        if method == "HEAD":
+            response.body = b""
+        return response
+
+
+def _compressible(media_type: str) -> bool:
+    return media_type.split(";")[0] in COMPRESSIBLE_TYPES
+
+
+def _compress(body: bytes, gzip_level: int = 9, br_quality: int = 11) -> dict[str, bytes]:
+    """По умолчанию — максимальное сжатие (для сборки заранее)."""
+    variants = {"gzip": gzip.compress(body, compresslevel=gzip_level, mtime=0)}
+    if brotli is not None:
+        variants["br"] = brotli.compress(body, quality=br_quality)
+    return variants
+
+
+def _read(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def load_file(path: str, rel_path: str) -> StaticFile:
+    body = _read(path)
+    media_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+    if media_type.startswith("text/") or media_type == "application/javascript":
+        media_type += "; charset=utf-8"
+
+    variants = {}
+    if _compressible(media_type) and len(body) >= MIN_COMPRESS_SIZE:
+        for encoding, suffix in (("br", ".br"), ("gzip", ".gz")):
+            if os.path.exists(path + suffix) and (encoding != "br" or brotli is not None):
+                variants[encoding] = _read(path + suffix)
+        if not variants:
+            variants = _compress(body, config.GZIP_LEVEL, config.BROTLI_QUALITY)
+        # Вариант, который не меньше оригинала, не нужен
+        variants = {k: v for k, v in variants.items() if len(v) < len(body)}
+
+    hashed = HASHED_NAME.search(os.path.basename(rel_path)) is not None
+    return StaticFile(
+        body=body,
+        media_type=media_type,
+        etag=f'"{hashlib.blake2b(body, digest_size=12).hexdigest()}"',
+        cache_control=IMMUTABLE if hashed else REVALIDATE,
+        variants=variants,
+    )
+
+
+class StaticIndex:
+    """Все файлы сборки в памяти: путь относительно build/ → StaticFile."""
+
+    def __init__(self, root: str):
+        self.root = root
+        self.files: dict[str, StaticFile] = {}
+        for dirpath, _, filenames in os.walk(root):
+            for name in filenames:
+                if name.endswith(SKIP_SUFFIXES):
+                    continue
+                path = os.path.join(dirpath, name)
+                rel_path = os.path.relpath(path, root).replace(os.sep, "/")
+                self.files[rel_path] = load_file(path, rel_path)
+        size = sum(len(f.body) + sum(map(len, f.variants.values())) for f in self.files.values())
+        logger.info(f"📦 Статика загружена в память: {len(self.files)} файлов, {size // 1024} КБ")
+
+    def get(self, rel_path: str) -> Optional[StaticFile]:
+        return self.files.get(rel_path.lstrip("/"))
+
+    @property
+    def index_html(self) -> Optional[StaticFile]:
+        return self.files.get("index.html")
+
+    def mount(self, prefix: str) -> "StaticApp":
+        return StaticApp(self, prefix)
+
+
+class StaticApp:
+    """ASGI-приложение для app.mount(): отдаёт файлы из StaticIndex по пути под prefix."""
+
+    def __init__(self, index: StaticIndex, prefix: str):
+        self.index = index
+        self.prefix = prefix.strip("/")
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["method"] not in ("GET", "HEAD"):
+            response = PlainTextResponse("Method Not Allowed", status_code=405)
+        else:
+            # Внутри Mount префикс монтирования лежит в root_path, path — полный
+            path = scope["path"]
+            root_path = scope.get("root_path", "")
+            if root_path and path.startswith(root_path):
+                path = path[len(root_path):]
+            static_file = self.index.get(f"{self.prefix}/{path.lstrip('/')}")
+            if static_file is None:
+                response = PlainTextResponse("Not Found", status_code=404)
+            else:
+                response = static_file.response(Headers(scope=scope), scope["method"])
+        await response(scope, receive, send)
+
+
+def precompress(root: str) -> int:
+    """Пишет .br/.gz рядом со сжимаемыми файлами сборки (шаг после npm run build)."""
+    written = 0
+    for dirpath, _, filenames in os.walk(root):
+        for name in filenames:
+            if name.endswith(SKIP_SUFFIXES):
+                continue
+            path = os.path.join(dirpath, name)
+            media_type = mimetypes.guess_type(path)[0] or ""
+            body = _read(path)
+            if not _compressible(media_type) or len(body) < MIN_COMPRESS_SIZE:
+                continue
+            for encoding, data in _compress(body).items():
+                with open(path + (".br" if encoding == "br" else ".gz"), "wb") as f:
+                    f.write(data)
+                written += 1
+    return written
+
+
+if __name__ == "__main__":
+    build_dir = sys.argv[1] if len(sys.argv) > 1 else os.path.join("frontend", "build")
+    print(f"Сжато вариантов: {precompress(build_dir)}")
@@ -1,7 +1,14 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, Session, declarative_base
+import enum
+import json
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker, Session, declarative_base, Query
 from collections.abc import Generator
-from app.core.config import DATABASE_URL
+from starlette.requests import Request
+from app.core.config import (
+    DATABASE_URL, DATABASE_REPLICA_URLS, REPLICA_MAX_LAG_SECONDS, REPLICA_CHECK_SECONDS,
+)
+from app.core import sql_stats
+from app.core.replicas import ReplicaSet, primary_requested, wrote_recently
 
 # Движок с проверкой соединения
 engine = create_engine(
@@ -10,9 +17,17 @@ engine = create_engine(
     echo=False           # True для отладки SQL
 )
 
+# Счётчик запросов на HTTP-запрос, медленные запросы, N+1 (app/core/sql_stats.py)
+sql_stats.instrument(engine)
+
 # Фабрика сессий
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Реплики для чтения (app/core/replicas.py); пустой набор, если не настроены
+replicas = ReplicaSet(DATABASE_REPLICA_URLS, REPLICA_MAX_LAG_SECONDS, REPLICA_CHECK_SECONDS)
+for _replica in replicas.replicas:
+    sql_stats.instrument(_replica.engine)
+
 # Базовый класс моделей
 Base = declarative_base()
 
@@ -23,3 +38,46 @@ def get_db() -> Generator[Session, None, None]:
         yield db
     finally:
         db.close()
+
+
+# Сессия только для чтения: реплика, если есть подходящая и клиент
+# ничего не менял в последние READ_YOUR_WRITES_SECONDS и не просил свежих
+# данных заголовком X-Read-Primary, иначе основной сервер
+def get_read_db(request: Request) -> Generator[Session, None, None]:
+    db = None
+    if replicas.enabled and not wrote_recently(request) and not primary_requested(request):
+        db = replicas.session()
+    if db is None:
+        db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+# Экранирование спецсимволов LIKE/ILIKE в пользовательском вводе
+def escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+# Оценка числа строк по статистике планировщика (вместо точного COUNT(*))
+def estimate_count(db: Session, query: Query) -> int:
+    stmt = query.order_by(None).statement
+    if stmt.whereclause is None:
+        table = stmt.get_final_froms()[0]
+        reltuples = db.execute(
+            text("SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(:name)"),
+            {"name": table.name},
+        ).scalar()
+        if reltuples is not None and reltuples >= 0:
+            return int(reltuples)
+
+    compiled = stmt.compile(dialect=db.get_bind().dialect)
+    params = {
+        k: (v.name if isinstance(v, enum.Enum) else v)
+        for k, v in compiled.params.items()
+    }
+    plan = db.connection().exec_driver_sql(f"EXPLAIN (FORMAT JSON) {compiled}", params).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
@@ -1,28 +1,41 @@
 import logging
 import os
-from datetime import datetime
-from fastapi import FastAPI, Request, Depends, HTTPException
-from fastapi.responses import JSONResponse, FileResponse
+from fastapi import FastAPI, Request, Response, Depends, HTTPException
+from fastapi.responses import JSONResponse, ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
 from sqlalchemy.orm import Session
 
 from app import auth, admin_routes, buh_routes, models
-from app.db import engine, SessionLocal, get_db
+from app.db import engine, SessionLocal, get_db, replicas
 from app.auth import get_password_hash, get_current_user
 from app.models import UserRole
 from app.core import config
 from app.api import excel
+from app.token_revocation import revocation_cache
+from app.services.audit import audit_log
+from app.services.live_events import live_events
+from app.core.etag import rows_etag, etag_matches, not_modified, set_etag
+from app.core.compression import CompressionMiddleware
+from app.core.static_index import StaticIndex
+from app.core.request_log import RequestLogMiddleware, setup_logging
+from app.core import metrics
+from app.core.profiling import ProfilerMiddleware
+from app.core.replicas import ReadYourWritesMiddleware
 from app.routers import users
 from app.routers import dashboards
+from app.routers import escrow
+from app.routers import events
 
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s [%(levelname)s] %(message)s"
-)
+setup_logging()
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="Podman FastAPI Project", version="1.0.0")
+metrics.instrument_pool(engine)
+
+app = FastAPI(
+    title="Podman FastAPI Project",
+    version="1.0.0",
+    default_response_class=ORJSONResponse,
+)
 
 origins = getattr(config, "CORS_ORIGINS", [
     "http://localhost:3000",
@@ -35,19 +48,38 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Заголовки ответа, которые должен видеть JS с другого origin
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
+if replicas.enabled:
+    # После своего изменения клиент читает с основного сервера, а не с реплики
+    app.add_middleware(ReadYourWritesMiddleware)
+# X-Profile: 1 от администратора — профиль запроса (app/core/profiling.py)
+app.add_middleware(ProfilerMiddleware)
+app.add_middleware(CompressionMiddleware)
+# Внешний слой: время запроса включает сжатие и CORS
+app.add_middleware(RequestLogMiddleware)
 
 @app.get("/api/health", include_in_schema=False)
 @app.get("/health", include_in_schema=False)
 async def health_check():
     return {"status": "ok"}
 
+@app.get("/metrics", include_in_schema=False)
+def prometheus_metrics():
+    body, content_type = metrics.render()
+    return Response(body, media_type=content_type)
+
 @app.get("/api/ping")
 async def ping():
     return {"ok": True}
 
 @app.get("/api/me")
-async def get_me(current_user=Depends(get_current_user)):
+async def get_me(request: Request, response: Response, current_user=Depends(get_current_user)):
+    etag = rows_etag([current_user])
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    set_etag(response, etag)
     return {
         "id": current_user.id,
         "username": current_user.username,
@@ -57,52 +89,9 @@ async def get_me(current_user=Depends(get_current_user)):
         "last_activity": current_user.last_activity,
     }
 
-@app.get("/favicon.ico", include_in_schema=False)
-async def favicon():
-    frontend_dir = os.path.join(os.path.dirname(__file__), "..", "frontend", "build")
-    path = os.path.join(frontend_dir, "favicon.ico")
-    if os.path.exists(path):
-        return FileResponse(path)
-    return JSONResponse(status_code=404, content={"detail": "favicon not found"})
-
-@app.middleware("http")
-async def log_requests(request: Request, call_next):
-    logger.info(f"➡️ {request.method} {request.url.path}")
-    try:
-        response = await call_next(request)
-    except Exception as e:
-        logger.exception(f"❌ Ошибка при обработке {request.method} {request.url.path}: {e}")
-        return JSONResponse(status_code=500, content={"detail": "Internal Server Error"})
-    logger.info(f"⬅️ {request.method} {request.url.path} -> {response.status_code}")
-    return response
-
-@app.middleware("http")
-async def update_last_activity(request: Request, call_next):
-    response = await call_next(request)
-    try:
-        auth_header = request.headers.get("authorization", "")
-        token = auth_header.replace("Bearer ", "").strip()
-        if not token:
-            return response
-
-        with SessionLocal() as db:
-            try:
-                user = await get_current_user.__wrapped__(token=token, db=db)
-            except Exception:
-                user = None
-
-            if user:
-                db.query(models.User).filter(models.User.id == user.id).update(
-                    {"last_activity": datetime.utcnow()}
-                )
-                db.commit()
-    except Exception as e:
-        logger.warning(f"⚠ Ошибка обновления last_activity: {e}")
-    return response
-
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request: Request, exc: HTTPException):
-    return JSONResponse(status_code=exc.status_code, content={"detail": exc.detail})
+    return JSONResponse(status_code=exc.status_code, content={"detail": exc.detail}, headers=exc.headers)
 
 @app.exception_handler(Exception)
 async def unhandled_exception_handler(request: Request, exc: Exception):
@@ -172,6 +161,17 @@ def startup_event():
     init_user("buhgalter", "balance1", "buh_user", "buh@example.com")
     # при необходимости добавь init_user(..., "developer", ...)
     fix_all_hashes()
+    revocation_cache.start()
+    replicas.start()
+    audit_log.start()
+    live_events.start()
+
+@app.on_event("shutdown")
+def shutdown_event():
+    revocation_cache.stop()
+    replicas.stop()
+    audit_log.stop()
+    live_events.stop()
 
 app.include_router(auth.router, prefix="/api")
 app.include_router(admin_routes.router, prefix="/api")
@@ -179,19 +179,32 @@ app.include_router(buh_routes.router, prefix="/api")
 app.include_router(excel.router, prefix="/api")
 app.include_router(users.router, prefix="/api")
 app.include_router(dashboards.router, prefix="/api")
+app.include_router(escrow.router, prefix="/api")
+app.include_router(events.router, prefix="/api")
 
+# Сборка фронтенда читается в память один раз при старте (см. app/core/static_index.py)
 frontend_build = os.path.join(os.path.dirname(__file__), "..", "frontend", "build")
-if os.path.exists(frontend_build):
-    app.mount("/static", StaticFiles(directory=os.path.join(frontend_build, "static")), name="static")
+static_index = StaticIndex(frontend_build) if os.path.exists(frontend_build) else None
+
+@app.get("/favicon.ico", include_in_schema=False)
+async def favicon(request: Request):
+    static_file = static_index.get("favicon.ico") if static_index else None
+    if static_file is None:
+        return JSONResponse(status_code=404, content={"detail": "favicon not found"})
+    return static_file.response(request.headers)
+
+if static_index is not None:
+    app.mount("/static", static_index.mount("/static"), name="static")
 
     @app.get("/{full_path:path}", include_in_schema=False)
-    async def spa_fallback(full_path: str):
-        index_path = os.path.join(frontend_build, "index.html")
-        if os.path.exists(index_path):
-            return FileResponse(index_path)
-        return JSONResponse(status_code=404, content={"detail": "Not Found"})
+    async def spa_fallback(full_path: str, request: Request):
+        # Файлы из корня сборки (manifest.json, robots.txt...) как есть, остальное — index.html
+        static_file = static_index.get(full_path) or static_index.index_html
+        if static_file is None:
+            return JSONResponse(status_code=404, content={"detail": "Not Found"})
+        return static_file.response(request.headers, request.method)
 
 for route in app.router.routes:
-    methods = ",".join(route.methods) if route.methods else ""
+    methods = ",".join(getattr(route, "methods", None) or [])
     tags = getattr(route, "tags", [])
     logger.info(f"[{methods}] {route.path} (tags={tags})")
@@ -3,20 +3,30 @@ from datetime import datetime
 from sqlalchemy import (
     Column,
     Integer,
+    BigInteger,
     String,
     Text,
+    Date,
     DateTime,
+    Numeric,
     Enum as SQLEnum,
     func,
     Boolean,
     Index,
     ForeignKey,
+    DDL,
+    event,
+    literal_column,
 )
 from sqlalchemy.orm import relationship
 from sqlalchemy.dialects.postgresql import JSONB
 from app.db import Base
 
 
+# gin_trgm_ops нужен до создания таблиц через create_all
+event.listen(Base.metadata, "before_create", DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+
+
 class UserRole(str, enum.Enum):
     admin = "admin"
     developer = "developer"
@@ -29,8 +39,21 @@ class User(Base):
     __table_args__ = (
         Index("ix_users_username_email", "username", "email", unique=True),
         Index("ix_users_role_active", "role", "is_active"),
+        # Счётчик «активных за N минут» в /admin/stats читает только диапазон
+        Index("ix_users_last_activity", "last_activity"),
+        # Триграммные индексы под ILIKE '%...%' в поиске админки
+        Index(
+            "ix_users_username_trgm", "username",
+            postgresql_using="gin", postgresql_ops={"username": "gin_trgm_ops"},
+        ),
+        Index(
+            "ix_users_email_trgm", "email",
+            postgresql_using="gin", postgresql_ops={"email": "gin_trgm_ops"},
+        ),
     )
 
+    __mapper_args__ = {"eager_defaults": True}
+
     id = Column(Integer, primary_key=True, index=True)
     username = Column(String(100), unique=True, index=True, nullable=False)
     email = Column(String(255), unique=True, index=True, nullable=False)
@@ -51,6 +74,9 @@ class User(Base):
     # Флаг активности
     is_active = Column(Boolean, nullable=False, default=True, server_default="true")
 
+    # Версия строки: +1 при любом UPDATE (в т.ч. bulk), основа для ETag
+    version = Column(Integer, nullable=False, server_default="1", onupdate=literal_column("version") + 1)
+
     # Связь с дашбордами
     dashboards = relationship(
         "Dashboard",
@@ -86,10 +112,22 @@ class User(Base):
 class Dashboard(Base):
     __tablename__ = "dashboards"
     __table_args__ = (
-        Index("ix_dashboards_owner", "owner_id"),
-        Index("ix_dashboards_public", "is_public"),
+        # (колонка фильтра, id) — фильтр + keyset-пагинация по id одним индексом
+        Index("ix_dashboards_owner", "owner_id", "id"),
+        Index("ix_dashboards_public", "is_public", "id"),
+        Index(
+            "ix_dashboards_title_trgm", "title",
+            postgresql_using="gin", postgresql_ops={"title": "gin_trgm_ops"},
+        ),
+        # jsonb_path_ops: компактнее jsonb_ops, обслуживает @>, @? и @@ (поиск по содержимому config)
+        Index(
+            "ix_dashboards_config_path", "config",
+            postgresql_using="gin", postgresql_ops={"config": "jsonb_path_ops"},
+        ),
     )
 
+    __mapper_args__ = {"eager_defaults": True}
+
     id = Column(Integer, primary_key=True)
     title = Column(String(200), nullable=False)
     description = Column(Text, nullable=True)
@@ -98,10 +136,173 @@ class Dashboard(Base):
     owner_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     is_public = Column(Boolean, default=False, nullable=False)
 
+    version = Column(Integer, nullable=False, server_default="1", onupdate=literal_column("version") + 1)
+
     owner = relationship("User", back_populates="dashboards")
 
+    @property
+    def owner_username(self) -> str | None:
+        return self.owner.username if self.owner else None
+
     def __repr__(self):
         return (
             f"<Dashboard(id={self.id}, title='{self.title}', "
             f"owner_id={self.owner_id}, public={self.is_public})>"
         )
+
+
+class RevokedToken(Base):
+    """
+    Отозванные токены.
+
+    jti заполнен — отозван конкретный токен (logout, ротация refresh).
+    jti пустой — отозваны все токены пользователя, выданные до revoked_at
+    (блокировка, смена пароля, повторное использование refresh).
+    """
+    __tablename__ = "revoked_tokens"
+    __table_args__ = (
+        Index("ix_revoked_tokens_revoked_at", "revoked_at"),
+        Index("ix_revoked_tokens_expires_at", "expires_at"),
+    )
+
+    id = Column(BigInteger, primary_key=True)
+    jti = Column(String(32), unique=True, nullable=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    reason = Column(String(32), nullable=False)
+    revoked_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    expires_at = Column(DateTime, nullable=False)
+
+    def __repr__(self):
+        return (
+            f"<RevokedToken(id={self.id}, jti='{self.jti}', "
+            f"user_id={self.user_id}, reason='{self.reason}')>"
+        )
+
+
+class EscrowFile(Base):
+    """Загруженная выписка; sha256 содержимого защищает от повторной загрузки."""
+    __tablename__ = "escrow_files"
+
+    id = Column(Integer, primary_key=True)
+    filename = Column(String(255), nullable=False)
+    sha256 = Column(String(64), nullable=False, unique=True)
+    rows = Column(Integer, nullable=False, default=0)
+    uploaded_by = Column(Integer, ForeignKey("users.id", ondelete="SET NULL"), nullable=True)
+    ingested_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<EscrowFile(id={self.id}, filename='{self.filename}', rows={self.rows})>"
+
+
+class EscrowTransaction(Base):
+    """Строка выписки по счёту эскроу."""
+    __tablename__ = "escrow_transactions"
+    __table_args__ = (
+        Index("ix_escrow_tx_object_paid", "object_name", "paid_at"),
+        Index("ix_escrow_tx_paid", "paid_at"),
+    )
+
+    id = Column(BigInteger, primary_key=True)
+    file_id = Column(Integer, ForeignKey("escrow_files.id", ondelete="CASCADE"), nullable=False, index=True)
+    object_name = Column(String(255), nullable=False)
+    permit = Column(String(64), nullable=True)
+    paid_at = Column(Date, nullable=True)
+    amount = Column(Numeric(18, 2), nullable=False)
+    sheet = Column(String(100), nullable=True)
+
+
+class DataVersion(Base):
+    """Счётчик изменений набора данных (например, "escrow") для инвалидации кэшей."""
+    __tablename__ = "data_versions"
+
+    name = Column(String(50), primary_key=True)
+    version = Column(BigInteger, nullable=False, default=0)
+    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class WidgetResult(Base):
+    """Материализованный результат виджета: ключ — хэш запроса виджета + версия данных."""
+    __tablename__ = "widget_results"
+
+    cache_key = Column(String(64), primary_key=True)
+    data_version = Column(BigInteger, nullable=False)
+    result = Column(JSONB, nullable=False)
+    computed_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+
+class AuditEvent(Base):
+    """
+    Журнал событий: входы, действия администратора, анализ выписок.
+
+    Таблица секционирована по месяцам created_at (секции audit_events_YYYY_MM
+    создаёт app/services/audit.py), поэтому первичный ключ включает created_at.
+    Пишется пачками из фонового потока, не из обработчика запроса.
+    """
+    __tablename__ = "audit_events"
+    __table_args__ = (
+        Index("ix_audit_events_time", "created_at", "id"),
+        Index("ix_audit_events_user_time", "user_id", "created_at"),
+        Index("ix_audit_events_type_time", "event_type", "created_at"),
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    created_at = Column(DateTime, primary_key=True, default=datetime.utcnow)
+    # Без внешнего ключа: события удалённого пользователя остаются в журнале
+    user_id = Column(Integer, nullable=True)
+    username = Column(String(150), nullable=True)
+    event_type = Column(String(50), nullable=False)
+    target = Column(String(255), nullable=True)
+    ip = Column(String(45), nullable=True)
+    details = Column(JSONB, nullable=True)
+
+    def __repr__(self):
+        return f"<AuditEvent(id={self.id}, type='{self.event_type}', user_id={self.user_id})>"
+
+
+class StatCounter(Base):
+    """Счётчик для /admin/stats; поддерживается триггерами (app/services/stats.py)."""
+    __tablename__ = "stat_counters"
+
+    name = Column(String(100), primary_key=True)
+    value = Column(BigInteger, nullable=False, default=0)
+
+
+class DailyCounter(Base):
+    """Счётчик событий за день (например, excel_analyze, users.created)."""
+    __tablename__ = "daily_counters"
+
+    day = Column(Date, primary_key=True)
+    name = Column(String(100), primary_key=True)
+    value = Column(BigInteger, nullable=False, default=0)
+
+
+class EscrowRollupDaily(Base):
+    """
+    Итоги выписок за день по объекту и разрешению (app/services/escrow_rollups.py).
+    inflow — поступления (amount >= 0) отдельно от списаний; permit '' — без разрешения.
+    """
+    __tablename__ = "escrow_rollup_daily"
+
+    period = Column(Date, primary_key=True)
+    object_name = Column(String(255), primary_key=True)
+    permit = Column(String(64), primary_key=True, server_default="")
+    inflow = Column(Boolean, primary_key=True)
+    total = Column(Numeric(18, 2), nullable=False)
+    count = Column(BigInteger, nullable=False)
+    min_amount = Column(Numeric(18, 2), nullable=False)
+    max_amount = Column(Numeric(18, 2), nullable=False)
+
+
+class EscrowRollupMonthly(Base):
+    """То же за месяц; period — первое число месяца."""
+    __tablename__ = "escrow_rollup_monthly"
+
+    period = Column(Date, primary_key=True)
+    object_name = Column(String(255), primary_key=True)
+    permit = Column(String(64), primary_key=True, server_default="")
+    inflow = Column(Boolean, primary_key=True)
+    total = Column(Numeric(18, 2), nullable=False)
+    count = Column(BigInteger, nullable=False)
+    min_amount = Column(Numeric(18, 2), nullable=False)
+    max_amount = Column(Numeric(18, 2), nullable=False)
@@ -1,15 +1,26 @@
 # app/routers/dashboards.py
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import Optional
+import json
+
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, Query, Header
+from sqlalchemy import cast, literal, update
+from sqlalchemy.dialects.postgresql import JSONB, JSONPATH
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Session, joinedload
+from typing import Optional, Union
 from pydantic import BaseModel, Field
-from app.db import get_db
+from app.db import get_db, get_read_db, escape_like
 from app import models
 from app.models import UserRole
 from app.auth import require_roles, get_current_user
+from app.core.serialization import rows_response
+from app.core.etag import rows_etag, etag_matches, etag_matches_value, not_modified, set_etag
+from app.services.widgets import dashboard_widget_data, WidgetError
+from app.services.json_patch import JsonPatchOp, JsonPatchError, patch_expression, patch_error_message
 
 router = APIRouter(prefix="/dashboards", tags=["dashboards"])
 
+PAGE_SIZE = 50
+
 # Pydantic схемы
 class DashboardCreate(BaseModel):
     title: str = Field(..., min_length=1, max_length=200)
@@ -22,17 +33,24 @@ class DashboardUpdate(BaseModel):
     config: Optional[dict] = None
     is_public: Optional[bool] = None
 
-class DashboardOut(BaseModel):
+class DashboardSummaryOut(BaseModel):
     id: int
     title: str
     description: Optional[str]
-    config: dict
     owner_username: str
     is_public: bool
+    version: int
 
     class Config:
         from_attributes = True
 
+class DashboardOut(DashboardSummaryOut):
+    config: dict
+
+class DashboardVersionOut(BaseModel):
+    id: int
+    version: int
+
 def ensure_owner_or_admin(d: models.Dashboard, user: models.User):
     if user.role == UserRole.admin:
         return True
@@ -40,29 +58,180 @@ def ensure_owner_or_admin(d: models.Dashboard, user: models.User):
         return True
     raise HTTPException(status_code=403, detail="Недостаточно прав")
 
-@router.get("/", response_model=list[DashboardOut])
+def ensure_can_view(d: models.Dashboard, user: models.User):
+    if d.is_public or user.role in (UserRole.admin, UserRole.developer) or d.owner_id == user.id:
+        return True
+    raise HTTPException(status_code=403, detail="Недостаточно прав")
+
+def _visible_dashboards(db: Session, user: models.User, schema: type[DashboardSummaryOut]):
+    """Проекция дашбордов, видимых пользователю, одним запросом с JOIN на владельца."""
+    # viewer видит только публичные; developer/admin видят свои + публичные
+    # Без ленивой загрузки owner (N+1) и без чтения JSONB config в режиме summary
+    columns = [getattr(models.Dashboard, name) for name in schema.model_fields if name != "owner_username"]
+    q = (
+        db.query(*columns, models.User.username.label("owner_username"))
+        .join(models.User, models.Dashboard.owner_id == models.User.id)
+    )
+    if user.role not in (UserRole.admin, UserRole.developer):
+        q = q.filter(models.Dashboard.is_public == True)  # noqa: E712 — "IS true" не использует индекс
+    return q
+
+def _page_response(request: Request, q, schema, limit: Optional[int], cursor: Optional[int], *etag_params):
+    """Keyset-страница по id desc с X-Next-Cursor и ETag; limit=None — все строки."""
+    if cursor is not None:
+        q = q.filter(models.Dashboard.id < cursor)
+
+    q = q.order_by(models.Dashboard.id.desc())
+    if limit is None:
+        rows, next_cursor = q.all(), None
+    else:
+        rows = q.limit(limit + 1).all()
+        next_cursor = rows[limit - 1].id if len(rows) > limit else None
+        rows = rows[:limit]
+
+    etag = rows_etag(rows, schema.__name__, limit, cursor, *etag_params)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
+    response = rows_response(rows, schema)
+    if next_cursor is not None:
+        response.headers["X-Next-Cursor"] = str(next_cursor)
+    return set_etag(response, etag)
+
+@router.get("/", response_model=list[Union[DashboardOut, DashboardSummaryOut]])
 def list_dashboards(
+    request: Request,
+    db: Session = Depends(get_read_db),
+    user: models.User = Depends(get_current_user),
+    summary: bool = Query(False, description="Без config — только заголовки для списка"),
+    owner_id: Optional[int] = Query(None, description="Фильтр по владельцу"),
+    is_public: Optional[bool] = Query(None, description="Фильтр по публичности"),
+    search: Optional[str] = Query(None, description="Поиск по названию"),
+    limit: Optional[int] = Query(None, ge=1, le=200, description=f"Без limit и cursor — весь список; с cursor по умолчанию {PAGE_SIZE}"),
+    cursor: Optional[int] = Query(None, description="X-Next-Cursor из предыдущего ответа"),
+):
+    # Старые клиенты запрашивают список без параметров и ждут его целиком
+    if limit is None and cursor is not None:
+        limit = PAGE_SIZE
+    schema = DashboardSummaryOut if summary else DashboardOut
+    q = _visible_dashboards(db, user, schema)
+    if is_public is not None:
+        q = q.filter(models.Dashboard.is_public == is_public)
+    if owner_id is not None:
+        q = q.filter(models.Dashboard.owner_id == owner_id)
+    if search:
+        q = q.filter(models.Dashboard.title.ilike(f"%{escape_like(search)}%"))
+    return _page_response(request, q, schema, limit, cursor, user.role, owner_id, is_public, search)
+
+def _containment_filter(
+    contains: Optional[str],
+    widget_type: Optional[str],
+    source: Optional[str],
+    tags: Optional[list[str]],
+) -> Optional[dict]:
+    """Собирает один JSON-документ для config @> ...: все условия проверяются одним обходом GIN."""
+    doc: dict = {}
+    if contains:
+        try:
+            doc = json.loads(contains)
+        except ValueError:
+            raise HTTPException(status_code=422, detail="contains: некорректный JSON")
+        if not isinstance(doc, dict):
+            raise HTTPException(status_code=422, detail="contains: ожидается JSON-объект")
+    # Тип и источник — у одного и того же виджета
+    widget = {k: v for k, v in (("type", widget_type), ("source", source)) if v}
+    if widget:
+        doc.setdefault("widgets", [])
+        if not isinstance(doc["widgets"], list):
+            raise HTTPException(status_code=422, detail="contains: widgets должен быть массивом")
+        doc["widgets"].append(widget)
+    if tags:
+        doc.setdefault("tags", [])
+        if not isinstance(doc["tags"], list):
+            raise HTTPException(status_code=422, detail="contains: tags должен быть массивом")
+        doc["tags"].extend(tags)
+    return doc or None
+
+@router.get("/search", response_model=list[Union[DashboardOut, DashboardSummaryOut]])
+def search_dashboards(
+    request: Request,
     db: Session = Depends(get_db),
     user: models.User = Depends(get_current_user),
+    contains: Optional[str] = Query(None, description='JSON-фрагмент config, например {"widgets": [{"type": "bar"}]}'),
+    widget_type: Optional[str] = Query(None, description="Есть виджет такого типа"),
+    source: Optional[str] = Query(None, description="Есть виджет с таким источником данных"),
+    tag: Optional[list[str]] = Query(None, description="Есть все перечисленные теги"),
+    path: Optional[str] = Query(None, max_length=500, description="Условие SQL/JSON path, например $.widgets[*].query.metric == \"sum\""),
+    summary: bool = Query(True, description="Без config — только заголовки"),
+    limit: int = Query(PAGE_SIZE, ge=1, le=200),
+    cursor: Optional[int] = Query(None, description="X-Next-Cursor из предыдущего ответа"),
 ):
-    # viewer видит только публичные; developer/admin видят свои + публичные
-    q = db.query(models.Dashboard)
-    if user.role in (UserRole.admin, UserRole.developer):
-        return q.all()
-    return q.filter_by(is_public=True).all()
+    """
+    Поиск дашбордов по содержимому config. Условия объединяются через И
+    и проверяются по GIN-индексу ix_dashboards_config_path (jsonb_path_ops).
+    Видимость — как у списка: viewer находит только публичные дашборды.
+    """
+    doc = _containment_filter(contains, widget_type, source, tag)
+    if doc is None and not path:
+        raise HTTPException(status_code=422, detail="Нужно хотя бы одно условие поиска")
+
+    schema = DashboardSummaryOut if summary else DashboardOut
+    q = _visible_dashboards(db, user, schema)
+    if doc is not None:
+        q = q.filter(models.Dashboard.config.contains(literal(doc, JSONB)))
+    if path:
+        # @@ — предикат jsonpath; тоже обслуживается jsonb_path_ops
+        q = q.filter(models.Dashboard.config.op("@@")(cast(path, JSONPATH)))
+
+    try:
+        return _page_response(request, q, schema, limit, cursor, user.role, doc, path)
+    except DBAPIError as e:
+        db.rollback()
+        # 42601 — синтаксическая ошибка jsonpath, 2203x — ошибки вычисления SQL/JSON
+        code = getattr(e.orig, "pgcode", None) or ""
+        if code == "42601" or code.startswith("2203"):
+            raise HTTPException(status_code=422, detail=f"path: {e.orig.diag.message_primary}")
+        raise
 
 @router.get("/{dash_id}", response_model=DashboardOut)
 def get_dashboard(
     dash_id: int,
+    request: Request,
+    response: Response,
+    db: Session = Depends(get_read_db),
+    user: models.User = Depends(get_current_user),
+):
+    d = db.get(models.Dashboard, dash_id, options=[joinedload(models.Dashboard.owner)])
+    if not d:
+        raise HTTPException(status_code=404, detail="Дашборд не найден")
+    ensure_can_view(d, user)
+    etag = rows_etag([d])
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    set_etag(response, etag)
+    return d
+
+@router.get("/{dash_id}/data")
+def get_dashboard_data(
+    dash_id: int,
+    widget_id: Optional[str] = Query(None, description="Только один виджет"),
     db: Session = Depends(get_db),
     user: models.User = Depends(get_current_user),
 ):
+    """
+    Данные серверных виджетов (у которых в config есть "query").
+    Результаты кэшируются до следующей загрузки выписок.
+    """
     d = db.get(models.Dashboard, dash_id)
     if not d:
         raise HTTPException(status_code=404, detail="Дашборд не найден")
-    if d.is_public or user.role in (UserRole.admin, UserRole.developer) or d.owner_id == user.id:
-        return d
-    raise HTTPException(status_code=403, detail="Недостаточно прав")
+    ensure_can_view(d, user)
+    try:
+        return dashboard_widget_data(db, d.config or {}, widget_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Виджет не найден")
+    except WidgetError as e:
+        raise HTTPException(status_code=422, detail=str(e))
 
 @router.post("/", response_model=DashboardOut)
 def create_dashboard(
@@ -108,6 +277,61 @@ def update_dashboard(
     db.refresh(d)
     return d
 
+@router.patch("/{dash_id}/config", response_model=DashboardVersionOut)
+def patch_dashboard_config(
+    dash_id: int,
+    ops: list[JsonPatchOp],
+    response: Response,
+    if_match: Optional[str] = Header(None, description="ETag из GET /dashboards/{id}"),
+    version: Optional[int] = Query(None, description="Ожидаемая версия (вместо If-Match)"),
+    db: Session = Depends(get_db),
+    user: models.User = Depends(require_roles([UserRole.admin, UserRole.developer])),
+):
+    """
+    Частичное изменение config по RFC 6902 (JSON Patch).
+    Патч применяется в Postgres; при конкурентном изменении — 412.
+    """
+    d = db.get(models.Dashboard, dash_id)
+    if not d:
+        raise HTTPException(status_code=404, detail="Дашборд не найден")
+    ensure_owner_or_admin(d, user)
+
+    # Оптимистичная блокировка: версия, которую видел клиент
+    if if_match is not None:
+        if not etag_matches_value(if_match, rows_etag([d])):
+            raise HTTPException(status_code=412, detail="Дашборд изменён другим пользователем")
+        expected = d.version
+    elif version is not None:
+        expected = version
+    else:
+        raise HTTPException(status_code=428, detail="Нужен заголовок If-Match или параметр version")
+
+    try:
+        stmt = (
+            update(models.Dashboard)
+            .where(models.Dashboard.id == dash_id, models.Dashboard.version == expected)
+            .values(config=patch_expression(models.Dashboard.config, ops))
+            .returning(models.Dashboard.version)
+            .execution_options(synchronize_session=False)
+        )
+        new_version = db.execute(stmt).scalar_one_or_none()
+        db.commit()
+    except JsonPatchError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except DBAPIError as e:
+        db.rollback()
+        message = patch_error_message(e)
+        if message is None:
+            raise
+        raise HTTPException(status_code=422, detail=message)
+
+    if new_version is None:
+        raise HTTPException(status_code=412, detail="Дашборд изменён другим пользователем")
+
+    db.expire(d)
+    set_etag(response, rows_etag([DashboardVersionOut(id=dash_id, version=new_version)]))
+    return DashboardVersionOut(id=dash_id, version=new_version)
+
 @router.delete("/{dash_id}")
 def delete_dashboard(
     dash_id: int,
@@ -0,0 +1,74 @@
+# app/routers/escrow.py
+import logging
+from datetime import date
+from typing import List, Literal, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, UploadFile, File
+from sqlalchemy.orm import Session
+
+from app.db import get_db, get_read_db
+from app import models
+from app.models import UserRole
+from app.auth import require_roles
+from app.core import metrics
+from app.services import escrow_rollups
+from app.services.escrow_store import ingest_file
+
+router = APIRouter(prefix="/escrow", tags=["escrow"])
+logger = logging.getLogger(__name__)
+
+
+@router.post("/ingest", summary="Сохранить выписки эскроу в БД")
+def ingest_statements(
+    files: List[UploadFile] = File(...),
+    db: Session = Depends(get_db),
+    user: models.User = Depends(require_roles([UserRole.admin, UserRole.buh_user])),
+):
+    """
+    Сохраняет строки выписок для серверных виджетов дашбордов.
+    Уже загруженные файлы (по sha256 содержимого) пропускаются.
+    """
+    report = []
+    for f in files:
+        content = f.file.read()
+        try:
+            escrow_file = ingest_file(db, f.filename, content, uploaded_by=user.id)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.error("❌ Ошибка при сохранении выписки %s", f.filename, exc_info=True)
+            metrics.EXCEL_FILES.labels("ingest", "error").inc()
+            report.append({"filename": f.filename, "status": "error", "detail": str(e)})
+            continue
+
+        if escrow_file is None:
+            report.append({"filename": f.filename, "status": "duplicate", "rows": 0})
+        else:
+            report.append({"filename": f.filename, "status": "ingested", "rows": escrow_file.rows})
+    return {"files": report}
+
+
+@router.get("/rollups", summary="Итоги выписок за период из предрасчитанных свёрток")
+def escrow_rollups_range(
+    date_from: date = Query(..., description="Начало периода (включительно)"),
+    date_to: date = Query(..., description="Конец периода (включительно)"),
+    period: Literal["day", "month", "year", "total"] = Query("month", description="Разбивка по периодам"),
+    group_by: List[Literal["object", "permit"]] = Query(["object"], description="Группировка"),
+    object: Optional[List[str]] = Query(None, description='Объект, например Поступления на счет Эскроу "Горизонт 1"'),
+    permit: Optional[List[str]] = Query(None, description="Разрешение на строительство"),
+    exclude_negative: bool = Query(True, description="Только поступления"),
+    source: Literal["rollup", "raw"] = Query("rollup", description="raw — посчитать по строкам выписок (сверка)"),
+    db: Session = Depends(get_read_db),
+    user: models.User = Depends(require_roles([UserRole.admin, UserRole.buh_user, UserRole.developer])),
+):
+    """
+    Сумма, число, минимум, максимум и среднее платежей по периодам.
+    Целые месяцы читаются из месячной свёртки, неполные — из дневной.
+    """
+    if date_from > date_to:
+        raise HTTPException(status_code=422, detail="date_from позже date_to")
+    rows = escrow_rollups.query_range(
+        db, date_from, date_to, period, group_by,
+        objects=object, permits=permit, exclude_negative=exclude_negative, source=source,
+    )
+    return {"date_from": date_from, "date_to": date_to, "period": period, "source": source, "rows": rows}
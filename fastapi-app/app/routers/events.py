@@ -0,0 +1,74 @@
+# app/routers/events.py
+import asyncio
+import time
+
+import orjson
+from fastapi import APIRouter, Depends
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+
+from app.auth import get_current_user, oauth2_scheme
+from app.core import config
+from app.db import SessionLocal
+from app.models import UserRole
+from app.services.live_events import live_events
+from app.token_revocation import revocation_cache
+from app.token_utils import decode_token
+
+router = APIRouter(tags=["events"])
+
+
+def sse(event: dict) -> bytes:
+    return b"event: " + event["type"].encode() + b"\ndata: " + orjson.dumps(event) + b"\n\n"
+
+
+REAUTH = sse({"type": "reauth"})
+
+
+def _authenticate(token: str) -> tuple[int, UserRole]:
+    # Своя короткая сессия: get_db держал бы соединение всё время жизни потока
+    with SessionLocal() as db:
+        user = get_current_user(token=token, db=db)
+        return user.id, user.role
+
+
+async def _stream(user_id: int, role: UserRole, payload: dict):
+    sub = live_events.subscribe(user_id, role)
+    try:
+        yield b"retry: 3000\n" + sse({"type": "ready"})
+        while True:
+            # Поток живёт, пока действует токен; дальше клиент переподключается с новым
+            timeout = min(config.LIVE_EVENTS_HEARTBEAT_SECONDS, payload["exp"] - time.time())
+            if timeout <= 0:
+                yield REAUTH
+                return
+            try:
+                event = await asyncio.wait_for(sub.queue.get(), timeout)
+            except asyncio.TimeoutError:
+                if revocation_cache.is_revoked(payload):
+                    yield REAUTH
+                    return
+                yield b": ping\n\n"
+                continue
+            yield sse(event)
+            if event["type"].startswith("user.") and event.get("id") == user_id:
+                # Изменились роль или статус самого подписчика — права потока устарели
+                yield REAUTH
+                return
+    finally:
+        live_events.unsubscribe(sub)
+
+
+@router.get("/events", summary="Поток изменений (Server-Sent Events)")
+async def events(token: str = Depends(oauth2_scheme)):
+    """
+    text/event-stream с событиями user.*, dashboard.*, escrow.*; состав полей —
+    в app/services/live_events.py. resync — перечитать данные целиком,
+    reauth — обновить токен и переподключиться.
+    """
+    user_id, role = await run_in_threadpool(_authenticate, token)
+    return StreamingResponse(
+        _stream(user_id, role, decode_token(token)),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -4,13 +4,14 @@ from sqlalchemy.orm import Session
 from app.db import get_db
 from app import models, schemas
 from app.auth import get_password_hash
+from app.core.serialization import rows_response
 
 router = APIRouter(prefix="/admin", tags=["users"])
 
 
 @router.get("/users", response_model=list[schemas.UserOut])
 def list_users(db: Session = Depends(get_db)):
-    return db.query(models.User).all()
+    return rows_response(db.query(models.User).all(), schemas.UserOut)
 
 
 @router.post("/users", response_model=schemas.UserOut)
@@ -1,5 +1,5 @@
-from typing import Literal, Optional
-from datetime import datetime
+from typing import Any, Literal, Optional
+from datetime import date, datetime
 from pydantic import BaseModel, Field, ConfigDict, EmailStr
 from app.models import UserRole
 
@@ -48,6 +48,79 @@ class UserOut(BaseModel):
 # --- Список пользователей (для админки) ---
 class UserListOut(BaseModel):
     users: list[UserOut]
-    total: int
+    total: Optional[int] = None
+    total_estimated: bool = False
+    next_cursor: Optional[int] = Field(None, description="id для запроса следующей страницы (cursor)")
 
     model_config = ConfigDict(from_attributes=True)
+
+
+# --- Массовый импорт пользователей ---
+class UserImportError(BaseModel):
+    row: int = Field(..., description="Номер строки в файле (с учётом заголовка)")
+    field: str
+    error: str
+
+
+class UserImportResult(BaseModel):
+    created: int
+    errors: list[UserImportError]
+
+
+# --- Журнал аудита ---
+class AuditEventOut(BaseModel):
+    id: int
+    created_at: datetime
+    user_id: Optional[int] = None
+    username: Optional[str] = None
+    event_type: str
+    target: Optional[str] = None
+    ip: Optional[str] = None
+    details: Optional[dict[str, Any]] = None
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class AuditEventListOut(BaseModel):
+    events: list[AuditEventOut]
+    next_cursor: Optional[str] = Field(None, description="Курсор следующей страницы (cursor)")
+
+
+# --- Статистика для админки ---
+class RoleCounts(BaseModel):
+    active: int
+    inactive: int
+
+
+class UsersStats(BaseModel):
+    total: int
+    active: int
+    inactive: int
+    by_role: dict[str, RoleCounts]
+
+
+class ActiveRecently(BaseModel):
+    minutes: int
+    count: int
+
+
+class DashboardStats(BaseModel):
+    total: int
+    public: int
+    private: int
+
+
+class DailyCount(BaseModel):
+    day: date
+    count: int
+
+
+class StatsOut(BaseModel):
+    users: UsersStats
+    active_recently: ActiveRecently
+    dashboards: DashboardStats
+    analyses_per_day: list[DailyCount]
+    total_users: int
+    active_today: int
+    new_this_week: int
+    admin_count: int
@@ -0,0 +1,238 @@
+"""
+Журнал аудита (таблица audit_events).
+
+record() только кладёт событие в буфер процесса — обработчик запроса не
+ждёт БД. Фоновый поток раз в AUDIT_FLUSH_SECONDS (или раньше, когда набралась
+пачка AUDIT_BATCH_SIZE) пишет накопленное одним многострочным INSERT.
+В той же транзакции пачка прибавляется к дневным счётчикам daily_counters
+(событий каждого типа за день) — из них /admin/stats берёт, например,
+число анализов по дням.
+Если БД недоступна или отвергает запись не из-за данных (нет таблицы,
+не создалась секция), события возвращаются в буфер; сверх AUDIT_MAX_BUFFER
+новые события отбрасываются (счётчик audit_events_dropped). Пачку, которую
+БД отвергла из-за самих данных, поток делит пополам и отбрасывает только
+негодные события — одна плохая строка не останавливает журнал.
+
+Таблица секционирована по месяцам: секцию audit_events_YYYY_MM поток
+создаёт сам перед первой записью за месяц, старые секции (старше
+AUDIT_RETENTION_MONTHS) удаляются целиком — без DELETE и VACUUM.
+"""
+import collections
+import logging
+import re
+import threading
+from collections import deque
+from datetime import date, datetime, timedelta
+from typing import Any, Optional
+
+from prometheus_client import Counter
+from sqlalchemy import insert, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.engine import Connection
+from sqlalchemy.exc import DataError, IntegrityError
+from starlette.requests import HTTPConnection
+
+from app import models
+from app.core import config
+from app.db import engine
+
+logger = logging.getLogger(__name__)
+
+EVENTS_WRITTEN = Counter("audit_events_written", "События аудита, записанные в БД")
+EVENTS_DROPPED = Counter("audit_events_dropped", "События аудита, отброшенные при переполнении буфера")
+
+PARTITION_NAME = re.compile(r"^audit_events_(\d{4})_(\d{2})$")
+# Ключ advisory-лока: секции создают несколько воркеров одновременно
+PARTITION_LOCK = 0x415544  # "AUD"
+RETENTION_CHECK_INTERVAL = timedelta(hours=6)
+# Ошибки из-за самих событий — пачку делим и ищем негодные; любая другая
+# (БД недоступна, сломана схема) — пачку откладываем целиком
+DATA_ERRORS = (DataError, IntegrityError)
+# Длины строковых колонок: имя пользователя из формы входа, имя файла и т.п.
+# приходят от клиента, и одно длинное значение не должно ронять всю пачку
+FIELD_LIMITS = {
+    name: models.AuditEvent.__table__.c[name].type.length
+    for name in ("username", "event_type", "target", "ip")
+}
+
+
+def _clip(value: Optional[str], field: str) -> Optional[str]:
+    return value[:FIELD_LIMITS[field]] if isinstance(value, str) else value
+
+
+def month_start(d: date) -> date:
+    return date(d.year, d.month, 1)
+
+
+def next_month(d: date) -> date:
+    return date(d.year + d.month // 12, d.month % 12 + 1, 1)
+
+
+def ensure_partition(conn: Connection, month: date):
+    start, end = month_start(month), next_month(month)
+    conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": PARTITION_LOCK})
+    conn.execute(text(
+        f"CREATE TABLE IF NOT EXISTS audit_events_{start:%Y_%m} PARTITION OF audit_events "
+        f"FOR VALUES FROM ('{start}') TO ('{end}')"
+    ))
+
+
+def drop_old_partitions(conn: Connection, keep_months: int) -> list[str]:
+    """Удаляет секции целиком старше keep_months месяцев (текущий месяц считается)."""
+    cutoff = month_start(date.today())
+    for _ in range(keep_months - 1):
+        cutoff = month_start(cutoff - timedelta(days=1))
+    names = conn.execute(text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = 'audit_events'::regclass"
+    )).scalars().all()
+    dropped = []
+    for name in names:
+        m = PARTITION_NAME.match(name)
+        if m and date(int(m.group(1)), int(m.group(2)), 1) < cutoff:
+            conn.execute(text(f"DROP TABLE {name}"))
+            dropped.append(name)
+    return dropped
+
+
+def daily_counts_upsert(batch: list[dict[str, Any]]):
+    counts = collections.Counter((e["created_at"].date(), e["event_type"]) for e in batch)
+    # Ключи по порядку: воркеры обновляют одни и те же строки без deadlock
+    stmt = pg_insert(models.DailyCounter).values(
+        [{"day": day, "name": name, "value": n} for (day, name), n in sorted(counts.items())]
+    )
+    return stmt.on_conflict_do_update(
+        index_elements=["day", "name"],
+        set_={"value": models.DailyCounter.value + stmt.excluded.value},
+    )
+
+
+class AuditWriter:
+    def __init__(self, batch_size: int, flush_seconds: float, max_buffer: int):
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.max_buffer = max_buffer
+        self._buffer: deque[dict[str, Any]] = deque()
+        self._months: set[date] = set()  # секции, которые уже есть
+        self._last_retention = datetime.min
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._flush_lock = threading.Lock()
+
+    # --- запись события (горячий путь) ---
+    def record(
+        self,
+        event_type: str,
+        *,
+        user: Optional[models.User] = None,
+        user_id: Optional[int] = None,
+        username: Optional[str] = None,
+        request: Optional[HTTPConnection] = None,
+        target: Optional[str] = None,
+        **details: Any,
+    ):
+        if len(self._buffer) >= self.max_buffer:
+            EVENTS_DROPPED.inc()
+            return
+        if user is not None:
+            user_id, username = user.id, user.username
+        self._buffer.append({
+            "created_at": datetime.utcnow(),
+            "user_id": user_id,
+            "username": _clip(username, "username"),
+            "event_type": _clip(event_type, "event_type"),
+            "target": _clip(target, "target"),
+            "ip": _clip(request.client.host, "ip") if request is not None and request.client else None,
+            "details": details or None,
+        })
+        if len(self._buffer) >= self.batch_size:
+            self._wake.set()
+
+    # --- запись в БД ---
+    def _write(self, batch: list[dict[str, Any]]):
+        months = {month_start(e["created_at"].date()) for e in batch}
+        with engine.begin() as conn:
+            for month in months - self._months:
+                ensure_partition(conn, month)
+            conn.execute(insert(models.AuditEvent), batch)
+            conn.execute(daily_counts_upsert(batch))
+        self._months |= months
+
+    def _write_isolating(self, batch: list[dict[str, Any]], retry: list[dict[str, Any]]) -> int:
+        """
+        Пишет пачку; если БД отвергает данные, делит пополам, пока не найдёт
+        негодные события — их отбрасывает, остальные пишет. При прочих ошибках
+        события складываются в retry. Возвращает число записанных.
+        """
+        try:
+            self._write(batch)
+            return len(batch)
+        except DATA_ERRORS as e:
+            self._months.clear()  # секцию могли удалить — проверим заново
+            if len(batch) == 1:
+                logger.warning(f"⚠ Событие аудита {batch[0]['event_type']} отброшено: {e}")
+                EVENTS_DROPPED.inc()
+                return 0
+        except Exception as e:
+            logger.warning(f"⚠ Не удалось записать {len(batch)} событий аудита: {e}")
+            self._months.clear()
+            retry.extend(batch)
+            return 0
+        mid = len(batch) // 2
+        return self._write_isolating(batch[:mid], retry) + self._write_isolating(batch[mid:], retry)
+
+    def flush(self):
+        with self._flush_lock:
+            while self._buffer:
+                batch = []
+                while self._buffer and len(batch) < self.batch_size:
+                    batch.append(self._buffer.popleft())
+                retry: list[dict[str, Any]] = []
+                EVENTS_WRITTEN.inc(self._write_isolating(batch, retry))
+                if retry:
+                    # Вернуть в начало буфера, сколько поместится; остальное теряем
+                    room = max(self.max_buffer - len(self._buffer), 0)
+                    self._buffer.extendleft(reversed(retry[:room]))
+                    EVENTS_DROPPED.inc(len(retry) - min(room, len(retry)))
+                    return
+
+    def _apply_retention(self):
+        if config.AUDIT_RETENTION_MONTHS <= 0 or datetime.utcnow() - self._last_retention < RETENTION_CHECK_INTERVAL:
+            return
+        self._last_retention = datetime.utcnow()
+        try:
+            with engine.begin() as conn:
+                dropped = drop_old_partitions(conn, config.AUDIT_RETENTION_MONTHS)
+        except Exception as e:
+            logger.warning(f"⚠ Ошибка очистки старых секций аудита: {e}")
+            return
+        if dropped:
+            logger.info(f"🧹 Удалены секции аудита: {', '.join(dropped)}")
+
+    # --- фоновый поток ---
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_seconds)
+            self._wake.clear()
+            self.flush()
+            self._apply_retention()
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Останавливает поток и дописывает остаток буфера."""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=10)
+        self.flush()
+
+
+audit_log = AuditWriter(config.AUDIT_BATCH_SIZE, config.AUDIT_FLUSH_SECONDS, config.AUDIT_MAX_BUFFER)
+record = audit_log.record
@@ -0,0 +1,232 @@
+"""
+Массовая загрузка выписок эскроу из каталога (вместо пачек через EscrowAnalyzer).
+
+Сканирует каталог (рекурсивно, *.xlsx / *.xls) и загружает каждый файл
+через ingest_file в пуле процессов: чтение Excel и разбор листов упираются
+в CPU, поэтому файлы разбираются параллельно, каждый процесс пишет в БД
+своей транзакцией. Файл, содержимое которого уже есть в БД (sha256),
+пропускается как дубликат.
+
+Прогресс пишется в checkpoint (JSON Lines, по строке на файл после
+коммита). Прерванный запуск продолжается с того же места: файлы с тем же
+путём, размером и mtime, уже загруженные или признанные дубликатами,
+повторно даже не читаются; файлы с ошибкой пробуются снова. Если процесс
+убили между коммитом и записью в checkpoint, файл при повторе окажется
+дубликатом — дважды данные не попадут.
+
+--watch N: после прохода ждать N секунд и сканировать снова (до Ctrl+C).
+Файлы, изменённые меньше --settle секунд назад, ещё копируются — их
+берём на следующем проходе.
+
+Запуск из fastapi-app/:
+    python -m app.services.escrow_bulk /mnt/finance/2026-10 [--workers 8] [--user buhgalter] [--watch 60]
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from typing import Optional
+
+from sqlalchemy.exc import IntegrityError
+
+from app import models
+from app.db import SessionLocal
+from app.services.escrow_store import file_sha256, ingest_file
+
+EXTENSIONS = (".xlsx", ".xls")
+CHECKPOINT_NAME = ".escrow-ingest.jsonl"
+DONE_STATUSES = {"ingested", "duplicate"}
+
+
+@dataclass
+class Candidate:
+    path: str
+    rel: str
+    size: int
+    mtime: float
+
+
+def scan(root: str, settle: float) -> list[Candidate]:
+    """Файлы выписок в каталоге; скрытые и временные (~$...) пропускаются."""
+    now = time.time()
+    found = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(d for d in dirnames if not d.startswith("."))
+        for name in sorted(filenames):
+            if name.startswith((".", "~$")) or not name.lower().endswith(EXTENSIONS):
+                continue
+            path = os.path.join(dirpath, name)
+            st = os.stat(path)
+            if now - st.st_mtime < settle:
+                continue
+            found.append(Candidate(path, os.path.relpath(path, root), st.st_size, st.st_mtime))
+    return found
+
+
+class Checkpoint:
+    def __init__(self, path: str):
+        self.path = path
+        self.done: dict[str, tuple[int, float]] = {}
+        # Ошибки этого запуска: в --watch файл пробуем снова, только если он изменился
+        self.failed: dict[str, tuple[int, float]] = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # недописанная строка при аварийной остановке
+                    if entry.get("status") in DONE_STATUSES:
+                        self.done[entry["path"]] = (entry["size"], entry["mtime"])
+                    else:
+                        self.done.pop(entry.get("path"), None)
+
+    def is_done(self, c: Candidate) -> bool:
+        return self.done.get(c.rel) == (c.size, c.mtime)
+
+    def failed_unchanged(self, c: Candidate) -> bool:
+        return self.failed.get(c.rel) == (c.size, c.mtime)
+
+    def write(self, c: Candidate, result: dict):
+        entry = {"path": c.rel, "size": c.size, "mtime": c.mtime, **result}
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        if result["status"] in DONE_STATUSES:
+            self.done[c.rel] = (c.size, c.mtime)
+        else:
+            self.failed[c.rel] = (c.size, c.mtime)
+
+
+def ingest_path(path: str, uploaded_by: Optional[int]) -> dict:
+    """Выполняется в процессе пула: один файл — одна транзакция."""
+    start = time.perf_counter()
+    with open(path, "rb") as f:
+        content = f.read()
+    sha256 = file_sha256(content)
+    with SessionLocal() as db:
+        try:
+            escrow_file = ingest_file(db, os.path.basename(path), content, uploaded_by=uploaded_by, sha256=sha256)
+            db.commit()
+        except IntegrityError:
+            # Тот же файл в это время загрузили через API
+            db.rollback()
+            escrow_file = None
+    return {
+        "status": "ingested" if escrow_file else "duplicate",
+        "sha256": sha256,
+        "rows": escrow_file.rows if escrow_file else 0,
+        "bytes": len(content),
+        "seconds": round(time.perf_counter() - start, 3),
+    }
+
+
+@dataclass
+class Totals:
+    started: float = field(default_factory=time.perf_counter)
+    ingested: int = 0
+    duplicate: int = 0
+    skipped: set[str] = field(default_factory=set)  # загружены прошлыми запусками
+    processed: set[str] = field(default_factory=set)
+    rows: int = 0
+    bytes: int = 0
+    errors: list[tuple[str, str]] = field(default_factory=list)
+
+    def add(self, c: Candidate, result: dict):
+        self.processed.add(c.rel)
+        if result["status"] == "error":
+            self.errors.append((c.rel, result["error"]))
+            return
+        setattr(self, result["status"], getattr(self, result["status"]) + 1)
+        self.rows += result["rows"]
+        self.bytes += result["bytes"]
+
+    def report(self) -> str:
+        elapsed = max(time.perf_counter() - self.started, 1e-9)
+        processed = self.ingested + self.duplicate + len(self.errors)
+        lines = [
+            f"Файлов: {processed} (загружено {self.ingested}, дубликатов {self.duplicate}, "
+            f"ошибок {len(self.errors)}), пропущено по checkpoint: {len(self.skipped)}",
+            f"Строк: {self.rows}, {self.bytes / 1e6:.1f} MB за {elapsed:.1f} с — "
+            f"{processed / elapsed:.2f} файлов/с, {self.rows / elapsed:.0f} строк/с, "
+            f"{self.bytes / 1e6 / elapsed:.2f} MB/с",
+        ]
+        lines += [f"  ❌ {rel}: {error}" for rel, error in self.errors]
+        return "\n".join(lines)
+
+
+def run_once(args, checkpoint: Checkpoint, totals: Totals, uploaded_by: Optional[int]):
+    candidates = []
+    for c in scan(args.directory, args.settle):
+        if checkpoint.is_done(c):
+            if c.rel not in totals.processed:
+                totals.skipped.add(c.rel)
+        elif not checkpoint.failed_unchanged(c):
+            candidates.append(c)
+    if not candidates:
+        return
+
+    # spawn, как и в user_import: чистые процессы без унаследованных соединений
+    pool = ProcessPoolExecutor(max_workers=args.workers, mp_context=multiprocessing.get_context("spawn"))
+    try:
+        futures = {pool.submit(ingest_path, c.path, uploaded_by): c for c in candidates}
+        for done, future in enumerate(as_completed(futures), 1):
+            c = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                result = {"status": "error", "error": f"{type(e).__name__}: {e}"}
+            checkpoint.write(c, result)
+            totals.add(c, result)
+            print(f"[{done}/{len(candidates)}] {result['status']:<9} {c.rel} {result.get('rows', '')}", flush=True)
+    except KeyboardInterrupt:
+        pool.shutdown(wait=True, cancel_futures=True)
+        raise
+    pool.shutdown()
+
+
+def resolve_user(username: Optional[str]) -> Optional[int]:
+    if not username:
+        return None
+    with SessionLocal() as db:
+        user = db.query(models.User).filter_by(username=username).first()
+    if user is None:
+        sys.exit(f"Пользователь {username} не найден")
+    return user.id
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Загрузка выписок эскроу из каталога")
+    parser.add_argument("directory")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--checkpoint", help=f"файл прогресса (по умолчанию <directory>/{CHECKPOINT_NAME})")
+    parser.add_argument("--user", help="от чьего имени загружать (escrow_files.uploaded_by)")
+    parser.add_argument("--watch", type=float, default=0, help="пересканировать каталог каждые N секунд")
+    parser.add_argument("--settle", type=float, default=5, help="не брать файлы, изменённые меньше N секунд назад")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.directory):
+        sys.exit(f"Каталог {args.directory} не найден")
+    checkpoint = Checkpoint(args.checkpoint or os.path.join(args.directory, CHECKPOINT_NAME))
+    uploaded_by = resolve_user(args.user)
+    totals = Totals()
+    try:
+        while True:
+            run_once(args, checkpoint, totals, uploaded_by)
+            if not args.watch:
+                break
+            time.sleep(args.watch)
+    except KeyboardInterrupt:
+        print("\nПрервано; продолжить — тем же запуском, checkpoint сохранён")
+    print(totals.report())
+    if totals.errors:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+"""
+Предрасчитанные итоги по выпискам эскроу: день и месяц × объект × разрешение.
+
+Строка свёртки — сумма, число, минимум и максимум платежей за период по
+паре (object_name, permit) отдельно для поступлений (amount >= 0) и
+списаний: так запрос с exclude_negative тоже читается из свёртки.
+object_name — название из PERMIT_MAPPING (или по имени файла).
+
+ingest_file() после вставки строк вызывает rollup_file(): строки файла
+группируются в SQL и прибавляются к escrow_rollup_daily/monthly (upsert,
+min/max через LEAST/GREATEST). Строки без даты платежа в свёртки не
+попадают — период им не определить.
+
+Запрос за диапазон (query_range) берёт целые месяцы из месячной свёртки,
+неполные месяцы по краям — из дневной; даты платежей — это дни, поэтому
+дневная свёртка отвечает на любой диапазон точно. source="raw" считает то
+же самое по escrow_transactions — для сверки.
+
+Свёртки только растут: если строки выписок удалить вручную, пересчитайте
+всё заново:
+    python -m app.services.escrow_rollups rebuild
+"""
+import sys
+from dataclasses import dataclass
+from datetime import date, timedelta
+from decimal import Decimal
+from typing import Any, Iterable, Literal, Optional
+
+from sqlalchemy import Date, cast, func, literal_column, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from app import models
+
+Period = Literal["day", "month", "year", "total"]
+GroupBy = Literal["object", "permit"]
+
+ROLLUP_COLUMNS = ["object_name", "permit", "inflow", "total", "count", "min_amount", "max_amount"]
+
+
+def month_start(d: date) -> date:
+    return d.replace(day=1)
+
+
+def next_month(d: date) -> date:
+    return date(d.year + d.month // 12, d.month % 12 + 1, 1)
+
+
+# --- поддержка свёрток -------------------------------------------------------
+
+def _month_of(column):
+    return cast(func.date_trunc(literal_column("'month'"), column), Date)
+
+
+def _upsert_rollup(db: Session, model, bucket, *where):
+    tx = models.EscrowTransaction
+    permit = func.coalesce(tx.permit, "")
+    inflow = tx.amount >= 0
+    keys = [bucket, tx.object_name, permit, inflow]
+    source = (
+        select(
+            *keys,
+            func.sum(tx.amount), func.count(), func.min(tx.amount), func.max(tx.amount),
+        )
+        .where(tx.paid_at.isnot(None), *where)
+        .group_by(*keys)
+        # Ключи по порядку: параллельные загрузки не ловят deadlock на одних строках
+        .order_by(*keys)
+    )
+    table = model.__table__
+    stmt = pg_insert(table).from_select(["period", *ROLLUP_COLUMNS], source)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["period", "object_name", "permit", "inflow"],
+        set_={
+            "total": table.c.total + stmt.excluded.total,
+            "count": table.c.count + stmt.excluded.count,
+            "min_amount": func.least(table.c.min_amount, stmt.excluded.min_amount),
+            "max_amount": func.greatest(table.c.max_amount, stmt.excluded.max_amount),
+        },
+    )
+    db.execute(stmt)
+
+
+def rollup_file(db: Session, file_id: int):
+    """Прибавляет строки загруженного файла к свёрткам (в текущей транзакции)."""
+    tx = models.EscrowTransaction
+    _upsert_rollup(db, models.EscrowRollupDaily, tx.paid_at, tx.file_id == file_id)
+    _upsert_rollup(db, models.EscrowRollupMonthly, _month_of(tx.paid_at), tx.file_id == file_id)
+
+
+def rebuild(db: Session):
+    """Пересчитывает свёртки целиком по escrow_transactions."""
+    tx = models.EscrowTransaction
+    db.query(models.EscrowRollupDaily).delete(synchronize_session=False)
+    db.query(models.EscrowRollupMonthly).delete(synchronize_session=False)
+    _upsert_rollup(db, models.EscrowRollupDaily, tx.paid_at)
+    _upsert_rollup(db, models.EscrowRollupMonthly, _month_of(tx.paid_at))
+
+
+# --- запросы за диапазон -----------------------------------------------------
+
+@dataclass
+class Totals:
+    total: Decimal = Decimal(0)
+    count: int = 0
+    min: Optional[Decimal] = None
+    max: Optional[Decimal] = None
+
+    def add(self, total, count, min_amount, max_amount):
+        self.total += total
+        self.count += count
+        self.min = min_amount if self.min is None else min(self.min, min_amount)
+        self.max = max_amount if self.max is None else max(self.max, max_amount)
+
+
+def split_range(date_from: date, date_to: date) -> tuple[Optional[tuple[date, date]], list[tuple[date, date]]]:
+    """
+    [date_from, date_to] → (целые месяцы [с, по) или None, дневные куски [с, по)).
+    """
+    end = date_to + timedelta(days=1)
+    first_full = date_from if date_from.day == 1 else next_month(date_from)
+    full_through = end if end.day == 1 else month_start(date_to)
+    if first_full >= full_through:
+        return None, [(date_from, end)]
+    days = []
+    if date_from < first_full:
+        days.append((date_from, first_full))
+    if full_through < end:
+        days.append((full_through, end))
+    return (first_full, full_through), days
+
+
+def bucket_of(d: date, period: Period) -> Optional[date]:
+    if period == "day":
+        return d
+    if period == "month":
+        return month_start(d)
+    if period == "year":
+        return date(d.year, 1, 1)
+    return None
+
+
+def _rollup_rows(db: Session, model, start: date, end: date, filters: dict) -> Iterable[tuple]:
+    stmt = select(
+        model.period, model.object_name, model.permit,
+        model.total, model.count, model.min_amount, model.max_amount,
+    ).where(model.period >= start, model.period < end)
+    if filters["objects"]:
+        stmt = stmt.where(model.object_name.in_(filters["objects"]))
+    if filters["permits"]:
+        stmt = stmt.where(model.permit.in_(filters["permits"]))
+    if filters["exclude_negative"]:
+        stmt = stmt.where(model.inflow.is_(True))
+    return db.execute(stmt)
+
+
+def _raw_rows(db: Session, start: date, end: date, filters: dict) -> Iterable[tuple]:
+    tx = models.EscrowTransaction
+    permit = func.coalesce(tx.permit, "")
+    keys = [tx.paid_at, tx.object_name, permit]
+    stmt = (
+        select(*keys, func.sum(tx.amount), func.count(), func.min(tx.amount), func.max(tx.amount))
+        .where(tx.paid_at >= start, tx.paid_at < end)
+        .group_by(*keys)
+    )
+    if filters["objects"]:
+        stmt = stmt.where(tx.object_name.in_(filters["objects"]))
+    if filters["permits"]:
+        stmt = stmt.where(permit.in_(filters["permits"]))
+    if filters["exclude_negative"]:
+        stmt = stmt.where(tx.amount >= 0)
+    return db.execute(stmt)
+
+
+def query_range(
+    db: Session,
+    date_from: date,
+    date_to: date,
+    period: Period = "month",
+    group_by: Iterable[GroupBy] = ("object",),
+    objects: Optional[list[str]] = None,
+    permits: Optional[list[str]] = None,
+    exclude_negative: bool = True,
+    source: Literal["rollup", "raw"] = "rollup",
+) -> list[dict[str, Any]]:
+    filters = {"objects": objects, "permits": permits, "exclude_negative": exclude_negative}
+    if source == "raw":
+        chunks = [_raw_rows(db, date_from, date_to + timedelta(days=1), filters)]
+    else:
+        months, days = split_range(date_from, date_to)
+        if period == "day":
+            # Дневной разбивке месячная свёртка не поможет
+            months, days = None, [(date_from, date_to + timedelta(days=1))]
+        chunks = [_rollup_rows(db, models.EscrowRollupDaily, start, end, filters) for start, end in days]
+        if months is not None:
+            chunks.append(_rollup_rows(db, models.EscrowRollupMonthly, *months, filters))
+
+    group_by = set(group_by)
+    acc: dict[tuple, Totals] = {}
+    for chunk in chunks:
+        for day, object_name, permit, total, count, min_amount, max_amount in chunk:
+            key = (
+                bucket_of(day, period),
+                object_name if "object" in group_by else None,
+                (permit or None) if "permit" in group_by else None,
+            )
+            acc.setdefault(key, Totals()).add(total, count, min_amount, max_amount)
+
+    rows = []
+    for (bucket, object_name, permit), t in sorted(acc.items(), key=lambda kv: tuple(str(k) for k in kv[0])):
+        row: dict[str, Any] = {}
+        if period != "total":
+            row["period"] = bucket.isoformat()
+        if "object" in group_by:
+            row["object"] = object_name
+        if "permit" in group_by:
+            row["permit"] = permit
+        row.update(
+            sum=float(t.total),
+            count=t.count,
+            min=float(t.min),
+            max=float(t.max),
+            avg=float(t.total / t.count),
+        )
+        rows.append(row)
+    return rows
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] != ["rebuild"]:
+        sys.exit("Использование: python -m app.services.escrow_rollups rebuild")
+    from app.db import SessionLocal
+
+    with SessionLocal() as db:
+        rebuild(db)
+        db.commit()
+        daily = db.query(models.EscrowRollupDaily).count()
+        monthly = db.query(models.EscrowRollupMonthly).count()
+    print(f"Свёртки пересчитаны: {daily} дневных, {monthly} месячных строк")
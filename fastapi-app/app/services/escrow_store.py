@@ -0,0 +1,91 @@
+import hashlib
+import io
+import logging
+from typing import Optional
+
+import pandas as pd
+from sqlalchemy import insert, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from app import models
+from app.core import metrics
+from app.services.escrow_rollups import rollup_file
+from app.services.excel_utils import extract_transactions
+
+logger = logging.getLogger(__name__)
+
+ESCROW_DATASET = "escrow"
+INSERT_BATCH_SIZE = 5000
+
+
+def file_sha256(content: bytes) -> str:
+    return hashlib.sha256(content).hexdigest()
+
+
+def get_data_version(db: Session, name: str = ESCROW_DATASET) -> int:
+    version = db.scalar(select(models.DataVersion.version).where(models.DataVersion.name == name))
+    return version or 0
+
+
+def bump_data_version(db: Session, name: str = ESCROW_DATASET) -> int:
+    """Атомарно увеличивает версию набора данных (в текущей транзакции)."""
+    table = models.DataVersion.__table__
+    stmt = pg_insert(table).values(name=name, version=1)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.name],
+        set_={"version": table.c.version + 1, "updated_at": stmt.excluded.updated_at},
+    ).returning(table.c.version)
+    return db.execute(stmt).scalar_one()
+
+
+def _none_if_na(value):
+    return None if pd.isna(value) else value
+
+
+def ingest_file(
+    db: Session,
+    filename: str,
+    content: bytes,
+    uploaded_by: Optional[int] = None,
+    sha256: Optional[str] = None,
+) -> Optional[models.EscrowFile]:
+    """
+    Сохраняет строки выписки в escrow_transactions, прибавляет их к свёрткам
+    по дням/месяцам и поднимает версию данных.
+    Возвращает None, если файл с таким содержимым уже загружен.
+    """
+    sha256 = sha256 or file_sha256(content)
+    if db.scalar(select(models.EscrowFile.id).where(models.EscrowFile.sha256 == sha256)):
+        metrics.EXCEL_FILES.labels("ingest", "duplicate").inc()
+        return None
+
+    with metrics.excel_phase("ingest", "read"):
+        df = extract_transactions(filename, io.BytesIO(content))
+
+    escrow_file = models.EscrowFile(filename=filename, sha256=sha256, rows=len(df), uploaded_by=uploaded_by)
+    db.add(escrow_file)
+    db.flush()
+
+    rows = [
+        {
+            "file_id": escrow_file.id,
+            "object_name": object_name,
+            "permit": _none_if_na(permit),
+            "paid_at": _none_if_na(paid_at),
+            "amount": round(float(amount), 2),
+            "sheet": sheet,
+        }
+        for object_name, permit, paid_at, amount, sheet in df.itertuples(index=False, name=None)
+    ]
+    with metrics.excel_phase("ingest", "insert"):
+        for start in range(0, len(rows), INSERT_BATCH_SIZE):
+            db.execute(insert(models.EscrowTransaction), rows[start:start + INSERT_BATCH_SIZE])
+    with metrics.excel_phase("ingest", "rollup"):
+        rollup_file(db, escrow_file.id)
+
+    bump_data_version(db)
+    metrics.EXCEL_FILES.labels("ingest", "ok").inc()
+    metrics.EXCEL_ROWS.labels("ingest").inc(len(rows))
+    logger.info(f"📥 Выписка {filename} сохранена: {len(rows)} строк")
+    return escrow_file
@@ -1,11 +1,14 @@
 import io
 import os
 import logging
+import time
 from zipfile import BadZipFile
 from typing import List, Tuple, Optional
 
 import pandas as pd
 
+from app.core import metrics
+
 logger = logging.getLogger(__name__)
 
 # Маппинг разрешений → Горизонты (с полным названием)
@@ -25,6 +28,16 @@ def find_column(columns: pd.Index, candidates: List[str]) -> Optional[str]:
     return None
 
 
+def read_sheets(buf: io.BytesIO) -> dict[str, pd.DataFrame]:
+    """Читает все листы выписки (.xlsx через openpyxl, старые .xls через xlrd)."""
+    buf.seek(0)
+    try:
+        return pd.read_excel(buf, sheet_name=None, skiprows=6, engine="openpyxl")
+    except BadZipFile:
+        buf.seek(0)
+        return pd.read_excel(buf, sheet_name=None, skiprows=6, engine="xlrd")
+
+
 def analyze_excel_files(
     excel_files: List[Tuple[str, io.BytesIO]],
     year: int = None,
@@ -50,12 +63,10 @@ def analyze_excel_files(
 
     for filename, buf in excel_files:
         try:
-            buf.seek(0)
-            try:
-                sheets = pd.read_excel(buf, sheet_name=None, skiprows=6, engine="openpyxl")
-            except BadZipFile:
-                buf.seek(0)
-                sheets = pd.read_excel(buf, sheet_name=None, skiprows=6, engine="xlrd")
+            with metrics.excel_phase("analyze", "read"):
+                sheets = read_sheets(buf)
+            metrics.EXCEL_ROWS.labels("analyze").inc(sum(len(df) for df in sheets.values()))
+            process_start = time.perf_counter()
 
             processed_any = False
             base_name = os.path.splitext(filename)[0]   # убираем .xlsx/.xls
@@ -117,10 +128,60 @@ def analyze_excel_files(
             if not processed_any:
                 results.append({"Название обьекта": default_name, "Сумма": 0.0})
 
+            metrics.EXCEL_PHASE_SECONDS.labels("analyze", "process").observe(time.perf_counter() - process_start)
+            metrics.EXCEL_FILES.labels("analyze", "ok").inc()
+
         except Exception as e:
             logger.error("Ошибка при обработке файла %s", filename, exc_info=True)
             errors.append({"Название обьекта": filename, "Причина": f"Ошибка: {e}"})
+            metrics.EXCEL_FILES.labels("analyze", "error").inc()
 
     result_df = pd.DataFrame(results, columns=["Название обьекта", "Сумма"])
     error_df = pd.DataFrame(errors, columns=["Название обьекта", "Причина"])
     return result_df, error_df
+
+
+TRANSACTION_COLUMNS = ["object_name", "permit", "paid_at", "amount", "sheet"]
+
+
+def extract_transactions(filename: str, buf: io.BytesIO) -> pd.DataFrame:
+    """
+    Строки выписки в нормализованном виде для сохранения в БД.
+
+    Возвращает DataFrame с колонками TRANSACTION_COLUMNS: объект (по
+    PERMIT_MAPPING или по имени файла), разрешение, дата платежа (может
+    быть пустой), сумма и имя листа. Фильтры не применяются — храним всё.
+    """
+    base_name = os.path.splitext(filename)[0]
+    default_name = f'Поступления на счет Эскроу {base_name}'
+    frames = []
+
+    for sheet_name, df in read_sheets(buf).items():
+        if df.empty:
+            continue
+        df.columns = df.columns.astype(str).str.strip()
+        sum_col = find_column(df.columns, ["сумм", "amount"])
+        if not sum_col:
+            continue
+
+        out = pd.DataFrame(index=df.index)
+        out["amount"] = pd.to_numeric(df[sum_col], errors="coerce")
+
+        date_col = find_column(df.columns, ["дат", "period"])
+        out["paid_at"] = (
+            pd.to_datetime(df[date_col], errors="coerce").dt.date if date_col else None
+        )
+
+        if "Разрешение на строительство" in df.columns:
+            out["permit"] = df["Разрешение на строительство"].astype("string").str.strip()
+            out["object_name"] = out["permit"].map(PERMIT_MAPPING).fillna(default_name)
+        else:
+            out["permit"] = None
+            out["object_name"] = default_name
+
+        out["sheet"] = str(sheet_name)
+        frames.append(out.dropna(subset=["amount"]))
+
+    if not frames:
+        return pd.DataFrame(columns=TRANSACTION_COLUMNS)
+    return pd.concat(frames, ignore_index=True)[TRANSACTION_COLUMNS]
@@ -0,0 +1,164 @@
+"""
+JSON Patch (RFC 6902) для JSONB-колонок, применяемый в Postgres.
+
+Документ не читается в приложение: операции проверяются здесь, пути
+JSON Pointer разворачиваются в text[], а сам патч применяет функция
+jsonb_patch_apply() на jsonb_set / jsonb_insert / #- внутри одного UPDATE.
+Неприменимая операция (нет пути, не прошёл test) — исключение с
+SQLSTATE 22023, см. patch_error_message().
+"""
+from typing import Any, Literal, Optional
+
+from pydantic import BaseModel, Field, model_validator
+from sqlalchemy import DDL, event, func, literal
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.sql.elements import ColumnElement
+
+from app import models
+
+MAX_OPERATIONS = 100
+PATCH_ERROR_SQLSTATE = "22023"
+
+JSONB_PATCH_FUNCTION = r"""
+CREATE OR REPLACE FUNCTION jsonb_patch_apply(doc jsonb, ops jsonb) RETURNS jsonb
+LANGUAGE plpgsql IMMUTABLE AS $$
+DECLARE
+    op jsonb;
+    path text[];
+    parent text[];
+    src text[];
+    val jsonb;
+    n int;
+BEGIN
+    FOR op IN SELECT * FROM jsonb_array_elements(ops) LOOP
+        path := ARRAY(SELECT jsonb_array_elements_text(op->'path'));
+        n := cardinality(path);
+        parent := path[1:n - 1];
+
+        CASE op->>'op'
+        WHEN 'test' THEN
+            IF doc #> path IS DISTINCT FROM op->'value' THEN
+                RAISE EXCEPTION 'json patch: test failed at /%', array_to_string(path, '/')
+                    USING ERRCODE = '22023';
+            END IF;
+            CONTINUE;
+        WHEN 'remove' THEN
+            IF n = 0 OR doc #> path IS NULL THEN
+                RAISE EXCEPTION 'json patch: path not found /%', array_to_string(path, '/')
+                    USING ERRCODE = '22023';
+            END IF;
+            doc := doc #- path;
+            CONTINUE;
+        WHEN 'replace' THEN
+            IF doc #> path IS NULL THEN
+                RAISE EXCEPTION 'json patch: path not found /%', array_to_string(path, '/')
+                    USING ERRCODE = '22023';
+            END IF;
+            doc := CASE WHEN n = 0 THEN op->'value' ELSE jsonb_set(doc, path, op->'value', false) END;
+            CONTINUE;
+        WHEN 'move', 'copy' THEN
+            src := ARRAY(SELECT jsonb_array_elements_text(op->'from'));
+            val := doc #> src;
+            IF val IS NULL THEN
+                RAISE EXCEPTION 'json patch: path not found /%', array_to_string(src, '/')
+                    USING ERRCODE = '22023';
+            END IF;
+            IF op->>'op' = 'move' THEN
+                doc := doc #- src;
+            END IF;
+        ELSE
+            val := op->'value';
+        END CASE;
+
+        -- add (а также вторая половина move/copy)
+        IF n = 0 THEN
+            doc := val;
+        ELSIF doc #> parent IS NULL THEN
+            RAISE EXCEPTION 'json patch: path not found /%', array_to_string(parent, '/')
+                USING ERRCODE = '22023';
+        ELSIF jsonb_typeof(doc #> parent) = 'array' THEN
+            IF path[n] = '-' THEN
+                doc := CASE WHEN n = 1 THEN doc || jsonb_build_array(val)
+                            ELSE jsonb_set(doc, parent, (doc #> parent) || jsonb_build_array(val)) END;
+            ELSIF path[n] ~ '^(0|[1-9][0-9]*)$'
+                  AND path[n]::int <= jsonb_array_length(doc #> parent) THEN
+                doc := jsonb_insert(doc, path, val);
+            ELSE
+                RAISE EXCEPTION 'json patch: bad array index /%', array_to_string(path, '/')
+                    USING ERRCODE = '22023';
+            END IF;
+        ELSE
+            doc := jsonb_set(doc, path, val, true);
+        END IF;
+    END LOOP;
+    RETURN doc;
+END
+$$;
+"""
+
+# При создании таблиц через create_all функция тоже нужна (для Alembic — отдельная миграция).
+# DDL() форматирует строку через %, поэтому проценты экранируем
+event.listen(models.Dashboard.__table__, "after_create", DDL(JSONB_PATCH_FUNCTION.replace("%", "%%")))
+
+
+class JsonPatchError(ValueError):
+    pass
+
+
+class JsonPatchOp(BaseModel):
+    op: Literal["add", "remove", "replace", "move", "copy", "test"]
+    path: str
+    value: Any = None
+    from_: Optional[str] = Field(None, alias="from")
+
+    @model_validator(mode="after")
+    def check_from(self):
+        if self.op in ("move", "copy") and self.from_ is None:
+            raise ValueError(f"Операция {self.op} требует поле from")
+        return self
+
+
+def parse_pointer(pointer: str) -> list[str]:
+    """JSON Pointer (RFC 6901) → список ключей: "/a/b~1c/0" → ["a", "b/c", "0"]."""
+    if pointer == "":
+        return []
+    if not pointer.startswith("/"):
+        raise JsonPatchError(f"Некорректный путь: {pointer!r}")
+    return [t.replace("~1", "/").replace("~0", "~") for t in pointer[1:].split("/")]
+
+
+def compile_ops(ops: list[JsonPatchOp]) -> list[dict[str, Any]]:
+    """Проверяет операции и переводит пути в массивы ключей для jsonb_patch_apply."""
+    if len(ops) > MAX_OPERATIONS:
+        raise JsonPatchError(f"Слишком много операций (максимум {MAX_OPERATIONS})")
+
+    compiled = []
+    for op in ops:
+        path = parse_pointer(op.path)
+        item: dict[str, Any] = {"op": op.op, "path": path}
+        if op.op in ("add", "replace", "test"):
+            if not path and op.op != "test" and not isinstance(op.value, dict):
+                raise JsonPatchError("Корень документа должен оставаться объектом")
+            item["value"] = op.value
+        if op.op in ("move", "copy"):
+            source = parse_pointer(op.from_)
+            if op.op == "move" and path[:len(source)] == source and path != source:
+                raise JsonPatchError("Нельзя переместить значение внутрь самого себя")
+            if not path:
+                raise JsonPatchError("Корень документа должен оставаться объектом")
+            item["from"] = source
+        compiled.append(item)
+    return compiled
+
+
+def patch_expression(column: ColumnElement, ops: list[JsonPatchOp]) -> ColumnElement:
+    return func.jsonb_patch_apply(column, literal(compile_ops(ops), JSONB), type_=JSONB)
+
+
+def patch_error_message(exc: DBAPIError) -> Optional[str]:
+    """Текст ошибки, если исключение — неприменимый патч из jsonb_patch_apply()."""
+    orig = getattr(exc, "orig", None)
+    if getattr(orig, "pgcode", None) != PATCH_ERROR_SQLSTATE:
+        return None
+    return orig.diag.message_primary
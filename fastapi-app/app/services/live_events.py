@@ -0,0 +1,303 @@
+"""
+События об изменениях для клиентов (/api/events, Server-Sent Events).
+
+Событие — маленький JSON: что изменилось и ключевые поля, чтобы клиент
+поправил у себя одну строку или дочитал только её, а не весь список:
+
+    user.created / user.updated / user.deleted    id, username, email, role, is_active
+    users.bulk                                    count — массовый импорт, перечитать список
+    dashboard.created / .updated / .deleted       id, title, owner_id, is_public, was_public, version
+                                                  (тем, кто потерял доступ, — только id)
+    escrow.ingested                               id, filename, rows, uploaded_by
+    resync                                        события могли потеряться — перечитать всё
+
+События публикуют триггеры Postgres через pg_notify (канал live_events),
+поэтому учитываются все пути записи — API, CLI, ручной SQL — и только
+закоммиченные изменения. Каждый воркер держит одно соединение с LISTEN
+в фоновом потоке и раздаёт события своим подписчикам с учётом прав.
+"""
+import asyncio
+import json
+import logging
+import select
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Optional
+
+from prometheus_client import Counter, Gauge
+from sqlalchemy import DDL, event
+
+from app import models
+from app.core import config
+from app.db import engine
+from app.models import UserRole
+
+logger = logging.getLogger(__name__)
+
+SUBSCRIBERS = Gauge(
+    "live_events_subscribers", "Открытые потоки /api/events", multiprocess_mode="livesum"
+)
+EVENTS_RECEIVED = Counter("live_events_received", "События из pg_notify", ["type"])
+EVENTS_OVERFLOW = Counter("live_events_overflow", "Переполнения очереди подписчика (отправлен resync)")
+
+CHANNEL = "live_events"
+# Ключ advisory-лока: create_all может выполняться в нескольких воркерах сразу
+INSTALL_LOCK = 0x4C4956  # "LIV"
+LISTEN_POLL_SECONDS = 1
+RECONNECT_SECONDS = 5
+
+LIVE_EVENT_FUNCTIONS = r"""
+CREATE OR REPLACE FUNCTION live_notify(event jsonb) RETURNS void
+LANGUAGE sql AS $$
+    SELECT pg_notify('live_events', event::text)
+$$;
+
+CREATE OR REPLACE FUNCTION live_user_event(kind text, u users) RETURNS jsonb
+LANGUAGE sql STABLE AS $$
+    SELECT jsonb_build_object(
+        'type', kind, 'id', u.id, 'username', u.username, 'email', u.email,
+        'role', u.role, 'is_active', u.is_active
+    )
+$$;
+"""
+
+USERS_TRIGGERS = r"""
+CREATE OR REPLACE FUNCTION live_users_rows() RETURNS trigger
+LANGUAGE plpgsql AS $$
+DECLARE
+    n bigint;
+BEGIN
+    -- Больше 20 строк за оператор (импорт) — одно событие users.bulk вместо потока
+    IF TG_OP = 'INSERT' THEN
+        SELECT count(*) INTO n FROM new_rows;
+        IF n > 20 THEN
+            PERFORM live_notify(jsonb_build_object('type', 'users.bulk', 'count', n));
+        ELSE
+            PERFORM live_notify(live_user_event('user.created', r)) FROM new_rows AS r;
+        END IF;
+    ELSE
+        SELECT count(*) INTO n FROM old_rows;
+        IF n > 20 THEN
+            PERFORM live_notify(jsonb_build_object('type', 'users.bulk', 'count', -n));
+        ELSE
+            PERFORM live_notify(live_user_event('user.deleted', r)) FROM old_rows AS r;
+        END IF;
+    END IF;
+    RETURN NULL;
+END
+$$;
+
+CREATE OR REPLACE FUNCTION live_users_update() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    PERFORM live_notify(live_user_event('user.updated', NEW));
+    RETURN NULL;
+END
+$$;
+
+DROP TRIGGER IF EXISTS live_users_insert ON users;
+CREATE TRIGGER live_users_insert AFTER INSERT ON users
+    REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION live_users_rows();
+
+DROP TRIGGER IF EXISTS live_users_delete ON users;
+CREATE TRIGGER live_users_delete AFTER DELETE ON users
+    REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION live_users_rows();
+
+-- last_login / last_activity меняются постоянно — о них не сообщаем
+DROP TRIGGER IF EXISTS live_users_update ON users;
+CREATE TRIGGER live_users_update AFTER UPDATE OF username, email, role, is_active ON users
+    FOR EACH ROW WHEN (
+        (OLD.username, OLD.email, OLD.role, OLD.is_active) IS DISTINCT FROM
+        (NEW.username, NEW.email, NEW.role, NEW.is_active)
+    )
+    EXECUTE FUNCTION live_users_update();
+"""
+
+DASHBOARDS_TRIGGERS = r"""
+CREATE OR REPLACE FUNCTION live_dashboards_row() RETURNS trigger
+LANGUAGE plpgsql AS $$
+DECLARE
+    d dashboards;
+    was_public boolean;
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        d := OLD;
+        was_public := OLD.is_public;
+    ELSIF TG_OP = 'UPDATE' THEN
+        d := NEW;
+        was_public := OLD.is_public;
+    ELSE
+        d := NEW;
+        was_public := NEW.is_public;
+    END IF;
+    PERFORM live_notify(jsonb_build_object(
+        'type', 'dashboard.' || CASE TG_OP WHEN 'INSERT' THEN 'created' WHEN 'UPDATE' THEN 'updated' ELSE 'deleted' END,
+        'id', d.id, 'title', d.title, 'owner_id', d.owner_id,
+        'is_public', d.is_public, 'was_public', was_public, 'version', d.version
+    ));
+    RETURN NULL;
+END
+$$;
+
+DROP TRIGGER IF EXISTS live_dashboards_change ON dashboards;
+CREATE TRIGGER live_dashboards_change AFTER INSERT OR UPDATE OR DELETE ON dashboards
+    FOR EACH ROW EXECUTE FUNCTION live_dashboards_row();
+"""
+
+ESCROW_TRIGGERS = r"""
+CREATE OR REPLACE FUNCTION live_escrow_files_insert() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    PERFORM live_notify(jsonb_build_object(
+        'type', 'escrow.ingested', 'id', NEW.id, 'filename', NEW.filename,
+        'rows', NEW.rows, 'uploaded_by', NEW.uploaded_by
+    ));
+    RETURN NULL;
+END
+$$;
+
+DROP TRIGGER IF EXISTS live_escrow_files_insert ON escrow_files;
+CREATE TRIGGER live_escrow_files_insert AFTER INSERT ON escrow_files
+    FOR EACH ROW EXECUTE FUNCTION live_escrow_files_insert();
+"""
+
+# Все выражения идемпотентны: create_all вызывает этот DDL при каждом старте
+event.listen(
+    models.Base.metadata,
+    "after_create",
+    DDL(
+        f"SELECT pg_advisory_xact_lock({INSTALL_LOCK});"
+        + LIVE_EVENT_FUNCTIONS + USERS_TRIGGERS + DASHBOARDS_TRIGGERS + ESCROW_TRIGGERS
+    ),
+)
+
+ESCROW_ROLES = {UserRole.admin, UserRole.buh_user, UserRole.developer}
+DASHBOARD_ROLES = {UserRole.admin, UserRole.developer}
+
+
+def for_subscriber(event: dict[str, Any], user_id: int, role: UserRole) -> Optional[dict[str, Any]]:
+    """Событие в том виде, в каком его можно отдать подписчику, или None.
+    Те же правила, что у соответствующих эндпоинтов."""
+    kind = event.get("type", "")
+    if kind == "resync":
+        return event
+    if kind.startswith("user"):
+        return event if role == UserRole.admin or event.get("id") == user_id else None
+    if kind.startswith("dashboard."):
+        if role in DASHBOARD_ROLES or event.get("owner_id") == user_id or event.get("is_public"):
+            return event
+        if event.get("was_public"):
+            # Дашборд стал закрытым: сообщаем только, что его больше не видно
+            return {"type": kind, "id": event.get("id")}
+        return None
+    if kind.startswith("escrow."):
+        return event if role in ESCROW_ROLES else None
+    return None
+
+
+@dataclass(eq=False)
+class Subscriber:
+    user_id: int
+    role: UserRole
+    loop: asyncio.AbstractEventLoop
+    queue: asyncio.Queue = field(default_factory=lambda: asyncio.Queue(config.LIVE_EVENTS_QUEUE_SIZE))
+
+    def put(self, event: dict[str, Any]):
+        """Вызывается в event loop подписчика."""
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Клиент не успевает читать: старое выбрасываем, пусть перечитает всё
+            EVENTS_OVERFLOW.inc()
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait({"type": "resync"})
+
+
+class LiveEvents:
+    def __init__(self):
+        self._subscribers: set[Subscriber] = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lost = False  # соединение LISTEN обрывалось — после переподключения resync
+
+    # --- подписчики ---
+    def subscribe(self, user_id: int, role: UserRole) -> Subscriber:
+        sub = Subscriber(user_id, role, asyncio.get_running_loop())
+        with self._lock:
+            self._subscribers.add(sub)
+        SUBSCRIBERS.inc()
+        return sub
+
+    def unsubscribe(self, sub: Subscriber):
+        with self._lock:
+            if sub not in self._subscribers:
+                return
+            self._subscribers.discard(sub)
+        SUBSCRIBERS.dec()
+
+    def dispatch(self, event: dict[str, Any]):
+        """Раздаёт событие подписчикам; потокобезопасно."""
+        EVENTS_RECEIVED.labels(event.get("type", "unknown")).inc()
+        with self._lock:
+            targets = [(s, for_subscriber(event, s.user_id, s.role)) for s in self._subscribers]
+        for sub, payload in targets:
+            if payload is None:
+                continue
+            try:
+                sub.loop.call_soon_threadsafe(sub.put, payload)
+            except RuntimeError:
+                pass  # event loop уже закрыт (остановка воркера)
+
+    # --- LISTEN ---
+    def _listen(self):
+        raw = engine.raw_connection()
+        raw.detach()  # не возвращать в пул соединение с LISTEN
+        conn = raw.dbapi_connection
+        try:
+            conn.autocommit = True
+            with conn.cursor() as cur:
+                cur.execute(f"LISTEN {CHANNEL}")
+            logger.info("📡 Подписка на события БД (LISTEN live_events)")
+            if self._lost:
+                # Пока соединения не было, события могли пройти мимо
+                self._lost = False
+                self.dispatch({"type": "resync"})
+            while not self._stop.is_set():
+                if select.select([conn], [], [], LISTEN_POLL_SECONDS) == ([], [], []):
+                    continue
+                conn.poll()
+                while conn.notifies:
+                    notify = conn.notifies.pop(0)
+                    try:
+                        self.dispatch(json.loads(notify.payload))
+                    except ValueError:
+                        logger.warning(f"⚠ Некорректное событие: {notify.payload[:200]}")
+        finally:
+            raw.close()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self._listen()
+            except Exception as e:
+                logger.warning(f"⚠ Потеряно соединение LISTEN: {e}")
+                self._lost = True
+                self._stop.wait(RECONNECT_SECONDS)
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="live-events", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def stats(self) -> dict[str, int]:
+        return {"subscribers": len(self._subscribers)}
+
+
+live_events = LiveEvents()
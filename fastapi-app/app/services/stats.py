@@ -0,0 +1,204 @@
+"""
+Статистика для админки (/api/admin/stats) без COUNT(*) по таблицам.
+
+Счётчики лежат в stat_counters и поддерживаются триггерами Postgres, поэтому
+учитываются все пути записи — API, массовый импорт, ручной SQL:
+
+    users.<role>.active / users.<role>.inactive
+    dashboards.public / dashboards.private
+
+INSERT/DELETE обрабатываются триггерами уровня оператора (transition
+tables): импорт тысячи пользователей — одно обновление на роль, а не тысяча.
+UPDATE — строчный триггер с WHEN, он срабатывает только при смене роли /
+флага, а не на каждое касание last_activity.
+
+Счётчики по дням (daily_counters) пишет фоновый поток журнала аудита
+(app/services/audit.py) — по пачкам событий; сюда же триггер на users
+добавляет users.created. Число «активных за N минут» — не счётчик, а
+диапазон по индексу ix_users_last_activity: читаются только активные.
+"""
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import DDL, event, func, select
+from sqlalchemy.orm import Session
+
+from app import models
+from app.core import config
+from app.models import UserRole
+
+# Ключ advisory-лока: create_all может выполняться в нескольких воркерах сразу
+INSTALL_LOCK = 0x535441  # "STA"
+
+STAT_COUNTER_FUNCTIONS = r"""
+CREATE OR REPLACE FUNCTION stat_user_key(role userrole, is_active boolean) RETURNS text
+LANGUAGE sql IMMUTABLE AS $$
+    SELECT 'users.' || role::text || CASE WHEN is_active THEN '.active' ELSE '.inactive' END
+$$;
+
+CREATE OR REPLACE FUNCTION stat_dashboard_key(is_public boolean) RETURNS text
+LANGUAGE sql IMMUTABLE AS $$
+    SELECT CASE WHEN is_public THEN 'dashboards.public' ELSE 'dashboards.private' END
+$$;
+
+-- Перенос строки из одного счётчика в другой; ключи — по порядку, чтобы
+-- встречные изменения (admin -> viewer и viewer -> admin) не ловили deadlock
+CREATE OR REPLACE FUNCTION stat_counter_move(old_key text, new_key text) RETURNS void
+LANGUAGE sql AS $$
+    INSERT INTO stat_counters (name, value)
+    SELECT k, d FROM (VALUES (old_key, -1::bigint), (new_key, 1::bigint)) AS v(k, d) ORDER BY k
+    ON CONFLICT (name) DO UPDATE SET value = stat_counters.value + EXCLUDED.value
+$$;
+"""
+
+USERS_TRIGGERS = r"""
+CREATE OR REPLACE FUNCTION stat_users_rows() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO stat_counters (name, value)
+        SELECT stat_user_key(role, is_active), count(*) FROM new_rows GROUP BY 1 ORDER BY 1
+        ON CONFLICT (name) DO UPDATE SET value = stat_counters.value + EXCLUDED.value;
+
+        INSERT INTO daily_counters (day, name, value)
+        SELECT current_date, 'users.created', count(*) FROM new_rows HAVING count(*) > 0
+        ON CONFLICT (day, name) DO UPDATE SET value = daily_counters.value + EXCLUDED.value;
+    ELSE
+        INSERT INTO stat_counters (name, value)
+        SELECT stat_user_key(role, is_active), -count(*) FROM old_rows GROUP BY 1 ORDER BY 1
+        ON CONFLICT (name) DO UPDATE SET value = stat_counters.value + EXCLUDED.value;
+    END IF;
+    RETURN NULL;
+END
+$$;
+
+CREATE OR REPLACE FUNCTION stat_users_update() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    PERFORM stat_counter_move(stat_user_key(OLD.role, OLD.is_active), stat_user_key(NEW.role, NEW.is_active));
+    RETURN NULL;
+END
+$$;
+
+DROP TRIGGER IF EXISTS stat_users_insert ON users;
+CREATE TRIGGER stat_users_insert AFTER INSERT ON users
+    REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION stat_users_rows();
+
+DROP TRIGGER IF EXISTS stat_users_delete ON users;
+CREATE TRIGGER stat_users_delete AFTER DELETE ON users
+    REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION stat_users_rows();
+
+DROP TRIGGER IF EXISTS stat_users_update ON users;
+CREATE TRIGGER stat_users_update AFTER UPDATE OF role, is_active ON users
+    FOR EACH ROW WHEN (OLD.role IS DISTINCT FROM NEW.role OR OLD.is_active IS DISTINCT FROM NEW.is_active)
+    EXECUTE FUNCTION stat_users_update();
+"""
+
+DASHBOARDS_TRIGGERS = r"""
+CREATE OR REPLACE FUNCTION stat_dashboards_rows() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO stat_counters (name, value)
+        SELECT stat_dashboard_key(is_public), count(*) FROM new_rows GROUP BY 1 ORDER BY 1
+        ON CONFLICT (name) DO UPDATE SET value = stat_counters.value + EXCLUDED.value;
+    ELSE
+        INSERT INTO stat_counters (name, value)
+        SELECT stat_dashboard_key(is_public), -count(*) FROM old_rows GROUP BY 1 ORDER BY 1
+        ON CONFLICT (name) DO UPDATE SET value = stat_counters.value + EXCLUDED.value;
+    END IF;
+    RETURN NULL;
+END
+$$;
+
+CREATE OR REPLACE FUNCTION stat_dashboards_update() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    PERFORM stat_counter_move(stat_dashboard_key(OLD.is_public), stat_dashboard_key(NEW.is_public));
+    RETURN NULL;
+END
+$$;
+
+DROP TRIGGER IF EXISTS stat_dashboards_insert ON dashboards;
+CREATE TRIGGER stat_dashboards_insert AFTER INSERT ON dashboards
+    REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION stat_dashboards_rows();
+
+DROP TRIGGER IF EXISTS stat_dashboards_delete ON dashboards;
+CREATE TRIGGER stat_dashboards_delete AFTER DELETE ON dashboards
+    REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION stat_dashboards_rows();
+
+DROP TRIGGER IF EXISTS stat_dashboards_update ON dashboards;
+CREATE TRIGGER stat_dashboards_update AFTER UPDATE OF is_public ON dashboards
+    FOR EACH ROW WHEN (OLD.is_public IS DISTINCT FROM NEW.is_public)
+    EXECUTE FUNCTION stat_dashboards_update();
+"""
+
+# Начальные значения — только если счётчиков ещё нет (таблица только что создана;
+# триггеры к этому моменту уже стоят, так что дальше всё считается само)
+STAT_COUNTERS_BACKFILL = r"""
+INSERT INTO stat_counters (name, value)
+SELECT name, value FROM (
+    SELECT stat_user_key(role, is_active) AS name, count(*) AS value FROM users GROUP BY 1
+    UNION ALL
+    SELECT stat_dashboard_key(is_public), count(*) FROM dashboards GROUP BY 1
+) AS initial
+WHERE NOT EXISTS (SELECT 1 FROM stat_counters);
+"""
+
+# Все выражения идемпотентны: create_all вызывает этот DDL при каждом старте
+event.listen(
+    models.Base.metadata,
+    "after_create",
+    DDL(
+        f"SELECT pg_advisory_xact_lock({INSTALL_LOCK});"
+        + STAT_COUNTER_FUNCTIONS + USERS_TRIGGERS + DASHBOARDS_TRIGGERS + STAT_COUNTERS_BACKFILL
+    ),
+)
+
+
+def read_counters(db: Session) -> dict[str, int]:
+    return dict(db.execute(select(models.StatCounter.name, models.StatCounter.value)).all())
+
+
+def daily_series(db: Session, name: str, days: int) -> list[dict]:
+    """Значения счётчика за последние days дней, включая дни с нулём."""
+    since = date.today() - timedelta(days=days - 1)
+    rows = dict(db.execute(
+        select(models.DailyCounter.day, models.DailyCounter.value)
+        .where(models.DailyCounter.name == name, models.DailyCounter.day >= since)
+    ).all())
+    return [{"day": since + timedelta(days=i), "count": rows.get(since + timedelta(days=i), 0)} for i in range(days)]
+
+
+def active_since(db: Session, moment: datetime) -> int:
+    return db.execute(
+        select(func.count()).select_from(models.User).where(models.User.last_activity >= moment)
+    ).scalar_one()
+
+
+def collect_stats(db: Session) -> dict:
+    counters = read_counters(db)
+    by_role = {
+        role.value: {
+            "active": counters.get(f"users.{role.value}.active", 0),
+            "inactive": counters.get(f"users.{role.value}.inactive", 0),
+        }
+        for role in UserRole
+    }
+    active = sum(r["active"] for r in by_role.values())
+    inactive = sum(r["inactive"] for r in by_role.values())
+    public, private = counters.get("dashboards.public", 0), counters.get("dashboards.private", 0)
+    now = datetime.utcnow()
+    minutes = config.STATS_ACTIVE_MINUTES
+    new_users = daily_series(db, "users.created", 7)
+
+    return {
+        "users": {"total": active + inactive, "active": active, "inactive": inactive, "by_role": by_role},
+        "active_recently": {"minutes": minutes, "count": active_since(db, now - timedelta(minutes=minutes))},
+        "dashboards": {"total": public + private, "public": public, "private": private},
+        "analyses_per_day": daily_series(db, "excel_analyze", config.STATS_DAYS),
+        # Поля, которые показывает StatsPage во фронтенде
+        "total_users": active + inactive,
+        "active_today": active_since(db, now.replace(hour=0, minute=0, second=0, microsecond=0)),
+        "new_this_week": sum(d["count"] for d in new_users),
+        "admin_count": by_role[UserRole.admin.value]["active"] + by_role[UserRole.admin.value]["inactive"],
+    }
@@ -0,0 +1,199 @@
+import csv
+import io
+import os
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+import pandas as pd
+from sqlalchemy import select, insert
+from sqlalchemy.orm import Session
+
+from app import models
+from app.db import SessionLocal
+from app.models import UserRole
+from app.security import get_password_hash
+from app.core.config import BULK_HASH_WORKERS
+
+logger = logging.getLogger(__name__)
+
+REQUIRED_COLUMNS = ["username", "email", "password"]
+EXPORT_COLUMNS = ["id", "username", "email", "role", "is_active", "last_login", "last_activity"]
+
+USERNAME_MIN, USERNAME_MAX = 3, models.User.__table__.c.username.type.length
+EMAIL_MAX = models.User.__table__.c.email.type.length
+PASSWORD_MIN, PASSWORD_MAX = 6, 128
+EMAIL_RE = r"^[^@\s]+@[^@\s]+\.[^@\s]+$"
+
+INSERT_BATCH_SIZE = 1000
+# Меньше этого числа паролей пул процессов не поднимаем — накладные расходы больше выигрыша
+POOL_MIN_PASSWORDS = 8
+
+HASH_WORKERS = BULK_HASH_WORKERS or os.cpu_count() or 1
+
+_hash_pool: Optional[ProcessPoolExecutor] = None
+
+
+def _get_hash_pool() -> ProcessPoolExecutor:
+    global _hash_pool
+    if _hash_pool is None:
+        # spawn: воркер gunicorn многопоточный, fork из него небезопасен
+        _hash_pool = ProcessPoolExecutor(
+            max_workers=HASH_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _hash_pool
+
+
+def hash_passwords(passwords: list[str]) -> list[str]:
+    """bcrypt упирается в CPU — раскидываем хэширование по процессам."""
+    if len(passwords) < POOL_MIN_PASSWORDS:
+        return [get_password_hash(p) for p in passwords]
+    pool = _get_hash_pool()
+    chunksize = max(1, len(passwords) // (HASH_WORKERS * 4))
+    return list(pool.map(get_password_hash, passwords, chunksize=chunksize))
+
+
+def read_users_file(filename: str, content: bytes) -> pd.DataFrame:
+    """
+    Читает CSV/XLSX/XLS в DataFrame строк (все значения — str, пустые — "").
+    Любая ошибка разбора — ValueError с понятным текстом.
+    """
+    buf = io.BytesIO(content)
+    name = filename.lower()
+    try:
+        if name.endswith(".xlsx"):
+            df = pd.read_excel(buf, dtype=str, engine="openpyxl")
+        elif name.endswith(".xls"):
+            df = pd.read_excel(buf, dtype=str, engine="xlrd")  # старый формат Excel 97–2003
+        else:
+            df = pd.read_csv(buf, dtype=str, keep_default_na=False, sep=None, engine="python")
+    except Exception as e:
+        raise ValueError(f"Не удалось прочитать файл {filename}: {e}") from e
+    df = df.fillna("")
+    df.columns = df.columns.astype(str).str.strip().str.lower()
+    return df
+
+
+def validate_users(db: Session, df: pd.DataFrame) -> tuple[pd.DataFrame, list[dict]]:
+    """
+    Векторная проверка строк импорта.
+
+    Возвращает:
+    - valid: DataFrame строк, прошедших все проверки.
+    - errors: список {"row", "field", "error"}; row — номер строки в файле (с заголовком).
+    """
+    missing = [c for c in REQUIRED_COLUMNS if c not in df.columns]
+    if missing:
+        raise ValueError(f"В файле нет колонок: {', '.join(missing)}")
+
+    df = df.copy()
+    for col in REQUIRED_COLUMNS:
+        df[col] = df[col].astype(str).str.strip()
+    if "role" not in df.columns:
+        df["role"] = ""
+    df["role"] = df["role"].astype(str).str.strip().replace("", UserRole.viewer.value)
+
+    username_len = df["username"].str.len()
+    password_len = df["password"].str.len()
+    checks = [
+        ("username", ~username_len.between(USERNAME_MIN, USERNAME_MAX),
+         f"Длина username должна быть от {USERNAME_MIN} до {USERNAME_MAX}"),
+        ("email", ~df["email"].str.match(EMAIL_RE) | (df["email"].str.len() > EMAIL_MAX),
+         "Некорректный email"),
+        ("password", ~password_len.between(PASSWORD_MIN, PASSWORD_MAX),
+         f"Длина пароля должна быть от {PASSWORD_MIN} до {PASSWORD_MAX}"),
+        ("role", ~df["role"].isin([r.value for r in UserRole]),
+         "Недопустимая роль"),
+        ("username", df["username"].duplicated(keep="first") & (df["username"] != ""),
+         "Повтор username в файле"),
+        ("email", df["email"].duplicated(keep="first") & (df["email"] != ""),
+         "Повтор email в файле"),
+    ]
+
+    # Конфликты с уже существующими пользователями — один запрос на колонку
+    existing_usernames = set(db.scalars(
+        select(models.User.username).where(models.User.username.in_(df["username"].unique().tolist()))
+    ))
+    existing_emails = set(db.scalars(
+        select(models.User.email).where(models.User.email.in_(df["email"].unique().tolist()))
+    ))
+    checks += [
+        ("username", df["username"].isin(existing_usernames), "Пользователь уже существует"),
+        ("email", df["email"].isin(existing_emails), "Email уже используется"),
+    ]
+
+    errors = []
+    invalid = pd.Series(False, index=df.index)
+    for field, mask, message in checks:
+        invalid |= mask
+        for pos in mask[mask].index:
+            errors.append({"row": int(pos) + 2, "field": field, "error": message})
+    errors.sort(key=lambda e: e["row"])
+
+    return df[~invalid], errors
+
+
+def import_users(db: Session, valid: pd.DataFrame) -> int:
+    """Хэширует пароли и вставляет пользователей пачками в одной транзакции."""
+    if valid.empty:
+        return 0
+
+    hashes = hash_passwords(valid["password"].tolist())
+    rows = [
+        {
+            "username": username,
+            "email": email,
+            "hashed_password": hashed,
+            "role": UserRole(role),
+            "is_active": True,
+        }
+        for username, email, role, hashed in zip(
+            valid["username"], valid["email"], valid["role"], hashes
+        )
+    ]
+
+    try:
+        for start in range(0, len(rows), INSERT_BATCH_SIZE):
+            # executemany → multi-row INSERT ... VALUES (...), (...) (insertmanyvalues)
+            db.execute(insert(models.User), rows[start:start + INSERT_BATCH_SIZE])
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    logger.info(f"✅ Импортировано пользователей: {len(rows)}")
+    return len(rows)
+
+
+def stream_users_csv(batch_size: int = 1000):
+    """
+    Генератор CSV-выгрузки пользователей.
+
+    Читает через серверный курсор (yield_per) и отдаёт строки пачками,
+    не держа всю таблицу в памяти. Сессия своя: генератор дочитывается
+    уже после того, как зависимость get_db закрыла сессию запроса.
+    """
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(EXPORT_COLUMNS)
+
+    with SessionLocal() as db:
+        stmt = (
+            select(*(getattr(models.User, c) for c in EXPORT_COLUMNS))
+            .order_by(models.User.id)
+            .execution_options(yield_per=batch_size)
+        )
+        for partition in db.execute(stmt).partitions():
+            for row in partition:
+                writer.writerow([
+                    v.value if isinstance(v, UserRole) else ("" if v is None else v)
+                    for v in row
+                ])
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+
+    if buf.tell():
+        yield buf.getvalue()
@@ -0,0 +1,189 @@
+"""
+Серверный расчёт виджетов дашборда.
+
+Виджет в Dashboard.config:
+    {"widgets": [{"id": "w1", "type": "bar",
+                  "query": {"metric": "sum", "group_by": ["object", "period"],
+                            "period": "month", "date_from": "2024-01-01"}}]}
+
+Виджеты без "query" считаются на клиенте и здесь пропускаются.
+Запрос виджета превращается в SQL по escrow_transactions. Результат
+кэшируется в widget_results (общий для всех воркеров) и в памяти воркера
+по ключу sha256(запрос) + версия данных "escrow": пока данные не менялись,
+повторный расчёт не нужен, после загрузки новой выписки кэш устаревает сам.
+"""
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from datetime import date
+from typing import Any, Literal, Optional
+
+from pydantic import BaseModel, Field, ValidationError
+from sqlalchemy import Date, cast, func, literal_column, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from app import models
+from app.services.escrow_store import get_data_version
+
+METRICS = {
+    "sum": func.sum,
+    "count": func.count,
+    "avg": func.avg,
+    "min": func.min,
+    "max": func.max,
+}
+LOCAL_CACHE_SIZE = 256
+
+
+class WidgetQuery(BaseModel):
+    metric: Literal["sum", "count", "avg", "min", "max"] = "sum"
+    group_by: list[Literal["object", "period"]] = Field(default_factory=lambda: ["object"])
+    period: Literal["day", "month", "year"] = "month"
+    objects: Optional[list[str]] = None
+    date_from: Optional[date] = None
+    date_to: Optional[date] = None
+    exclude_negative: bool = True
+    limit: int = Field(1000, ge=1, le=10000)
+
+
+class WidgetError(ValueError):
+    pass
+
+
+def widget_query(widget: dict[str, Any]) -> Optional[WidgetQuery]:
+    raw = widget.get("query")
+    if raw is None:
+        return None
+    try:
+        return WidgetQuery.model_validate(raw)
+    except ValidationError as e:
+        raise WidgetError(f"Виджет {widget.get('id')}: некорректный query: {e.errors()}")
+
+
+def cache_key(query: WidgetQuery) -> str:
+    canonical = json.dumps(query.model_dump(mode="json"), sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def build_sql(query: WidgetQuery):
+    tx = models.EscrowTransaction
+    columns, group = [], []
+    if "object" in query.group_by:
+        columns.append(tx.object_name.label("object"))
+        group.append(tx.object_name)
+    if "period" in query.group_by:
+        # period — из Literal, литерал безопасен; одинаковое выражение в SELECT и GROUP BY
+        period = cast(func.date_trunc(literal_column(f"'{query.period}'"), tx.paid_at), Date)
+        columns.append(period.label("period"))
+        group.append(period)
+
+    value = METRICS[query.metric](tx.id if query.metric == "count" else tx.amount)
+    stmt = select(*columns, value.label("value")).group_by(*group)
+
+    if query.exclude_negative:
+        stmt = stmt.where(tx.amount >= 0)
+    if query.objects:
+        stmt = stmt.where(tx.object_name.in_(query.objects))
+    if query.date_from:
+        stmt = stmt.where(tx.paid_at >= query.date_from)
+    if query.date_to:
+        stmt = stmt.where(tx.paid_at <= query.date_to)
+    if "period" in query.group_by:
+        stmt = stmt.where(tx.paid_at.isnot(None))
+
+    return stmt.order_by(*group).limit(query.limit)
+
+
+def run_query(db: Session, query: WidgetQuery) -> list[dict[str, Any]]:
+    rows = db.execute(build_sql(query)).mappings()
+    return [
+        {
+            **{k: (v.isoformat() if isinstance(v, date) else v) for k, v in row.items() if k != "value"},
+            "value": float(row["value"]) if row["value"] is not None else None,
+        }
+        for row in rows
+    ]
+
+
+class WidgetCache:
+    """Кэш результатов: память воркера (LRU) → таблица widget_results → расчёт."""
+
+    def __init__(self, size: int = LOCAL_CACHE_SIZE):
+        self._local: OrderedDict[tuple[str, int], list] = OrderedDict()
+        self._size = size
+        self._lock = threading.Lock()
+
+    def _remember(self, key: tuple[str, int], result: list):
+        with self._lock:
+            self._local[key] = result
+            self._local.move_to_end(key)
+            while len(self._local) > self._size:
+                self._local.popitem(last=False)
+
+    def get(self, db: Session, query: WidgetQuery, data_version: int) -> tuple[list, bool]:
+        """Возвращает (результат, был ли он в кэше)."""
+        key = cache_key(query)
+        with self._lock:
+            local = self._local.get((key, data_version))
+        if local is not None:
+            return local, True
+
+        stored = db.scalar(
+            select(models.WidgetResult.result).where(
+                models.WidgetResult.cache_key == key,
+                models.WidgetResult.data_version == data_version,
+            )
+        )
+        if stored is not None:
+            self._remember((key, data_version), stored)
+            return stored, True
+
+        result = run_query(db, query)
+        table = models.WidgetResult.__table__
+        stmt = pg_insert(table).values(cache_key=key, data_version=data_version, result=result)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.cache_key],
+            set_={
+                "data_version": stmt.excluded.data_version,
+                "result": stmt.excluded.result,
+                "computed_at": stmt.excluded.computed_at,
+            },
+            # не затираем результат, посчитанный по более свежим данным
+            where=table.c.data_version <= stmt.excluded.data_version,
+        )
+        db.execute(stmt)
+        db.commit()
+        self._remember((key, data_version), result)
+        return result, False
+
+
+widget_cache = WidgetCache()
+
+
+def dashboard_widget_data(
+    db: Session,
+    config: dict[str, Any],
+    widget_id: Optional[str] = None,
+) -> dict[str, Any]:
+    """Данные серверных виджетов дашборда: {"data_version", "widgets": {id: {...}}}."""
+    widgets = (config.get("widgets") if isinstance(config, dict) else None) or []
+    if not isinstance(widgets, list):
+        raise WidgetError("config.widgets должен быть списком")
+    # Конфиг правится JSON Patch без схемы: не-объекты в списке — не серверные виджеты
+    widgets = [w for w in widgets if isinstance(w, dict)]
+    if widget_id is not None:
+        widgets = [w for w in widgets if str(w.get("id")) == widget_id]
+        if not widgets:
+            raise KeyError(widget_id)
+
+    data_version = get_data_version(db)
+    out = {}
+    for widget in widgets:
+        query = widget_query(widget)
+        if query is None:
+            continue
+        rows, cached = widget_cache.get(db, query, data_version)
+        out[str(widget.get("id"))] = {"rows": rows, "cached": cached}
+    return {"data_version": data_version, "widgets": out}
@@ -0,0 +1,186 @@
+"""
+Отзыв JWT-токенов.
+
+Источник истины — таблица revoked_tokens в Postgres. Каждый воркер держит
+её зеркало в памяти (множество jti + отсечки по пользователям) и
+подтягивает только новые записи фоновым потоком, поэтому проверка токена
+на запросе — это поиск в dict, без обращения к БД.
+"""
+import calendar
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Optional
+
+from sqlalchemy import delete, event, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app import models
+from app.db import SessionLocal
+from app.core.config import REFRESH_TOKEN_EXPIRE_DAYS, REVOCATION_SYNC_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Перекрытие окна синхронизации: транзакции могут коммититься не в порядке revoked_at
+SYNC_OVERLAP = timedelta(seconds=60)
+# Как часто чистить из БД записи, срок действия которых уже истёк
+PURGE_INTERVAL = timedelta(hours=1)
+
+
+def _ts(dt: datetime) -> int:
+    """naive UTC datetime → unix timestamp (как iat/exp в JWT)."""
+    return calendar.timegm(dt.utctimetuple())
+
+
+class RevocationCache:
+    def __init__(self):
+        self._jtis: dict[str, int] = {}          # jti -> exp (для вычистки)
+        # user_id -> токены с iat < cutoff отозваны. iat — целые секунды, поэтому
+        # токен, выданный в ту же секунду сразу после отзыва (новый вход), остаётся в силе
+        self._user_cutoffs: dict[int, int] = {}
+        self._watermark: Optional[datetime] = None
+        self._last_purge = datetime.min
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # --- проверка (горячий путь) ---
+    def is_revoked(self, payload: dict[str, Any]) -> bool:
+        jti = payload.get("jti")
+        if jti and jti in self._jtis:
+            return True
+        return self.issued_before_cutoff(payload)
+
+    def issued_before_cutoff(self, payload: dict[str, Any]) -> bool:
+        sub, iat = payload.get("sub"), payload.get("iat")
+        if sub is None or iat is None:
+            return False
+        cutoff = self._user_cutoffs.get(int(sub))
+        return cutoff is not None and iat < cutoff
+
+    # --- наполнение ---
+    def add(self, jti: Optional[str], user_id: int, revoked_at: datetime, expires_at: datetime):
+        with self._lock:
+            if jti:
+                self._jtis[jti] = _ts(expires_at)
+            else:
+                ts = _ts(revoked_at)
+                if ts > self._user_cutoffs.get(user_id, 0):
+                    self._user_cutoffs[user_id] = ts
+
+    def _evict_expired(self):
+        now = _ts(datetime.utcnow())
+        with self._lock:
+            self._jtis = {j: exp for j, exp in self._jtis.items() if exp > now}
+            # отсечка пользователя не нужна, когда все токены до неё уже истекли
+            horizon = now - int(timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS).total_seconds())
+            self._user_cutoffs = {u: c for u, c in self._user_cutoffs.items() if c > horizon}
+
+    def sync(self, db: Session):
+        """Подтягивает записи, появившиеся после прошлой синхронизации."""
+        now = datetime.utcnow()
+        stmt = select(
+            models.RevokedToken.jti,
+            models.RevokedToken.user_id,
+            models.RevokedToken.revoked_at,
+            models.RevokedToken.expires_at,
+        ).where(models.RevokedToken.expires_at > now)
+        if self._watermark is not None:
+            stmt = stmt.where(models.RevokedToken.revoked_at >= self._watermark - SYNC_OVERLAP)
+
+        rows = db.execute(stmt).all()
+        for jti, user_id, revoked_at, expires_at in rows:
+            self.add(jti, user_id, revoked_at, expires_at)
+        self._watermark = now
+        self._evict_expired()
+
+        if now - self._last_purge > PURGE_INTERVAL:
+            db.execute(delete(models.RevokedToken).where(models.RevokedToken.expires_at <= now))
+            db.commit()
+            self._last_purge = now
+
+    # --- фоновый поток ---
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                with SessionLocal() as db:
+                    self.sync(db)
+            except Exception as e:
+                logger.warning(f"⚠ Ошибка синхронизации отозванных токенов: {e}")
+            self._stop.wait(REVOCATION_SYNC_SECONDS)
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="revocation-sync", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def stats(self) -> dict[str, int]:
+        return {"jtis": len(self._jtis), "user_cutoffs": len(self._user_cutoffs)}
+
+
+revocation_cache = RevocationCache()
+
+# Отзывы, записанные в сессию без commit: в кэш попадают только после коммита
+PENDING_KEY = "pending_user_revocations"
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_pending_revocations(session: Session):
+    for user_id, revoked_at in session.info.pop(PENDING_KEY, []):
+        revocation_cache.add(None, user_id, revoked_at, revoked_at)
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_pending_revocations(session: Session):
+    session.info.pop(PENDING_KEY, None)
+
+
+def revoke_token(db: Session, payload: dict[str, Any], reason: str) -> bool:
+    """
+    Отзывает конкретный токен по jti.
+    Возвращает False, если токен уже был отозван (в т.ч. другим воркером) —
+    для refresh это означает повторное использование.
+    """
+    jti = payload["jti"]
+    expires_at = datetime.utcfromtimestamp(payload["exp"])
+    stmt = (
+        insert(models.RevokedToken)
+        .values(
+            jti=jti,
+            user_id=int(payload["sub"]),
+            reason=reason,
+            revoked_at=datetime.utcnow(),
+            expires_at=expires_at,
+        )
+        .on_conflict_do_nothing(index_elements=["jti"])
+        .returning(models.RevokedToken.id)
+    )
+    inserted = db.execute(stmt).scalar_one_or_none() is not None
+    db.commit()
+    revocation_cache.add(jti, int(payload["sub"]), datetime.utcnow(), expires_at)
+    return inserted
+
+
+def revoke_user_tokens(db: Session, user_id: int, reason: str, commit: bool = True):
+    """
+    Отзывает все токены пользователя, выданные до текущего момента.
+    С commit=False запись коммитит вызывающий; кэш воркера обновится после коммита.
+    """
+    now = datetime.utcnow()
+    db.add(models.RevokedToken(
+        jti=None,
+        user_id=user_id,
+        reason=reason,
+        revoked_at=now,
+        expires_at=now + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS),
+    ))
+    db.info.setdefault(PENDING_KEY, []).append((user_id, now))
+    if commit:
+        db.commit()
+    logger.info(f"🔒 Все токены пользователя id={user_id} отозваны ({reason})")
@@ -1,21 +1,25 @@
 import logging
+import uuid
 from datetime import datetime, timedelta
 from typing import Any, Optional
 from jose import jwt, JWTError, ExpiredSignatureError
-from app.core.config import SECRET_KEY, ALGORITHM
+from app.core.config import SECRET_KEY, ALGORITHM, REFRESH_TOKEN_EXPIRE_DAYS
+
+def new_jti() -> str:
+    return uuid.uuid4().hex
 
 def create_access_token(data: dict, expires_minutes: int = 15) -> str:
     now = datetime.utcnow()
     expire = now + timedelta(minutes=expires_minutes)
     to_encode = data.copy()
-    to_encode.update({"exp": expire, "iat": now, "nbf": now})
+    to_encode.update({"exp": expire, "iat": now, "nbf": now, "jti": new_jti(), "type": "access"})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
-def create_refresh_token(data: dict, expires_days: int = 7) -> str:
+def create_refresh_token(data: dict, expires_days: int = REFRESH_TOKEN_EXPIRE_DAYS) -> str:
     now = datetime.utcnow()
     expire = now + timedelta(days=expires_days)
     to_encode = data.copy()
-    to_encode.update({"exp": expire, "iat": now, "nbf": now})
+    to_encode.update({"exp": expire, "iat": now, "nbf": now, "jti": new_jti(), "type": "refresh"})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
 def decode_token(token: str) -> Optional[dict[str, Any]]:
@@ -0,0 +1,81 @@
+"""
+Цена сжатия ответов: время CPU против сэкономленных байт.
+
+Тела — список пользователей (как /api/admin/users) и результат анализа
+выписок (как /api/analyze-excel). Для каждого уровня gzip/brotli печатает
+размер, степень сжатия и лучшее время из --repeat прогонов.
+
+Запуск из fastapi-app/:
+    python -m benchmarks.bench_compression [--rows 1000] [--repeat 20]
+"""
+import argparse
+import random
+import timeit
+import zlib
+
+import orjson
+
+from app import schemas
+from app.core.serialization import rows_response
+from benchmarks.bench_json import make_users
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def analysis_payload(n: int) -> bytes:
+    rnd = random.Random(42)
+    objects = [f"ЖК «Объект {i}», корпус {i % 7 + 1}" for i in range(max(n // 20, 1))]
+    return orjson.dumps({
+        "summary": {name: round(rnd.uniform(1e5, 1e8), 2) for name in objects},
+        "rows": [
+            {
+                "object": rnd.choice(objects),
+                "date": f"2024-{rnd.randint(1, 12):02d}-{rnd.randint(1, 28):02d}",
+                "amount": round(rnd.uniform(-1e5, 5e6), 2),
+                "sheet": f"Лист{rnd.randint(1, 3)}",
+            }
+            for _ in range(n)
+        ],
+    })
+
+
+def encoders():
+    for level in (1, 6, 9):
+        yield f"gzip-{level}", lambda data, level=level: (
+            lambda c: c.compress(data) + c.flush()
+        )(zlib.compressobj(level, zlib.DEFLATED, 31))
+    if brotli is not None:
+        for quality in (1, 4, 6, 11):
+            yield f"br-{quality}", lambda data, quality=quality: brotli.compress(data, quality=quality)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    bodies = {
+        "users": rows_response(make_users(args.rows), schemas.UserOut).body,
+        "analysis": analysis_payload(args.rows),
+    }
+    if brotli is None:
+        print("brotli не установлен — только gzip")
+
+    for name, body in bodies.items():
+        print(f"\n{name}: {len(body)} bytes")
+        for label, fn in encoders():
+            size = len(fn(body))
+            best = min(timeit.repeat(lambda: fn(body), number=1, repeat=args.repeat))
+            saved = len(body) - size
+            print(
+                f"  {label:<8} {size:>8} bytes  x{len(body) / size:5.1f}  "
+                f"{best * 1000:7.2f} ms  {saved / 1024 / max(best * 1000, 1e-6):7.1f} KiB saved/ms"
+            )
+
+
+if __name__ == "__main__":
+    main()
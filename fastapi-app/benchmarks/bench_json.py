@@ -0,0 +1,68 @@
+"""
+Микробенчмарк сериализации списка пользователей (1000 строк).
+
+Сравнивает путь FastAPI по умолчанию (валидация response_model + json.dumps)
+с rows_response() (поля из ORM-строк → orjson). БД не нужна: строки —
+несохранённые ORM-объекты.
+
+Запуск из fastapi-app/:
+    python -m benchmarks.bench_json [--rows 1000] [--repeat 50]
+"""
+import argparse
+import json
+import timeit
+from datetime import datetime, timedelta
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+
+from app import models, schemas
+from app.core.serialization import rows_response
+from app.models import UserRole
+
+
+def make_users(n: int) -> list[models.User]:
+    now = datetime.utcnow()
+    roles = list(UserRole)
+    return [
+        models.User(
+            id=i,
+            username=f"user{i}",
+            email=f"user{i}@example.com",
+            hashed_password="x",
+            role=roles[i % len(roles)],
+            is_active=bool(i % 3),
+            last_login=now - timedelta(minutes=i),
+            last_activity=now,
+        )
+        for i in range(n)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    users = make_users(args.rows)
+    field = TypeAdapter(list[schemas.UserOut])
+
+    def before() -> bytes:
+        # То, что делает FastAPI для response_model=list[UserOut] + JSONResponse
+        value = field.validate_python(users, from_attributes=True)
+        return JSONResponse(jsonable_encoder(field.dump_python(value, mode="json"))).body
+
+    def after() -> bytes:
+        return rows_response(users, schemas.UserOut).body
+
+    assert json.loads(before()) == json.loads(after()), "ответы различаются"
+
+    for name, fn in (("response_model + json", before), ("rows_response + orjson", after)):
+        best = min(timeit.repeat(fn, number=1, repeat=args.repeat))
+        print(f"{name:<26} {best * 1000:8.2f} ms  ({len(fn())} bytes, {args.rows} rows)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Накладные расходы журнала запросов на один запрос.
+
+before — прежние два слоя @app.middleware("http") (log_requests +
+update_last_activity для запроса без токена) и синхронный StreamHandler;
+after — RequestLogMiddleware и вывод через очередь (setup_logging).
+Обработчик — пустой GET, вывод логов идёт в /dev/null. Запросы подаются
+прямо в ASGI-приложение, без HTTP-клиента и сервера.
+
+Запуск из fastapi-app/:
+    python -m benchmarks.bench_request_log [--requests 5000] [--sample-rate 1.0]
+"""
+import argparse
+import asyncio
+import logging
+import os
+import time
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+from app.core import request_log
+from app.core.request_log import LOG_FORMAT, RequestLogMiddleware
+
+
+def before_app() -> FastAPI:
+    app = FastAPI()
+    logger = logging.getLogger("bench.before")
+
+    @app.get("/items/{item_id}")
+    async def item(item_id: int):
+        return {"id": item_id}
+
+    @app.middleware("http")
+    async def log_requests(request: Request, call_next):
+        logger.info(f"➡️ {request.method} {request.url.path}")
+        try:
+            response = await call_next(request)
+        except Exception as e:
+            logger.exception(f"❌ Ошибка при обработке {request.method} {request.url.path}: {e}")
+            return JSONResponse(status_code=500, content={"detail": "Internal Server Error"})
+        logger.info(f"⬅️ {request.method} {request.url.path} -> {response.status_code}")
+        return response
+
+    @app.middleware("http")
+    async def update_last_activity(request: Request, call_next):
+        response = await call_next(request)
+        token = request.headers.get("authorization", "").replace("Bearer ", "").strip()
+        if not token:
+            return response
+        return response
+
+    return app
+
+
+def after_app(sample_rate: float) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/items/{item_id}")
+    async def item(item_id: int):
+        return {"id": item_id}
+
+    app.add_middleware(RequestLogMiddleware, sample_rate=sample_rate)
+    return app
+
+
+async def run(app, n: int) -> float:
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    def scope(i: int):
+        return {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+            "method": "GET", "scheme": "http", "path": f"/items/{i}", "raw_path": f"/items/{i}".encode(),
+            "root_path": "", "query_string": b"", "headers": [(b"host", b"bench")],
+            "client": ("127.0.0.1", 1), "server": ("bench", 80),
+        }
+
+    for i in range(200):  # прогрев
+        await app(scope(i), receive, send)
+    start = time.perf_counter()
+    for i in range(n):
+        await app(scope(i), receive, send)
+    return (time.perf_counter() - start) / n * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--sample-rate", type=float, default=1.0)
+    args = parser.parse_args()
+
+    devnull = open(os.devnull, "w")
+    root = logging.getLogger()
+    root.setLevel(logging.INFO)
+
+    # before: синхронный вывод прямо из обработчика запроса
+    sync_handler = logging.StreamHandler(devnull)
+    sync_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    root.addHandler(sync_handler)
+    baseline = asyncio.run(run(before_app(), args.requests))
+    root.removeHandler(sync_handler)
+
+    # after: очередь + поток вывода в тот же /dev/null
+    request_log.setup_logging()
+    listener_handler = request_log._listener.handlers[0]
+    listener_handler.setStream(devnull)
+    optimized = asyncio.run(run(after_app(args.sample_rate), args.requests))
+    request_log.stop_logging()
+
+    print(f"before (2x BaseHTTPMiddleware, sync handler) {baseline:8.1f} µs/request")
+    print(f"after  (ASGI middleware, queue handler)      {optimized:8.1f} µs/request")
+    print(f"sample_rate={args.sample_rate}, {args.requests} requests")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Память воркеров gunicorn с --preload и без.
+
+Запускает gunicorn с gunicorn.conf.py дважды (GUNICORN_PRELOAD=false/true),
+ждёт, пока ответит --health, и читает /proc/<pid>/smaps_rollup мастера и
+воркеров. Private — память, которая есть только у этого процесса (её и
+экономит preload + gc.freeze), Pss — честная доля с учётом общих страниц.
+После --warmup запросов к --health повторяет замер: GC воркера без freeze
+успевает «расшарить» страницы мастера.
+
+Только Linux. Нужна рабочая БД (startup-событие приложения ходит в неё).
+
+Запуск из fastapi-app/:
+    python -m benchmarks.bench_worker_memory [--workers 4] [--app app.main:app]
+"""
+import argparse
+import os
+import signal
+import subprocess
+import sys
+import time
+import urllib.request
+
+
+def smaps(pid: int) -> dict[str, int]:
+    """Поля smaps_rollup в КБ."""
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 3 and parts[-1] == "kB":
+                values[parts[0].rstrip(":")] = int(parts[1])
+    return values
+
+
+def children(pid: int) -> list[int]:
+    with open(f"/proc/{pid}/task/{pid}/children") as f:
+        return [int(p) for p in f.read().split()]
+
+
+def wait_ready(url: str, timeout: float):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=1):
+                return
+        except OSError:
+            time.sleep(0.3)
+    raise RuntimeError(f"{url} не ответил за {timeout} с")
+
+
+def measure(pids: list[int]) -> list[dict[str, int]]:
+    rows = []
+    for pid in pids:
+        m = smaps(pid)
+        rows.append({
+            "pid": pid,
+            "rss": m.get("Rss", 0),
+            "pss": m.get("Pss", 0),
+            "private": m.get("Private_Clean", 0) + m.get("Private_Dirty", 0),
+            "shared": m.get("Shared_Clean", 0) + m.get("Shared_Dirty", 0),
+        })
+    return rows
+
+
+def print_rows(title: str, master: dict, workers: list[dict]):
+    print(f"\n{title}")
+    print(f"{'':<8} {'pid':>7} {'Rss MB':>8} {'Pss MB':>8} {'Private':>8} {'Shared':>8}")
+    for name, row in [("master", master), *((f"worker{i}", w) for i, w in enumerate(workers))]:
+        print(
+            f"{name:<8} {row['pid']:>7} {row['rss'] / 1024:>8.1f} {row['pss'] / 1024:>8.1f} "
+            f"{row['private'] / 1024:>8.1f} {row['shared'] / 1024:>8.1f}"
+        )
+    total_pss = sum(r["pss"] for r in [master, *workers]) / 1024
+    avg_private = sum(w["private"] for w in workers) / max(len(workers), 1) / 1024
+    print(f"всего Pss {total_pss:.1f} MB, Private на воркер {avg_private:.1f} MB")
+
+
+def run(preload: bool, args) -> None:
+    env = {
+        **os.environ,
+        "GUNICORN_PRELOAD": "true" if preload else "false",
+        "GUNICORN_WORKERS": str(args.workers),
+        "GUNICORN_BIND": f"127.0.0.1:{args.port}",
+    }
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", args.app],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    url = f"http://127.0.0.1:{args.port}{args.health}"
+    try:
+        wait_ready(url, args.timeout)
+        deadline = time.time() + args.timeout
+        while len(children(proc.pid)) < args.workers and time.time() < deadline:
+            time.sleep(0.3)
+        time.sleep(1)
+
+        label = "preload + gc.freeze" if preload else "без preload"
+        pids = children(proc.pid)
+        master, *workers = measure([proc.pid, *pids])
+        print_rows(f"{label}: после старта", master, workers)
+
+        for _ in range(args.warmup):
+            urllib.request.urlopen(url, timeout=5).read()
+        master, *workers = measure([proc.pid, *pids])
+        print_rows(f"{label}: после {args.warmup} запросов", master, workers)
+    finally:
+        proc.send_signal(signal.SIGTERM)
+        proc.wait(timeout=30)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--app", default="app.main:app")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--health", default="/api/health")
+    parser.add_argument("--warmup", type=int, default=500)
+    parser.add_argument("--timeout", type=float, default=60)
+    args = parser.parse_args()
+
+    run(False, args)
+    run(True, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+"""
+Нагрузочный тест API на реальной смеси запросов.
+
+Каждый виртуальный пользователь логинится (/api/login) и до конца теста
+выбирает запросы по весам смеси:
+
+    me         GET  /api/me
+    dashboards GET  /api/dashboards/?summary=true
+    users      GET  /api/admin/users?search=<случайная строка>&total=estimate
+    excel      POST /api/analyze-excel (небольшая синтетическая выписка)
+
+По каждому запросу печатаются число, ошибки, RPS и задержки p50/p95/p99;
+результат сохраняется в JSON (--out), чтобы сравнивать коммиты и число
+воркеров (--compare прошлый.json).
+
+Нужен запущенный бэкенд с Postgres и пользователь-администратор
+(по умолчанию admin из init_user). Клиент — httpx (pip install -r benchmarks/requirements.txt).
+
+Запуск из fastapi-app/:
+    python -m benchmarks.loadtest --base-url http://localhost:8000 \\
+        --users 20 --duration 60 --out results/loadtest.json --label "4 workers"
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import random
+import string
+import subprocess
+import time
+from collections import defaultdict
+from datetime import datetime
+
+import httpx
+import pandas as pd
+
+DEFAULT_MIX = "me=50,dashboards=25,users=20,excel=5"
+
+
+def parse_mix(value: str) -> dict[str, int]:
+    mix = {}
+    for item in value.split(","):
+        name, _, weight = item.partition("=")
+        mix[name.strip()] = int(weight)
+    unknown = set(mix) - set(SCENARIOS)
+    if unknown:
+        raise argparse.ArgumentTypeError(f"неизвестные запросы в смеси: {', '.join(sorted(unknown))}")
+    return mix
+
+
+def synthetic_statement(rows: int = 200) -> bytes:
+    """Выписка в формате, который ждёт analyze-excel: 6 строк шапки, затем таблица."""
+    rnd = random.Random(0)
+    df = pd.DataFrame({
+        "Дата": pd.date_range("2024-01-01", periods=rows, freq="D"),
+        "Разрешение на строительство": rnd.choices(
+            ["91-RU93308000-2132-2022", "91-RU93308000-2775-2023", "прочее"], k=rows
+        ),
+        "Сумма": [round(rnd.uniform(-1e4, 1e6), 2) for _ in range(rows)],
+    })
+    buf = io.BytesIO()
+    df.to_excel(buf, index=False, startrow=6, engine="openpyxl")
+    return buf.getvalue()
+
+
+async def me(client: httpx.AsyncClient, ctx: dict) -> httpx.Response:
+    return await client.get("/api/me")
+
+
+async def dashboards(client: httpx.AsyncClient, ctx: dict) -> httpx.Response:
+    return await client.get("/api/dashboards/", params={"summary": "true"})
+
+
+async def users(client: httpx.AsyncClient, ctx: dict) -> httpx.Response:
+    search = "".join(random.choices(string.ascii_lowercase, k=2))
+    return await client.get("/api/admin/users", params={"search": search, "limit": 20, "total": "estimate"})
+
+
+async def excel(client: httpx.AsyncClient, ctx: dict) -> httpx.Response:
+    files = {"files": ("loadtest.xlsx", ctx["excel"], "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")}
+    return await client.post("/api/analyze-excel", files=files, data={"filter_by_period": "false"})
+
+
+SCENARIOS = {"me": me, "dashboards": dashboards, "users": users, "excel": excel}
+
+
+async def login(client: httpx.AsyncClient, username: str, password: str) -> str:
+    r = await client.post("/api/login", data={"username": username, "password": password})
+    r.raise_for_status()
+    return r.json()["access_token"]
+
+
+async def virtual_user(args, ctx: dict, deadline: float, latencies: dict, errors: dict):
+    names = list(args.mix)
+    weights = [args.mix[n] for n in names]
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout) as client:
+        start = time.perf_counter()
+        try:
+            token = await login(client, args.username, args.password)
+        except httpx.HTTPError:
+            errors["login"] += 1
+            return
+        finally:
+            latencies["login"].append(time.perf_counter() - start)
+        client.headers["Authorization"] = f"Bearer {token}"
+
+        while time.perf_counter() < deadline:
+            name = random.choices(names, weights)[0]
+            start = time.perf_counter()
+            try:
+                r = await SCENARIOS[name](client, ctx)
+                failed = r.status_code >= 400
+            except httpx.HTTPError:
+                failed = True
+            latencies[name].append(time.perf_counter() - start)
+            if failed:
+                errors[name] += 1
+            if args.think_ms:
+                await asyncio.sleep(random.uniform(0, 2 * args.think_ms) / 1000)
+
+
+def percentile(sorted_values: list[float], p: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(p / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize(latencies: dict, errors: dict, elapsed: float) -> dict:
+    endpoints = {}
+    for name in sorted(latencies):
+        values = sorted(latencies[name])
+        endpoints[name] = {
+            "requests": len(values),
+            "errors": errors.get(name, 0),
+            "rps": round(len(values) / elapsed, 2),
+            "mean_ms": round(sum(values) / len(values) * 1000, 2) if values else 0.0,
+            "p50_ms": round(percentile(values, 50) * 1000, 2),
+            "p95_ms": round(percentile(values, 95) * 1000, 2),
+            "p99_ms": round(percentile(values, 99) * 1000, 2),
+        }
+    total = sum(e["requests"] for n, e in endpoints.items() if n != "login")
+    return {
+        "elapsed_s": round(elapsed, 2),
+        "total_requests": total,
+        "total_rps": round(total / elapsed, 2),
+        "endpoints": endpoints,
+    }
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def print_report(result: dict, baseline: dict = None):
+    print(f"\n{result['label'] or ''} {result['git']}  {result['total_rps']} req/s, {result['total_requests']} запросов")
+    print(f"{'endpoint':<12} {'req':>7} {'err':>5} {'rps':>8} {'p50':>9} {'p95':>9} {'p99':>9}")
+    for name, e in result["endpoints"].items():
+        line = (
+            f"{name:<12} {e['requests']:>7} {e['errors']:>5} {e['rps']:>8.1f} "
+            f"{e['p50_ms']:>7.1f}ms {e['p95_ms']:>7.1f}ms {e['p99_ms']:>7.1f}ms"
+        )
+        old = (baseline or {}).get("endpoints", {}).get(name)
+        if old and old["p95_ms"]:
+            line += f"   p95 {(e['p95_ms'] / old['p95_ms'] - 1) * 100:+.0f}%, rps {(e['rps'] / max(old['rps'], 1e-9) - 1) * 100:+.0f}%"
+        print(line)
+
+
+async def run(args) -> dict:
+    ctx = {"excel": synthetic_statement()}
+    latencies: dict[str, list[float]] = defaultdict(list)
+    errors: dict[str, int] = defaultdict(int)
+    start = time.perf_counter()
+    deadline = start + args.duration
+    await asyncio.gather(*(virtual_user(args, ctx, deadline, latencies, errors) for _ in range(args.users)))
+    return summarize(latencies, errors, time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Нагрузочный тест API")
+    parser.add_argument("--base-url", default=os.getenv("LOADTEST_BASE_URL", "http://localhost:8000"))
+    parser.add_argument("--users", type=int, default=10, help="параллельных виртуальных пользователей")
+    parser.add_argument("--duration", type=float, default=30, help="секунд")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix(DEFAULT_MIX))
+    parser.add_argument("--think-ms", type=float, default=0, help="средняя пауза между запросами")
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--username", default=os.getenv("LOADTEST_USERNAME", "admin"))
+    parser.add_argument("--password", default=os.getenv("LOADTEST_PASSWORD", "lomavius"))
+    parser.add_argument("--label", default="", help="подпись прогона, например '4 workers'")
+    parser.add_argument("--out", help="куда сохранить результат (JSON)")
+    parser.add_argument("--compare", help="JSON прошлого прогона для сравнения")
+    args = parser.parse_args()
+
+    summary = asyncio.run(run(args))
+    result = {
+        "label": args.label,
+        "git": git_revision(),
+        "started_at": datetime.now().isoformat(timespec="seconds"),
+        "base_url": args.base_url,
+        "users": args.users,
+        "duration_s": args.duration,
+        "mix": args.mix,
+        **summary,
+    }
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_report(result, baseline)
+
+    if args.out:
+        os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"\nСохранено: {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+# gunicorn.conf.py — подхватывается gunicorn автоматически из рабочего каталога
+import gc
+import os
+import shutil
+import tempfile
+
+worker_class = "uvicorn.workers.UvicornWorker"
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:8000")
+workers = int(os.getenv("GUNICORN_WORKERS", 4))
+
+# Приложение (и pandas/numpy/sqlalchemy) импортируется один раз в мастере,
+# воркеры получают его страницы памяти через fork (copy-on-write).
+preload_app = os.getenv("GUNICORN_PRELOAD", "true").lower() == "true"
+
+# Метрики воркеров складываются в общий каталог и суммируются в /metrics.
+# Переменная должна быть задана до импорта prometheus_client в воркерах.
+os.environ.setdefault(
+    "PROMETHEUS_MULTIPROC_DIR", os.path.join(tempfile.gettempdir(), "prometheus_multiproc")
+)
+# Каталог готовим здесь, а не в on_starting: с preload_app gunicorn импортирует
+# приложение (и create_all пишет метрики пула) ещё до on_starting.
+# Файлы от прошлого запуска дали бы двойной счёт; при перечитывании конфига
+# (SIGHUP) тот же мастер каталог не трогает — в нём файлы живых воркеров.
+if not os.environ.get("_PROMETHEUS_MULTIPROC_READY"):
+    shutil.rmtree(os.environ["PROMETHEUS_MULTIPROC_DIR"], ignore_errors=True)
+    os.environ["_PROMETHEUS_MULTIPROC_READY"] = "1"
+os.makedirs(os.environ["PROMETHEUS_MULTIPROC_DIR"], exist_ok=True)
+
+if preload_app:
+    # Сборщик мусора в мастере не нужен и только оставляет «дыры» в страницах,
+    # которые потом копируются в каждого воркера (см. документацию gc.freeze)
+    gc.disable()
+
+
+def when_ready(server):
+    if preload_app:
+        # create_all при импорте открыл соединение в мастере — воркерам оно не нужно
+        from app.db import engine
+
+        engine.dispose()
+
+
+def pre_fork(server, worker):
+    if preload_app:
+        # Объекты мастера — в «вечное» поколение: GC воркера не трогает их
+        # счётчики ссылок, и общие страницы остаются общими
+        gc.freeze()
+
+
+def post_fork(server, worker):
+    if preload_app:
+        from app.db import engine, replicas
+
+        # Пул, унаследованный от мастера, не используем: соединения — только свои
+        engine.dispose(close=False)
+        replicas.dispose(close=False)
+        gc.enable()
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
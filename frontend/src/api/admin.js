@@ -4,10 +4,12 @@ import api from "./api";
 /**
  * Получить список пользователей
  * @param {Object} params { search?, role?, limit?, offset?, order_by? }
+ * @param {Object} options { fresh? } — читать с основного сервера, а не с реплики
  * @returns {Promise<{users: Array, total: number}>}
  */
-export async function getUsers(params = {}) {
-  const res = await api.get("/admin/users", { params });
+export async function getUsers(params = {}, { fresh = false } = {}) {
+  const headers = fresh ? { "X-Read-Primary": "1" } : {};
+  const res = await api.get("/admin/users", { params, headers });
   return res.data; // { users: [...], total: N }
 }
 
@@ -42,3 +44,11 @@ export async function updateUser(username, payload) {
   return res.data;
 }
 
+/**
+ * Статистика для админки
+ * @returns {Promise<{users: Object, dashboards: Object, analyses_per_day: Array, total_users: number, active_today: number, new_this_week: number, admin_count: number}>}
+ */
+export async function getStats() {
+  const res = await api.get("/admin/stats");
+  return res.data;
+}
@@ -73,9 +73,10 @@ export const getCurrentUser = async () => {
 };
 
 /**
- * Логаут (чистим localStorage)
+ * Логаут: отзываем токены на сервере и чистим localStorage
  */
 export const logout = () => {
+  api.post("/logout").catch(() => {});
   localStorage.removeItem("access_token");
   localStorage.removeItem("role");
 };
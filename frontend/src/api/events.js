@@ -0,0 +1,100 @@
+// src/api/events.js
+// Поток изменений /api/events (Server-Sent Events), одно соединение на вкладку.
+// EventSource не умеет заголовок Authorization, поэтому поток читаем через fetch.
+import { refresh } from "./auth";
+
+const listeners = new Set();
+let controller = null;
+
+const sleep = (ms) => new Promise((resolve) => setTimeout(resolve, ms));
+
+function emit(event) {
+  listeners.forEach((cb) => cb(event));
+}
+
+// Разбор text/event-stream: сообщения разделены пустой строкой
+async function readStream(body, onMessage) {
+  const reader = body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+  for (;;) {
+    const { value, done } = await reader.read();
+    if (done) return;
+    buffer += decoder.decode(value, { stream: true });
+    let end;
+    while ((end = buffer.indexOf("\n\n")) !== -1) {
+      const chunk = buffer.slice(0, end);
+      buffer = buffer.slice(end + 2);
+      const data = chunk
+        .split("\n")
+        .filter((line) => line.startsWith("data:"))
+        .map((line) => line.slice(5).trim())
+        .join("\n");
+      if (data) onMessage(JSON.parse(data)); // строки ": ping" без data пропускаем
+    }
+  }
+}
+
+async function run(signal) {
+  let delay = 1000;
+  let everConnected = false;
+  while (!signal.aborted) {
+    let reauth = false;
+    try {
+      const res = await fetch("/api/events", {
+        headers: { Authorization: `Bearer ${localStorage.getItem("access_token")}` },
+        signal,
+      });
+      if (res.status === 401) {
+        reauth = true;
+      } else if (res.ok) {
+        await readStream(res.body, (event) => {
+          if (event.type === "ready") {
+            delay = 1000;
+            // Пока соединения не было, изменения могли пройти мимо
+            if (everConnected) emit({ type: "resync" });
+            everConnected = true;
+          } else if (event.type === "reauth") {
+            reauth = true;
+          } else {
+            emit(event);
+          }
+        });
+      }
+    } catch (err) {
+      if (signal.aborted) return;
+    }
+    if (signal.aborted) return;
+
+    if (reauth) {
+      try {
+        await refresh(); // новый access_token — в localStorage
+        continue;
+      } catch (err) {
+        return; // refresh не удался — сессия закончилась, api.js отправит на /login
+      }
+    }
+    await sleep(delay);
+    delay = Math.min(delay * 2, 30000);
+  }
+}
+
+/**
+ * Подписаться на события (user.*, dashboard.*, escrow.*, resync).
+ * @param {(event: Object) => void} callback
+ * @returns {() => void} отписка; последний отписавшийся закрывает соединение
+ */
+export function subscribeEvents(callback) {
+  listeners.add(callback);
+  if (!controller) {
+    controller = new AbortController();
+    run(controller.signal);
+  }
+  return () => {
+    listeners.delete(callback);
+    if (listeners.size === 0 && controller) {
+      controller.abort();
+      controller = null;
+    }
+  };
+}
@@ -0,0 +1,10 @@
+import { useEffect, useRef } from "react";
+import { subscribeEvents } from "../api/events";
+
+// Вызывает handler на каждое событие из /api/events, пока компонент смонтирован
+export function useLiveEvents(handler) {
+  const handlerRef = useRef(handler);
+  handlerRef.current = handler;
+
+  useEffect(() => subscribeEvents((event) => handlerRef.current(event)), []);
+}
@@ -5,6 +5,7 @@ import {
   deleteUser,
   updateUser as apiUpdateUser, // 👈 API‑функция
 } from "../api/admin";
+import { useLiveEvents } from "./useLiveEvents";
 
 export function useUsers(initialFilters = {}) {
   const [users, setUsers] = useState([]);
@@ -12,11 +13,11 @@ export function useUsers(initialFilters = {}) {
   const [filters, setFilters] = useState(initialFilters);
   const [loading, setLoading] = useState(false);
 
-  // загрузка списка пользователей
-  const load = useCallback(async () => {
+  // загрузка списка пользователей; fresh — с основного сервера, минуя реплики
+  const load = useCallback(async (fresh = false) => {
     setLoading(true);
     try {
-      const res = await getUsers(filters);
+      const res = await getUsers(filters, { fresh });
       setUsers(res.users);
       setTotal(res.total);
     } catch (err) {
@@ -30,6 +31,26 @@ export function useUsers(initialFilters = {}) {
     load();
   }, [load]);
 
+  // Изменения от сервера: правку применяем на месте, остальное — перечитываем
+  useLiveEvents((event) => {
+    switch (event.type) {
+      case "user.updated": {
+        const { username, email, role, is_active } = event;
+        setUsers((list) =>
+          list.map((u) => (u.id === event.id ? { ...u, username, email, role, is_active } : u))
+        );
+        break;
+      }
+      case "user.created":
+      case "user.deleted":
+      case "users.bulk":
+      case "resync":
+        load(true); // состав страницы и total зависят от фильтров; реплика может отставать
+        break;
+      default:
+    }
+  });
+
   return {
     users,
     total,
@@ -41,7 +62,7 @@ export function useUsers(initialFilters = {}) {
     addUser: async (data) => {
       try {
         await createUser(data);
-        await load(); // 👈 сразу обновляем список
+        await load(); // 👈 не ждём события: поток может быть закрыт или отставать
       } catch (err) {
         console.error("Ошибка при создании пользователя:", err);
         throw err;
@@ -52,7 +73,7 @@ export function useUsers(initialFilters = {}) {
     removeUser: async (userId) => {
       try {
         await deleteUser(userId);   // 🔹 передаём id
-        await load();               // обновляем список
+        await load();
       } catch (err) {
         console.error("Ошибка при удалении пользователя:", err);
         throw err;
@@ -63,7 +84,7 @@ export function useUsers(initialFilters = {}) {
     updateUser: async (username, payload) => {
       try {
         await apiUpdateUser(username, payload); // 👈 вызываем API
-        await load(); // 👈 перезагружаем список
+        await load();
       } catch (err) {
         console.error("Ошибка при обновлении пользователя:", err);
         throw err;
@@ -1,4 +1,5 @@
-import React, { useEffect, useState } from "react";
+import React, { useCallback, useEffect, useState } from "react";
+import { useLiveEvents } from "../hooks/useLiveEvents";
 import "./DeveloperDashboardBuilder.css";
 export default function DeveloperDashboardBuilder({ token, role, baseUrl = "/api" }) {
   const [dashboards, setDashboards] = useState([]);
@@ -9,28 +10,60 @@ export default function DeveloperDashboardBuilder({ token, role, baseUrl = "/api
   const normalizedRole = role?.trim().toLowerCase();
   const hasAccess = normalizedRole === "developer" || normalizedRole === "admin";
 
-  useEffect(() => {
+  // fresh — читать с основного сервера: реплика может ещё не видеть изменение из события
+  const request = useCallback(
+    (path, { fresh = false } = {}) =>
+      fetch(`${baseUrl}${path}`, {
+        headers: {
+          "Content-Type": "application/json",
+          Authorization: `Bearer ${token}`,
+          ...(fresh ? { "X-Read-Primary": "1" } : {}),
+        },
+      }).then(async (r) => {
+        if (!r.ok) {
+          throw new Error(`Ошибка ${r.status}`);
+        }
+        return r.json();
+      }),
+    [baseUrl, token]
+  );
+
+  const load = useCallback((fresh = false) => {
     if (!hasAccess || !token) return;
 
     setLoading(true);
     setError(null);
 
-    fetch(`${baseUrl}/dashboards`, {
-      headers: {
-        "Content-Type": "application/json",
-        Authorization: `Bearer ${token}`,
-      },
-    })
-      .then(async (r) => {
-        if (!r.ok) {
-          throw new Error(`Ошибка ${r.status}`);
-        }
-        return r.json();
-      })
+    request("/dashboards", { fresh })
       .then((data) => setDashboards(data))
       .catch((err) => setError(err.message))
       .finally(() => setLoading(false));
-  }, [hasAccess, token, baseUrl]);
+  }, [hasAccess, token, request]);
+
+  useEffect(() => {
+    load();
+  }, [load]);
+
+  // Изменения от сервера: дочитываем только изменившийся дашборд
+  useLiveEvents((event) => {
+    if (!hasAccess || !token) return;
+    if (event.type === "resync") {
+      load(true);
+    } else if (event.type === "dashboard.deleted") {
+      setDashboards((list) => list.filter((d) => d.id !== event.id));
+    } else if (event.type === "dashboard.created" || event.type === "dashboard.updated") {
+      request(`/dashboards/${event.id}`, { fresh: true })
+        .then((d) =>
+          // Ответы на два быстрых события могут прийти не по порядку — старую версию не берём
+          setDashboards((list) =>
+            list.some((x) => x.id === d.id)
+              ? list.map((x) => (x.id === d.id && x.version <= d.version ? d : x))
+              : [...list, d]
+          )
+        )
+        .catch((err) => console.error("Ошибка при загрузке дашборда:", err));
+    }
+  });
 
   // Нет доступа
   if (!hasAccess) {